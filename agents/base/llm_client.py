@@ -0,0 +1,130 @@
+'''
+Process-wide, connection-pooled transport for DeepInfra chat models.
+
+Every QwenAgent in the process (across Streamlit reruns and sessions) shares one
+background event loop, one aiohttp connection pool, one requests session and one
+concurrency limiter.
+'''
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, Optional
+
+import aiohttp
+import requests
+from langchain_community.chat_models import ChatDeepInfra
+from langchain_community.chat_models.deepinfra import ChatDeepInfraException
+from langchain_community.utilities.requests import Requests
+from utils.config import LLM_MAX_CONNECTIONS, LLM_MAX_CONCURRENCY
+
+
+class LLMConnectionPool:
+    """Owns the shared event loop thread, HTTP sessions and concurrency limiter."""
+
+    _instance: Optional["LLMConnectionPool"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_connections: int = LLM_MAX_CONNECTIONS, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-client-loop", daemon=True)
+        self._thread.start()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.sync_session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.sync_session.mount("https://", adapter)
+
+    @classmethod
+    def get(cls) -> "LLMConnectionPool":
+        """Return the process-wide pool, creating it on first use."""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Limits in-flight model requests; only usable on the pool's loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def session(self) -> aiohttp.ClientSession:
+        """Shared aiohttp session; only usable on the pool's loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def run(self, coroutine, timeout: Optional[float] = None) -> Any:
+        """Run ``coroutine`` on the pool's loop from synchronous code and wait for the result."""
+        coroutine = _in_context(coroutine, contextvars.copy_context())
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    async def run_async(self, coroutine) -> Any:
+        """Await ``coroutine`` on the pool's loop from any other event loop."""
+        if asyncio.get_running_loop() is self.loop:
+            return await coroutine
+        coroutine = _in_context(coroutine, contextvars.copy_context())
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+
+async def _in_context(coroutine, context: contextvars.Context) -> Any:
+    """Carry the caller's context variables (e.g. the log correlation id) into the pool's loop."""
+    for variable, value in context.items():
+        variable.set(value)
+    return await coroutine
+
+
+class TransientDeepInfraError(ChatDeepInfraException):
+    """A rate-limited (429) or server-side (5xx) DeepInfra response, worth retrying."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class PooledChatDeepInfra(ChatDeepInfra):
+    """ChatDeepInfra that sends requests over the shared connection pools instead of a new
+    connection per call. Retries are left to the caller (QwenAgent)."""
+
+    def completion_with_retry(self, run_manager=None, **kwargs: Any) -> Any:
+        request_timeout = kwargs.pop("request_timeout")
+        response = LLMConnectionPool.get().sync_session.post(
+            self._url(), json=self._body(kwargs), headers=self._headers(), timeout=request_timeout
+        )
+        self._handle_status(response.status_code, response.text)
+        return response
+
+    async def acompletion_with_retry(self, run_manager=None, **kwargs: Any) -> Any:
+        request_timeout = kwargs.pop("request_timeout")
+        request = Requests(headers=self._headers(), aiosession=LLMConnectionPool.get().session())
+        async with request.apost(url=self._url(), data=self._body(kwargs), timeout=request_timeout) as response:
+            self._handle_status(response.status, await response.text())
+            return await response.json()
+
+    def _create_chat_result(self, response: Any) -> Any:
+        # ChatDeepInfra keeps the token counts in llm_output, which invoke() drops
+        result = super()._create_chat_result(response)
+        usage = response.get("usage") or {}
+        if usage:
+            for generation in result.generations:
+                generation.message.usage_metadata = {
+                    "input_tokens": usage.get("prompt_tokens", 0),
+                    "output_tokens": usage.get("completion_tokens", 0),
+                    "total_tokens": usage.get("total_tokens", 0),
+                }
+        return result
+
+    def _handle_status(self, code: int, text: Any) -> None:
+        # Only rate limiting and server errors are transient; other statuses fail straight away
+        if code == 429:
+            raise TransientDeepInfraError(code, f"DeepInfra rate limited the request: {text}")
+        if code >= 500:
+            raise TransientDeepInfraError(code, f"DeepInfra Server error status {code}: {text}")
+        super()._handle_status(code, text)
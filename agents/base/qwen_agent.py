@@ -4,17 +4,32 @@ this is the Base Agent, other Agent inherit it.
 
 
 from typing import List, Dict, Optional, Callable
-from langchain_community.chat_models import ChatDeepInfra
 from langchain_core.messages import AIMessage, HumanMessage
+import aiohttp
+import asyncio
+import requests
 import json
 import logging
-import traceback
+import random
 import os
 from datetime import datetime
 from utils.logger import get_logger
+from utils.tracing import span
+from utils.config import LLM_REQUEST_TIMEOUT, LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY
+from .llm_client import LLMConnectionPool, PooledChatDeepInfra, TransientDeepInfraError
 
 logger = get_logger()
 
+# 429/5xx responses plus connection failures and timeouts; anything else is not worth repeating
+RETRYABLE_ERRORS = (
+    TransientDeepInfraError,
+    asyncio.TimeoutError,
+    aiohttp.ClientConnectionError,
+    requests.ConnectionError,
+    requests.Timeout,
+    ConnectionError,
+)
+
 class QwenAgent:
     """
     A wrapper class for interacting with Qwen models via DeepInfra.
@@ -34,11 +49,13 @@ class QwenAgent:
         temperature: float = 0.2,
         stream: bool = False,
         debug_mode: bool = False,
-        stream_callback: Optional[Callable[[str], None]] = None
+        stream_callback: Optional[Callable[[str], None]] = None,
+        request_timeout: Optional[float] = LLM_REQUEST_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES
     ):
         """Initialize a new QwenAgent instance."""
         try:
-            self.chat_model = ChatDeepInfra(
+            self.chat_model = PooledChatDeepInfra(
                 model=model_name,
                 temperature=temperature,
                 max_tokens=max_tokens,
@@ -52,6 +69,8 @@ class QwenAgent:
             self.max_tokens = max_tokens
             self.temperature = temperature
             self.stream = stream
+            self.request_timeout = request_timeout
+            self.max_retries = max_retries
             self.history: List[Dict[str, str]] = []
             self.prompts = {"default": self.system_prompt}
             self.debug_mode = debug_mode
@@ -61,7 +80,7 @@ class QwenAgent:
             logger.info("QwenAgent initialized successfully.")
             
         except Exception as e:
-            logger.error(f"Failed to initialize QwenAgent: {e}\n{traceback.format_exc()}")
+            logger.error(f"Failed to initialize QwenAgent: {e}", exc_info=True)
             raise
 
     def set_prompt(self, new_prompt: str) -> None:
@@ -129,7 +148,7 @@ class QwenAgent:
             logger.info(f"Memory saved to {filename}.")
             return filename
         except Exception as e:
-            logger.error(f"Error saving memory: {e}\n{traceback.format_exc()}")
+            logger.error(f"Error saving memory: {e}", exc_info=True)
             return None
 
     def load_memory_from_file(self, filename: str) -> None:
@@ -143,7 +162,7 @@ class QwenAgent:
                 self.history = json.load(f)
             logger.info(f"Memory loaded from {filename}.")
         except Exception as e:
-            logger.error(f"Error loading memory: {e}\n{traceback.format_exc()}")
+            logger.error(f"Error loading memory: {e}", exc_info=True)
 
     def default_stream_callback(self, chunk: str) -> None:
         """Default callback function for handling streaming response chunks."""
@@ -151,30 +170,75 @@ class QwenAgent:
 
     def generate_response(self, user_input: str) -> Optional[str]:
         """Generate a response from the Qwen model."""
-        try:
-            if self.use_memory:
-                self.history.append({"role": "user", "text": user_input})
-                self.history = self.history[-self.memory_limit * 2:]
+        # The span is opened here, on the caller's thread, so it joins the caller's collector
+        with span("generate_response", model=self.model_name) as response_span:
+            try:
+                return LLMConnectionPool.get().run(self._agenerate_with_retry(user_input, response_span))
+            except Exception as e:
+                return self._report_error(e, response_span)
 
-            messages = [
-                ("system", self.system_prompt),
-                *[(msg["role"], msg["text"]) for msg in self.history],
-                ("user", user_input)
-            ]
+    async def agenerate_response(self, user_input: str) -> Optional[str]:
+        """Asynchronously generate a response over the shared, pooled HTTP session.
 
-            response = self.chat_model.invoke(messages)
-            response_text = response.content
+        Requests are bounded by ``request_timeout``, retried with jittered exponential backoff
+        on transient errors, and limited process-wide by the pool's concurrency limiter.
+        """
+        with span("generate_response", model=self.model_name) as response_span:
+            try:
+                return await LLMConnectionPool.get().run_async(self._agenerate_with_retry(user_input, response_span))
+            except Exception as e:
+                return self._report_error(e, response_span)
 
-            if self.use_memory:
-                self.history.append({"role": "assistant", "text": response_text})
+    def _report_error(self, error: Exception, response_span) -> None:
+        response_span.fail(error)
+        logger.error(f"Error generating response: {error}", exc_info=True)
+        print(f"\nAn error occurred while processing your request. Details: {error}")
+        return None
 
-            logger.info("User input processed successfully.")
-            return response_text
+    async def _agenerate_with_retry(self, user_input: str, response_span=None) -> str:
+        pool = LLMConnectionPool.get()
+        messages = self._build_messages(user_input)
 
-        except Exception as e:
-            logger.error(f"Error generating response: {e}\n{traceback.format_exc()}")
-            print(f"\nAn error occurred while processing your request. Details: {e}")
-            return None
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with pool.semaphore:
+                    response = await asyncio.wait_for(self.chat_model.ainvoke(messages), self.request_timeout)
+                break
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = asyncio.TimeoutError(f"Model request timed out after {self.request_timeout}s")
+                if attempt == self.max_retries:
+                    raise e
+                # Full jitter keeps many analysts' retries from arriving in lockstep
+                delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                logger.warning(f"Model request failed ({type(e).__name__}: {e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+        response_text = response.content
+        if response_span is not None:
+            usage = getattr(response, 'usage_metadata', None) or {}
+            response_span.set(
+                attempts=attempt + 1,
+                prompt_tokens=usage.get('input_tokens'),
+                completion_tokens=usage.get('output_tokens')
+            )
+
+        if self.use_memory:
+            self.history.append({"role": "assistant", "text": response_text})
+
+        logger.info("User input processed successfully.")
+        return response_text
+
+    def _build_messages(self, user_input: str) -> list:
+        if self.use_memory:
+            self.history.append({"role": "user", "text": user_input})
+            self.history = self.history[-self.memory_limit * 2:]
+
+        return [
+            ("system", self.system_prompt),
+            *[(msg["role"], msg["text"]) for msg in self.history],
+            ("user", user_input)
+        ]
 
     def chat_loop(self) -> None:
         """Start an interactive chat loop in the console."""
@@ -193,5 +257,5 @@ class QwenAgent:
             print("\nConversation interrupted by user.")
             logger.info("Conversation loop interrupted by user (KeyboardInterrupt).")
         except Exception as e:
-            logger.error(f"Unexpected error in chat loop: {e}\n{traceback.format_exc()}")
+            logger.error(f"Unexpected error in chat loop: {e}", exc_info=True)
             print("An unexpected error occurred. Check log for details.")
\ No newline at end of file
@@ -3,12 +3,19 @@ from .data_analyzer import DataFrameAnalyzer
 from .code_generator import CodeGenerator
 from .code_executor import CodeExecutor
 from .data_processor import DataProcessor
-from utils.config import CODE_CONVERSION_PROMPT, MODEL_NAME
+from .code_cache import CodeCache
+from .intent_matcher import IntentMatcher
+from utils.config import (
+    CODE_CONVERSION_PROMPT, MODEL_NAME,
+    CODE_CACHE_ENABLED, CODE_CACHE_PATH, CODE_CACHE_MAX_ENTRIES, CODE_CACHE_MAX_MB,
+    INTENT_FAST_PATH, DATAFRAME_ENGINE
+)
+from data_processor.engines import get_engine
 import pandas as pd
 
 class CodeConversionAgent(QwenAgent):
     """Main agent class that orchestrates the data processing workflow"""
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, sandbox=None):
         super().__init__(
             api_key=api_key,
             model_name=MODEL_NAME,
@@ -17,9 +24,20 @@ class CodeConversionAgent(QwenAgent):
         )
         
         # Initialize components
-        self.code_generator = CodeGenerator(self)
+        self.engine = get_engine(DATAFRAME_ENGINE)
+        self.code_cache = CodeCache(
+            CODE_CACHE_PATH,
+            max_entries=CODE_CACHE_MAX_ENTRIES,
+            max_bytes=CODE_CACHE_MAX_MB * 1024 * 1024
+        ) if CODE_CACHE_ENABLED else None
+        self.code_generator = CodeGenerator(
+            self,
+            self.code_cache,
+            # The built-in answers are pandas code
+            IntentMatcher() if INTENT_FAST_PATH and self.engine.pandas_api else None
+        )
         self.data_analyzer = DataFrameAnalyzer()
-        self.code_executor = CodeExecutor(self.code_generator)
+        self.code_executor = CodeExecutor(self.code_generator, sandbox, engine=self.engine)
         self.data_processor = DataProcessor(
             self.data_analyzer,
             self.code_generator,
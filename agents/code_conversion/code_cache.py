@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from utils.logger import get_logger
+
+class CodeCache:
+    """Disk-backed LRU cache for generated code, keyed on the full generation context"""
+    def __init__(self, path: str, max_entries: int = 5000, max_bytes: int = 50 * 1024 * 1024,
+                 memory_entries: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.logger = get_logger("CodeCache")
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS code_cache ("
+            "key TEXT PRIMARY KEY, code TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON code_cache(last_access)")
+
+    @staticmethod
+    def normalize_instruction(instruction: str) -> str:
+        return re.sub(r"\s+", " ", instruction).strip()
+
+    @classmethod
+    def make_key(cls, instruction: str, columns: List[str], dtypes: Optional[Dict[str, str]],
+                 model_name: str, system_prompt: str, temperature: float) -> str:
+        payload = json.dumps({
+            'instruction': cls.normalize_instruction(instruction),
+            'columns': [str(column) for column in columns],
+            'dtypes': {str(k): str(v) for k, v in (dtypes or {}).items()},
+            'model': model_name,
+            'system_prompt': system_prompt,
+            'temperature': temperature
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            code = self._memory.get(key)
+            if code is not None:
+                self._memory.move_to_end(key)
+            else:
+                row = self._conn.execute("SELECT code FROM code_cache WHERE key = ?", (key,)).fetchone()
+                code = row[0] if row else None
+                if code is not None:
+                    self._remember(key, code)
+
+            if code is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE code_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            return code
+
+    def set(self, key: str, code: str) -> None:
+        size = len(code.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO code_cache (key, code, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, code, size, now, now)
+            )
+            self._remember(key, code)
+            self._evict()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM code_cache WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM code_cache")
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM code_cache").fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': size
+        }
+
+    def _remember(self, key: str, code: str) -> None:
+        self._memory[key] = code
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self) -> None:
+        entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM code_cache").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = self._conn.execute("SELECT key, size FROM code_cache ORDER BY last_access ASC").fetchall()
+        for key, row_size in rows:
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM code_cache WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            entries -= 1
+            size -= row_size
+            evicted += 1
+
+        self.evictions += evicted
+        self.logger.info(f"Evicted {evicted} entries from code cache")
@@ -1,33 +1,171 @@
+import contextvars
+import threading
+import time
 import pandas as pd
-import numpy as np
-from typing import Optional
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Tuple
 from .code_generator import CodeGenerator
+from data_processor.engines import PandasEngine
+from data_processor.validation import check_code
+from utils.config import FIX_CANDIDATES, FIX_CONCURRENCY, FIX_SAMPLE_ROWS, VALIDATE_CODE
+from utils.logger import get_logger
+from utils.tracing import span
+
+Runner = Callable[[str, pd.DataFrame], pd.DataFrame]
 
 class CodeExecutor:
     """Handles code execution and error recovery"""
-    def __init__(self, code_generator: CodeGenerator):
+    def __init__(self, code_generator: CodeGenerator, sandbox=None, candidates: int = FIX_CANDIDATES,
+                 concurrency: int = FIX_CONCURRENCY, sample_rows: int = FIX_SAMPLE_ROWS,
+                 validate: bool = VALIDATE_CODE, engine: Optional[PandasEngine] = None):
         self.code_generator = code_generator
+        self.engine = engine or PandasEngine()
+        self.sandbox = sandbox
+        self.candidates = candidates
+        self.concurrency = concurrency
+        self.sample_rows = sample_rows
+        self.validate = validate
+        self.logger = get_logger("CodeExecutor")
 
     def execute_code(self, df: pd.DataFrame, code: str, max_retries: int = 3) -> Optional[pd.DataFrame]:
-        retries = 0
         original_code = code
-        while retries < max_retries:
+        try:
+            return self._run(code, df)
+        except Exception as e:
+            self.code_generator.discard(code)
+            error = e
+
+        for _ in range(max_retries - 1):
             try:
-                local_dict = {
-                    'df': df.copy(),
-                    'pd': pd,
-                    'np': np
-                }
-                exec(code, globals(), local_dict)
-                return local_dict['df']
+                if self.candidates > 1:
+                    return self.fix_code(error, original_code, df)[1]
+                code = self._handle_error(error, original_code, df)
+                return self._run(code, df)
             except Exception as e:
-                if retries < max_retries - 1:
-                    code = self._handle_error(e, original_code, df)
-                    retries += 1
-                else:
-                    return None
+                self.code_generator.discard(code)
+                error = e
+        return None
+
+    def fix_code(self, error: Exception, original_code: str, df: pd.DataFrame,
+                 run: Optional[Runner] = None) -> Tuple[str, pd.DataFrame]:
+        """Ask for a fix and run it on ``df``, returning ``(fixed_code, result)``.
+
+        With more than one candidate, the fixes are requested concurrently, each is tried on a
+        small sample of ``df`` as soon as it arrives, and the first one that passes is run on
+        the full frame. Raises the last error if no candidate succeeds.
+        """
+        run = run or self._run
+        self.code_generator.discard(original_code)
+        if self.candidates <= 1:
+            code = self._handle_error(error, original_code, df)
+            try:
+                return code, run(code, df)
+            except Exception:
+                self.code_generator.discard(code)
+                raise
+
+        sample = df.head(self.sample_rows)
+        # Set once a candidate is committed (or all failed) so the others stop before the sandbox
+        settled = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, self.candidates)))
+        try:
+            # Each candidate runs in the caller's context so its spans reach the caller's collector
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._try_candidate, error, original_code, df, sample,
+                            variant, run, settled)
+                for variant in range(1, self.candidates + 1)
+            ]
+            last_error = error
+            for future in as_completed(futures):
+                code, sample_error = future.result()
+                if sample_error is not None:
+                    if code is not None:
+                        self.code_generator.discard(code)
+                    last_error = sample_error
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = run(code, df)
+                except Exception as e:
+                    self.logger.info(f"Candidate fix failed on the full data after {time.perf_counter() - start:.2f}s: {e}")
+                    self.code_generator.discard(code)
+                    last_error = e
+                    continue
+                self.logger.info(f"Committed candidate fix after a {time.perf_counter() - start:.2f}s full run")
+                return code, result
+            raise last_error
+        finally:
+            # Do not wait for slower candidates that are still talking to the model
+            settled.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _try_candidate(self, error: Exception, original_code: str, df: pd.DataFrame, sample: pd.DataFrame,
+                       variant: int, run: Runner, settled: threading.Event) -> Tuple[Optional[str], Optional[Exception]]:
+        with span("fix_candidate", variant=variant) as candidate_span:
+            code, sample_error = self._generate_candidate(error, original_code, df, sample, variant, run, settled)
+            candidate_span.set(passed_sample=code is not None and sample_error is None)
+            return code, sample_error
+
+    def _generate_candidate(self, error: Exception, original_code: str, df: pd.DataFrame, sample: pd.DataFrame,
+                            variant: int, run: Runner,
+                            settled: threading.Event) -> Tuple[Optional[str], Optional[Exception]]:
+        if settled.is_set():
+            return None, CancelledError()
+        start = time.perf_counter()
+        try:
+            code = self._handle_error(error, original_code, df, variant)
+        except Exception as e:
+            self.logger.info(f"Candidate {variant}: generation failed after {time.perf_counter() - start:.2f}s: {e}")
+            return None, e
+        if settled.is_set():
+            # Another candidate already won; do not hold the sandbox up with a sample run
+            self.logger.info(f"Candidate {variant}: dropped after {time.perf_counter() - start:.2f}s, another fix was committed")
+            return code, CancelledError()
+        generated = time.perf_counter()
+        try:
+            # Checked against the full frame, so row-wise code that only the full run would suffer is caught
+            if self.validate and self.engine.pandas_api:
+                check_code(code, df)
+            # Through the caller's runner (the sandbox when there is one): a candidate is untrusted code
+            run(code, sample)
+            outcome, sample_error = "passed", None
+        except Exception as e:
+            outcome, sample_error = f"failed ({e})", e
+        self.logger.info(
+            f"Candidate {variant}: generated in {generated - start:.2f}s, "
+            f"sample run {outcome} in {time.perf_counter() - generated:.3f}s"
+        )
+        return code, sample_error
+
+    def _run(self, code: str, df: pd.DataFrame) -> pd.DataFrame:
+        if self.validate and self.engine.pandas_api:
+            check_code(code, df)
+        if self.sandbox is not None:
+            return self.engine.finish(self.sandbox.run(code, df, self.engine.name))
+        return self.engine.finish(self.engine.run(code, df))
+
+    def _handle_error(self, error: Exception, original_code: str, df: pd.DataFrame,
+                      variant: Optional[int] = None) -> str:
+        requirements = [
+            "Provide alternative implementation if needed",
+            "Ensure the code achieves the same goal"
+        ]
+        # Sandbox failures carry a structured kind; resource limits need a different kind of fix
+        if getattr(error, 'kind', None) in ('timeout', 'memory'):
+            requirements.append(
+                f"The code hit the sandbox {error.kind} limit on {len(df)} rows: use vectorized "
+                "operations and avoid row-wise apply, loops and cartesian merges"
+            )
+        elif getattr(error, 'kind', None) == 'validation':
+            requirements.append(
+                f"The code was rejected before running on {len(df)} rows; fix every problem the "
+                "error message lists and use only the available columns"
+            )
+        if variant is not None:
+            # Distinct prompts give distinct candidates (and distinct cache entries)
+            requirements.append(f"This is candidate #{variant}; prefer an approach other candidates are unlikely to use")
+        requirement_lines = "\n        ".join(f"{i}. {text}" for i, text in enumerate(requirements, 1))
 
-    def _handle_error(self, error: Exception, original_code: str, df: pd.DataFrame) -> str:
         error_prompt = f"""
         Fix this code that raised an error:
         Error message: {str(error)}
@@ -36,7 +174,11 @@ class CodeExecutor:
         {original_code}
 
         Requirements:
-        1. Provide alternative implementation if needed
-        2. Ensure the code achieves the same goal
+        {requirement_lines}
         """
-        return self.code_generator.generate_code(error_prompt, list(df.columns))
\ No newline at end of file
+        return self.code_generator.generate_code(
+            error_prompt,
+            list(df.columns),
+            df.dtypes.astype(str).to_dict(),
+            fast_path=False
+        )
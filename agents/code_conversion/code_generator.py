@@ -1,13 +1,81 @@
 import re
-from typing import List
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from ..base.qwen_agent import QwenAgent
+from .code_cache import CodeCache
+from .intent_matcher import IntentMatcher
+from utils.logger import get_logger
+from utils.tracing import span
 
 class CodeGenerator:
-    """Handles code generation and extraction"""
-    def __init__(self, llm_agent: QwenAgent):
+    """Handles code generation and extraction.
+
+    One instance is shared by every session and by the fix-candidate threads, so the counters
+    and the code -> cache key map are only touched under ``_lock``; per-session figures come
+    from the spans instead.
+    """
+    def __init__(self, llm_agent: QwenAgent, cache: Optional[CodeCache] = None,
+                 matcher: Optional[IntentMatcher] = None):
         self.llm_agent = llm_agent
+        self.cache = cache
+        self.matcher = matcher
+        self.model_seconds: Optional[float] = None  # running average of a model round trip
+        self.saved_seconds = 0.0
+        self._cache_keys: "OrderedDict[str, str]" = OrderedDict()  # code handed out -> its cache key
+        self._lock = threading.Lock()
+        self.logger = get_logger("CodeGenerator")
+
+    def generate_code(self, instruction: str, columns: List[str], dtypes: Optional[Dict[str, str]] = None,
+                      fast_path: bool = True) -> str:
+        """Code for ``instruction``; ``fast_path=False`` always asks the model (e.g. for fix prompts)"""
+        with span("generate_code") as code_span:
+            code = None
+            if fast_path and self.matcher is not None:
+                code = self._match_intent(instruction, columns, dtypes, code_span)
+            if code is None:
+                code = self._generate_code(instruction, columns, dtypes, code_span)
+            code_span.set(code_lines=len(code.splitlines()))
+            return code
+
+    def _match_intent(self, instruction: str, columns: List[str], dtypes: Optional[Dict[str, str]],
+                      code_span) -> Optional[str]:
+        with self._lock:
+            match = self.matcher.match(instruction, columns, dtypes)
+            if match is None:
+                return None
+            # What the model would have taken, going by the round trips seen so far
+            saved = self.model_seconds or 0.0
+            self.saved_seconds += saved
+            matches, total, total_saved = (self.matcher.matches, self.matcher.matches + self.matcher.misses,
+                                           self.saved_seconds)
+        code_span.set(fast_path=match.intent, saved_seconds=saved)
+        self.logger.info(
+            f"Built-in '{match.intent}' code used without the model: {matches} of {total} instructions "
+            f"matched ({matches / total:.0%}), ~{total_saved:.1f}s saved so far across all sessions"
+        )
+        return match.code
+
+    def _generate_code(self, instruction: str, columns: List[str], dtypes: Optional[Dict[str, str]],
+                       code_span) -> str:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = CodeCache.make_key(
+                instruction,
+                columns,
+                dtypes,
+                self.llm_agent.model_name,
+                self.llm_agent.system_prompt,
+                self.llm_agent.temperature
+            )
+            cached_code = self.cache.get(cache_key)
+            code_span.set(cache_hit=cached_code is not None)
+            if cached_code is not None:
+                self.logger.info(f"Code cache hit ({self.cache.hits} hits / {self.cache.misses} misses)")
+                self._remember_key(cached_code, cache_key)
+                return cached_code
 
-    def generate_code(self, instruction: str, columns: List[str]) -> str:
         code_prompt = f"""
         Convert this instruction into executable Python code:
         {instruction}
@@ -18,11 +86,37 @@ class CodeGenerator:
         Generate complete, executable code that works with a DataFrame named 'df'.
         Include only necessary imports (pandas as pd, numpy as np, sklearn,...).
         """
+        start = time.perf_counter()
         response = self.llm_agent.generate_response(code_prompt)
-        return self._extract_code(response)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.model_seconds = elapsed if self.model_seconds is None else 0.8 * self.model_seconds + 0.2 * elapsed
+        if response is None:
+            raise RuntimeError("The language model did not return a response")
+        code = self._extract_code(response)
+
+        if cache_key is not None and code:
+            self.cache.set(cache_key, code)
+            self._remember_key(code, cache_key)
+        return code
+
+    def discard(self, code: str) -> None:
+        """Drop ``code`` from the cache after it failed, so the same request asks the model again"""
+        with self._lock:
+            key = self._cache_keys.pop(code, None)
+        if key is not None and self.cache is not None:
+            self.cache.delete(key)
+            self.logger.info("Removed failing code from the code cache")
+
+    def _remember_key(self, code: str, key: str) -> None:
+        with self._lock:
+            self._cache_keys[code] = key
+            self._cache_keys.move_to_end(code)
+            while len(self._cache_keys) > 256:
+                self._cache_keys.popitem(last=False)
 
     @staticmethod
     def _extract_code(text: str) -> str:
         code_blocks = re.findall(r"```(?:python)?(.*?)```", text, flags=re.DOTALL)
         code = code_blocks[0] if code_blocks else text
-        return code.strip()
\ No newline at end of file
+        return code.strip()
@@ -1,15 +1,60 @@
 import pandas as pd
-from io import StringIO
-from .models import DataState
+from typing import List, Optional
+from .models import ColumnProfile, DataState
+from .profiler import DataProfiler
 
 class DataFrameAnalyzer:
     """Handles DataFrame analysis and state reporting"""
-    @staticmethod
-    def get_data_state(df: pd.DataFrame) -> DataState:
-        buffer = StringIO()
-        df.info(memory_usage='deep', show_counts=True, buf=buffer)
+    def __init__(self, profiler: Optional[DataProfiler] = None):
+        self.profiler = profiler or DataProfiler()
+
+    def get_data_state(self, df: pd.DataFrame, sampled: Optional[bool] = None) -> DataState:
+        """Summarize ``df`` from cached per-column profiles (see ``DataProfiler``)"""
+        columns = self.profiler.profile(df, sampled)
         return DataState(
             head=df.head().to_string(),
-            info=buffer.getvalue(),
-            null_info=df.isnull().sum().to_string()
-        )
\ No newline at end of file
+            info=self._format_info(df, columns),
+            null_info=self._format_nulls(columns),
+            columns=columns
+        )
+
+    @staticmethod
+    def _format_info(df: pd.DataFrame, columns: List[ColumnProfile]) -> str:
+        memory = sum(column.memory_bytes for column in columns) + df.index.memory_usage(deep=True)
+        approximate = any(column.sampled for column in columns)
+        rows = []
+        for column in columns:
+            rows.append({
+                'Column': column.name,
+                'Dtype': column.dtype,
+                'Non-Null Count': _estimate(column.rows - column.nulls, column.nulls_error),
+                'Distinct': _estimate(column.distinct, 0, column.distinct_error),
+                'Memory': _estimate(column.memory_bytes, column.memory_error),
+                'Min': '' if column.min is None else column.min,
+                'Max': '' if column.max is None else column.max
+            })
+        lines = [
+            f"{type(df).__name__}: {len(df)} rows x {len(columns)} columns",
+            pd.DataFrame(rows).to_string(index=False) if rows else "(no columns)",
+            f"memory usage: {'~' if approximate else ''}{memory / (1024 * 1024):.1f} MB"
+        ]
+        if approximate:
+            sample_rows = max(column.sample_rows or 0 for column in columns)
+            lines.append(f"(~ estimated from a {sample_rows}-row sample, ± 95% bound; "
+                         f"distinct counts within the stated factor)")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _format_nulls(columns: List[ColumnProfile]) -> str:
+        return pd.Series(
+            [_estimate(column.nulls, column.nulls_error) for column in columns],
+            index=[column.name for column in columns],
+            dtype=object
+        ).to_string()
+
+def _estimate(value: int, error: int = 0, ratio: float = 1.0):
+    if ratio > 1.0:
+        return f"~{value} (x/÷{ratio:.1f})"
+    if error:
+        return f"~{value} ± {error}"
+    return value
@@ -40,7 +40,11 @@ class DataProcessor:
 
     def _process_instruction(self, df: pd.DataFrame, instruction: str, iteration: int) -> pd.DataFrame:
         try:
-            code = self.generator.generate_code(instruction, list(df.columns))
+            code = self.generator.generate_code(
+                instruction,
+                list(df.columns),
+                df.dtypes.astype(str).to_dict()
+            )
             print("\nProposed code:")
             print(code)
             
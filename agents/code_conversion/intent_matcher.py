@@ -0,0 +1,219 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+# Words that narrow an instruction to one kind of column, e.g. "numeric columns"
+NUMERIC_WORDS = {'numeric', 'numerical', 'number', 'numbers'}
+TEXT_WORDS = {'text', 'string', 'strings', 'categorical', 'category', 'categories'}
+
+# Words any instruction may contain without changing what it asks for
+FILLER_WORDS = {
+    'a', 'an', 'the', 'all', 'any', 'each', 'every', 'column', 'columns', 'col', 'cols', 'field', 'fields',
+    'feature', 'features', 'in', 'from', 'of', 'for', 'on', 'and', 'to', 'by', 'with', 'using', 'please',
+    'data', 'dataframe', 'df', 'dataset', 'table', 'value', 'values'
+} | NUMERIC_WORDS | TEXT_WORDS
+
+NULL_WORDS = {'missing', 'null', 'nulls', 'nan', 'nans', 'na', 'empty', 'none', 'blank', 'blanks'}
+MINMAX_WORDS = {'minmax', 'minmaxscaler', 'min', 'max', 'normalize', 'normalise', 'normalized', 'range'}
+STANDARD_WORDS = {'standard', 'standardscaler', 'standardize', 'standardise', 'standardized', 'z', 'zscore'}
+
+@dataclass
+class IntentMatch:
+    """A recognized instruction and the vetted code that carries it out"""
+    intent: str
+    code: str
+    columns: List = field(default_factory=list)
+
+@dataclass
+class _Intent:
+    name: str
+    vocabulary: Set[str]
+    applies: Callable[[Set[str]], bool]
+    build: Callable[[List, Dict[str, str], Set[str]], Optional[str]]
+
+def _is_numeric(dtype: Optional[str]) -> bool:
+    return dtype is None or bool(re.match(r'(?i)(u?int\d|float)', dtype))
+
+def _is_text(dtype: Optional[str]) -> bool:
+    return dtype is None or dtype in ('object', 'category') or dtype.startswith('str')
+
+def _targets(mentioned: List, dtypes: Dict[str, str], words: Set[str],
+             wanted: Callable[[Optional[str]], bool]) -> Optional[List]:
+    """Mentioned columns if they all have a suitable dtype; otherwise every suitable column"""
+    checks = [wanted] + [kind for kind, qualifiers in ((_is_numeric, NUMERIC_WORDS), (_is_text, TEXT_WORDS))
+                         if words & qualifiers]
+    wanted = lambda dtype: all(check(dtype) for check in checks)
+    if mentioned:
+        return mentioned if all(wanted(dtypes.get(str(column))) for column in mentioned) else None
+    if not dtypes:
+        return None
+    return [column for column, dtype in dtypes.items() if wanted(dtype)] or None
+
+def _drop_duplicates(mentioned: List, dtypes: Dict[str, str], words: Set[str]) -> Optional[str]:
+    if mentioned:
+        return f"df = df.drop_duplicates(subset={mentioned!r})"
+    if words & {'column', 'columns'}:
+        return None  # duplicate *columns* are a different operation
+    return "df = df.drop_duplicates()"
+
+def _drop_columns(mentioned: List, dtypes: Dict[str, str], words: Set[str]) -> Optional[str]:
+    return f"df = df.drop(columns={mentioned!r})" if mentioned else None
+
+def _fill_nulls(mentioned: List, dtypes: Dict[str, str], words: Set[str]) -> Optional[str]:
+    strategies = [strategy for strategy, synonyms in (('mean', {'mean', 'average'}), ('median', {'median'}),
+                                                      ('mode', {'mode', 'frequent'}), ('zero', {'zero', 'zeros', '0'}))
+                  if words & synonyms]
+    if len(strategies) != 1:
+        return None
+    strategy = strategies[0]
+    if strategy == 'zero':
+        return f"df[{mentioned!r}] = df[{mentioned!r}].fillna(0)" if mentioned else "df = df.fillna(0)"
+    columns = _targets(mentioned, dtypes, words, _is_numeric if strategy in ('mean', 'median') else lambda dtype: True)
+    if columns is None:
+        return None
+    if strategy == 'mode':
+        return "\n".join(f"if df[{column!r}].notna().any():\n"
+                         f"    df[{column!r}] = df[{column!r}].fillna(df[{column!r}].mode().iloc[0])"
+                         for column in columns)
+    return "\n".join(f"df[{column!r}] = df[{column!r}].fillna(df[{column!r}].{strategy}())" for column in columns)
+
+def _strip_whitespace(mentioned: List, dtypes: Dict[str, str], words: Set[str]) -> Optional[str]:
+    columns = _targets(mentioned, dtypes, words, _is_text)
+    if columns is None:
+        return None
+    leading, trailing = 'leading' in words, 'trailing' in words
+    method = 'lstrip' if leading and not trailing else 'rstrip' if trailing and not leading else 'strip'
+    # Non-string cells (numbers, missing values) are left exactly as they were
+    return "\n".join(f"df[{column!r}] = df[{column!r}].str.{method}().fillna(df[{column!r}])" for column in columns)
+
+def _label_encode(mentioned: List, dtypes: Dict[str, str], words: Set[str]) -> Optional[str]:
+    columns = _targets(mentioned, dtypes, words, _is_text)
+    if columns is None:
+        return None
+    return "\n".join(f"df[{column!r}] = LabelEncoder().fit_transform(df[{column!r}].astype(str))"
+                     for column in columns)
+
+def _scale(mentioned: List, dtypes: Dict[str, str], words: Set[str]) -> Optional[str]:
+    minmax, standard = bool(words & MINMAX_WORDS), bool(words & STANDARD_WORDS)
+    if minmax == standard:
+        return None  # "scale" alone, or both kinds named
+    columns = _targets(mentioned, dtypes, words, _is_numeric)
+    if columns is None:
+        return None
+    scaler = 'MinMaxScaler' if minmax else 'StandardScaler'
+    return f"df[{columns!r}] = {scaler}().fit_transform(df[{columns!r}])"
+
+INTENTS = [
+    _Intent('drop_duplicates',
+            {'drop', 'remove', 'delete', 'eliminate', 'duplicate', 'duplicates', 'duplicated', 'row', 'rows',
+             'entries', 'records', 'based', 'keep', 'first'},
+            lambda words: bool(words & {'duplicate', 'duplicates', 'duplicated'}
+                               and words & {'drop', 'remove', 'delete', 'eliminate'}),
+            _drop_duplicates),
+    _Intent('drop_columns', {'drop', 'remove', 'delete'},
+            lambda words: bool(words & {'drop', 'remove', 'delete'}),
+            _drop_columns),
+    _Intent('fill_nulls',
+            {'fill', 'replace', 'impute', 'filling', 'mean', 'average', 'median', 'mode', 'most', 'frequent',
+             'zero', 'zeros', '0', 'their', 'its'} | NULL_WORDS,
+            lambda words: bool(words & {'fill', 'replace', 'impute', 'filling'} and words & NULL_WORDS),
+            _fill_nulls),
+    _Intent('strip_whitespace',
+            {'strip', 'trim', 'whitespace', 'whitespaces', 'space', 'spaces', 'leading', 'trailing', 'extra',
+             'remove'},
+            # A bare "remove spaces" may mean every space, not just the ends; leave that to the model
+            lambda words: bool(words & {'strip', 'trim', 'leading', 'trailing'}),
+            _strip_whitespace),
+    _Intent('label_encode', {'label', 'encode', 'encoding', 'labelencoder', 'encoder', 'apply'},
+            lambda words: 'labelencoder' in words or 'label' in words and bool(words & {'encode', 'encoding'}),
+            _label_encode),
+    _Intent('scale',
+            {'scale', 'scaling', 'scaler', 'apply', 'score', 'between', '1', '0'} | MINMAX_WORDS | STANDARD_WORDS,
+            lambda words: bool(words & (MINMAX_WORDS | STANDARD_WORDS)),
+            _scale),
+]
+
+VOCABULARY = FILLER_WORDS.union(*(intent.vocabulary for intent in INTENTS))
+
+# The new name is one token or a quoted name; anything after it ("and drop city", ", name to
+# full_name") leaves the instruction to the model
+_RENAME = re.compile(r"^\s*rename\s+(?:the\s+)?(?:column\s+)?(?P<old>.+?)\s+(?:column\s+)?(?:to|as|into)\s+"
+                     r"(?:(?P<quote>['\"`])(?P<quoted>[^'\"`]+)(?P=quote)|(?P<token>[\w-]+))\s*\.?\s*$",
+                     re.IGNORECASE)
+
+class IntentMatcher:
+    """Recognizes common cleaning instructions and writes their code without asking the model.
+
+    An instruction only matches when every word in it is accounted for by one intent's
+    vocabulary or by a column name, so anything unusual falls through to the model.
+    """
+    def __init__(self):
+        self.matches = 0
+        self.misses = 0
+
+    @property
+    def match_rate(self) -> float:
+        total = self.matches + self.misses
+        return self.matches / total if total else 0.0
+
+    def match(self, instruction: str, columns: List, dtypes: Optional[Dict[str, str]] = None) -> Optional[IntentMatch]:
+        result = self._match(instruction, list(columns), {str(k): str(v) for k, v in (dtypes or {}).items()})
+        if result is None:
+            self.misses += 1
+        else:
+            self.matches += 1
+        return result
+
+    def _match(self, instruction: str, columns: List, dtypes: Dict[str, str]) -> Optional[IntentMatch]:
+        renamed = self._rename(instruction, columns)
+        if renamed is not None:
+            return renamed
+
+        words, mentioned = self._tokenize(instruction, columns)
+        if not words and not mentioned:
+            return None
+        word_set = set(words)
+        for intent in INTENTS:
+            if not intent.applies(word_set) or not word_set <= intent.vocabulary | FILLER_WORDS:
+                continue
+            code = intent.build(mentioned, dtypes, word_set)
+            return IntentMatch(intent.name, code, mentioned) if code is not None else None
+        return None
+
+    def _rename(self, instruction: str, columns: List) -> Optional[IntentMatch]:
+        found = _RENAME.match(instruction)
+        if found is None:
+            return None
+        old_name = found.group('old').strip().strip('\'"`')
+        new_name = (found.group('quoted') or found.group('token')).strip()
+        by_name = {str(column).lower(): column for column in columns}
+        column = by_name.get(old_name.lower())
+        if column is None or not new_name or new_name in by_name:
+            return None
+        return IntentMatch('rename', f"df = df.rename(columns={{{column!r}: {new_name!r}}})", [column])
+
+    @staticmethod
+    def _tokenize(instruction: str, columns: List):
+        """The instruction's words, with mentioned columns taken out in the order they appear.
+
+        Columns named like a vocabulary word ("mean", "values") only count when quoted.
+        """
+        text = instruction.lower()
+        found = []
+        for column in sorted(columns, key=lambda c: len(str(c)), reverse=True):
+            name = re.escape(str(column).lower())
+            if not name:
+                continue
+            if str(column).lower() in VOCABULARY:
+                pattern = rf"(['\"`]){name}\1"
+            else:
+                pattern = rf"(['\"`]?)(?<![\w]){name}(?![\w])\1"
+            for hit in re.finditer(pattern, text):
+                found.append((hit.start(), column))
+            text = re.sub(pattern, lambda hit: ' ' * len(hit.group(0)), text)
+        mentioned = []
+        for _, column in sorted(found, key=lambda item: item[0]):
+            if column not in mentioned:
+                mentioned.append(column)
+        words = re.findall(r"[a-z0-9']+", text.replace("'s ", " "))
+        return [word.strip("'") for word in words if word.strip("'")], mentioned
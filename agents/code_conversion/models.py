@@ -1,5 +1,25 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+@dataclass
+class ColumnProfile:
+    """Per-column statistics; estimated fields carry a 95% error bound (0 when exact)"""
+    name: Any
+    dtype: str
+    rows: int
+    nulls: int
+    distinct: int
+    memory_bytes: int
+    min: Any = None
+    max: Any = None
+    nulls_error: int = 0
+    distinct_error: float = 1.0  # ratio bound: the true value is within [distinct / e, distinct * e]
+    memory_error: int = 0
+    sample_rows: Optional[int] = None  # None when computed over every row
+
+    @property
+    def sampled(self) -> bool:
+        return self.sample_rows is not None
 
 @dataclass
 class DataState:
@@ -7,6 +27,7 @@ class DataState:
     head: str
     info: str
     null_info: str
+    columns: List[ColumnProfile] = field(default_factory=list)
 
 @dataclass
 class CleaningHistoryEntry:
@@ -15,6 +36,8 @@ class CleaningHistoryEntry:
     instruction: str
     code: str
     successful: bool
+    chunk_safe: Optional[bool] = None  # None means "detect from the code" when replaying
+    changes: str = ''  # Column-level summary of what the step changed
 
 class CleaningHistory:
     """Manages cleaning history entries"""
@@ -25,4 +48,23 @@ class CleaningHistory:
         self.entries.append(entry)
 
     def get_all_entries(self) -> List[CleaningHistoryEntry]:
-        return self.entries
\ No newline at end of file
+        return self.entries
+
+    def truncate(self, length: int):
+        del self.entries[length:]
+
+    def head(self, length: int) -> 'CleaningHistory':
+        """A copy holding only the first ``length`` entries"""
+        history = CleaningHistory()
+        history.entries = self.entries[:max(length, 0)]
+        return history
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'entries': [asdict(entry) for entry in self.entries]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CleaningHistory':
+        history = cls()
+        for entry in data.get('entries', []):
+            history.add_entry(CleaningHistoryEntry(**entry))
+        return history
\ No newline at end of file
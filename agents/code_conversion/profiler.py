@@ -0,0 +1,171 @@
+import math
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from data_processor.fingerprint import fingerprint
+from utils.config import PROFILE_CACHE_ENTRIES, PROFILE_SAMPLE_ROWS, PROFILE_SAMPLE_THRESHOLD_ROWS
+from .models import ColumnProfile
+
+Z_95 = 1.96
+POINTER_BYTES = 8
+
+class DataProfiler:
+    """Per-column profiling with a cache keyed on column content fingerprints.
+
+    After a cleaning step only the columns whose content changed are profiled again. Columns
+    with native dtypes (numbers, datetimes, booleans, extension arrays) are always profiled
+    exactly, since every statistic is one vectorized pass. Object columns of frames with more
+    than ``sample_threshold`` rows are profiled from a uniform sample of ``sample_rows`` rows:
+    null counts and memory come with a 95% confidence bound and the distinct count uses the
+    GEE estimator, whose ratio error is at most ``sqrt(rows / sample_rows)``.
+    """
+    def __init__(self, sample_threshold: int = PROFILE_SAMPLE_THRESHOLD_ROWS,
+                 sample_rows: int = PROFILE_SAMPLE_ROWS, cache_entries: int = PROFILE_CACHE_ENTRIES,
+                 seed: int = 0):
+        self.sample_threshold = sample_threshold
+        self.sample_rows = sample_rows
+        self.cache_entries = cache_entries
+        self.seed = seed
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[tuple, ColumnProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def profile(self, df: pd.DataFrame, sampled: Optional[bool] = None) -> List[ColumnProfile]:
+        """Profile every column of ``df``; ``sampled`` forces (or disables) the sampled mode"""
+        if sampled is None:
+            sampled = bool(self.sample_threshold) and len(df) > self.sample_threshold
+        sample_rows = min(self.sample_rows, len(df)) if sampled and self.sample_rows < len(df) else None
+        positions = None
+        profiles = []
+        for position, name in enumerate(df.columns):
+            series = df.iloc[:, position]
+            key = (fingerprint(series), sample_rows)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+            if cached is None:
+                if sample_rows is not None and positions is None:
+                    positions = self._sample_positions(len(df), sample_rows)
+                if positions is not None and series.dtype == object:
+                    cached = self._profile_sampled(series, positions)
+                else:
+                    cached = self._profile_exact(series, positions)
+                self._remember(key, cached)
+            profiles.append(replace(cached, name=name))
+        return profiles
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _remember(self, key: tuple, profile: ColumnProfile) -> None:
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = profile
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def _sample_positions(self, rows: int, sample_rows: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        return np.sort(rng.choice(rows, size=sample_rows, replace=False))
+
+    @staticmethod
+    def _profile_exact(series: pd.Series, positions: Optional[np.ndarray] = None) -> ColumnProfile:
+        """Exact statistics; with ``positions`` only the distinct count is estimated from the sample"""
+        minimum, maximum = _min_max(series)
+        nulls = int(series.isna().sum())
+        if positions is None:
+            distinct, distinct_error = _nunique(series), 1.0
+        else:
+            distinct, distinct_error = _estimate_distinct(series.iloc[positions], len(series), len(series) - nulls)
+        return ColumnProfile(
+            name=series.name,
+            dtype=str(series.dtype),
+            rows=len(series),
+            nulls=nulls,
+            distinct=distinct,
+            memory_bytes=int(series.memory_usage(deep=True, index=False)),
+            min=minimum,
+            max=maximum,
+            distinct_error=distinct_error,
+            sample_rows=None if positions is None else len(positions)
+        )
+
+    @staticmethod
+    def _profile_sampled(series: pd.Series, positions: np.ndarray) -> ColumnProfile:
+        rows, n = len(series), len(positions)
+        sample = series.iloc[positions]
+        correction = math.sqrt((rows - n) / (rows - 1)) if rows > 1 else 0.0
+
+        # Null count: Wilson interval on the sampled null fraction, scaled to the full column
+        null_fraction = float(sample.isna().mean())
+        nulls_error = _wilson_half_width(null_fraction, n) * correction * rows
+        distinct, distinct_error = _estimate_distinct(sample, rows, rows * (1 - null_fraction))
+
+        # Memory: per-row object size (pointer + object) averaged over the sample
+        row_bytes = sample.map(_object_size, na_action=None).to_numpy(dtype='float64')
+        memory = row_bytes.mean() * rows if n else 0.0
+        memory_error = Z_95 * row_bytes.std(ddof=1) / math.sqrt(n) * correction * rows if n > 1 else 0.0
+
+        return ColumnProfile(
+            name=series.name,
+            dtype=str(series.dtype),
+            rows=rows,
+            nulls=int(round(null_fraction * rows)),
+            distinct=distinct,
+            memory_bytes=int(round(memory)),
+            nulls_error=int(math.ceil(nulls_error)),
+            distinct_error=distinct_error,
+            memory_error=int(math.ceil(memory_error)),
+            sample_rows=n
+        )
+
+def _estimate_distinct(sample: pd.Series, rows: int, non_null_rows: float):
+    """GEE estimate: sqrt(N/n) * singletons + values seen more than once, within a factor sqrt(N/n)"""
+    counts = _value_counts(sample)
+    scale = math.sqrt(rows / len(sample)) if len(sample) else 1.0
+    distinct = scale * int((counts == 1).sum()) + int((counts > 1).sum())
+    return int(round(min(distinct, non_null_rows))), scale
+
+def _wilson_half_width(fraction: float, n: int) -> float:
+    if n == 0:
+        return 1.0
+    denominator = 1 + Z_95 ** 2 / n
+    return Z_95 / denominator * math.sqrt(fraction * (1 - fraction) / n + Z_95 ** 2 / (4 * n ** 2))
+
+def _object_size(value) -> int:
+    return POINTER_BYTES + sys.getsizeof(value)
+
+def _value_counts(series: pd.Series) -> pd.Series:
+    try:
+        return series.value_counts(dropna=True)
+    except TypeError:  # unhashable cells such as lists or dicts
+        return series[series.notna()].astype(str).value_counts()
+
+def _nunique(series: pd.Series) -> int:
+    try:
+        return int(series.nunique(dropna=True))
+    except TypeError:
+        return int(series[series.notna()].astype(str).nunique())
+
+def _min_max(series: pd.Series):
+    """Min/max for orderable native dtypes; object columns are skipped (mixed types, slow)"""
+    if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype) and not series.cat.ordered:
+        return None, None
+    try:
+        return _scalar(series.min()), _scalar(series.max())
+    except (TypeError, ValueError):
+        return None, None
+
+def _scalar(value):
+    if value is pd.NaT or value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
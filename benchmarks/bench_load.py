@@ -0,0 +1,107 @@
+"""Benchmark DataProcessor.load_data on large synthetic CSV files.
+
+Each load mode runs in a fresh subprocess so peak RSS is measured in isolation.
+
+    python -m benchmarks.bench_load --sizes 1 2 5 10 --data-dir /mnt/scratch
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Generated datasets are kept between runs, outside the working tree
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'bench_data')
+
+MODES = {
+    'default': {'large_file': False},
+    'pyarrow': {'large_file': True},
+    'pyarrow+arrow_dtypes': {'large_file': True, 'use_arrow_dtypes': True},
+    'chunked': {'large_file': False, 'chunksize': 1_000_000},
+}
+
+def generate_csv(path: str, size_gb: float, seed: int = 0) -> None:
+    """Append blocks of mixed-type rows until the file reaches ``size_gb``"""
+    target = int(size_gb * 1024 ** 3)
+    rng = np.random.default_rng(seed)
+    categories = np.array(['alpha', 'beta', 'gamma', 'delta', 'epsilon'])
+    header = True
+    with open(path, 'w', encoding='utf-8') as handle:
+        while handle.tell() < target:
+            rows = 500_000
+            block = pd.DataFrame({
+                'id': rng.integers(0, 1 << 40, rows),
+                'amount': rng.normal(100, 25, rows).round(2),
+                'count': rng.integers(0, 1000, rows),
+                'category': categories[rng.integers(0, len(categories), rows)],
+                'flag': rng.integers(0, 2, rows).astype(bool),
+                'label': rng.integers(0, 10_000, rows).astype(str),
+            })
+            block.to_csv(handle, index=False, header=header)
+            header = False
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process.
+
+    ``VmHWM`` is used on Linux because ``ru_maxrss`` survives ``exec`` and would report
+    the parent's peak for a freshly spawned child.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_mode(path: str, mode: str) -> dict:
+    """Load ``path`` in a child process and report wall time and peak RSS"""
+    script = (
+        "import json, sys, time\n"
+        "from benchmarks.bench_load import peak_rss_mb\n"
+        "from data_processor.processor import DataProcessor\n"
+        "options = json.loads(sys.argv[2])\n"
+        "start = time.perf_counter()\n"
+        "df = DataProcessor(None).load_data(sys.argv[1], **options)\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'seconds': elapsed, 'peak_rss_mb': peak_rss_mb(), 'rows': len(df)}))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', script, path, json.dumps(MODES[mode])],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 2, 5, 10], help="file sizes in GB")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--keep', action='store_true', help="keep generated files")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    print(f"{'size_gb':>8} {'mode':<22} {'seconds':>9} {'peak_rss_mb':>12} {'rows':>12}")
+    for size in args.sizes:
+        path = os.path.join(args.data_dir, f"bench_{size:g}gb.csv")
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            generate_csv(path, size)
+            print(f"generated {path} in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        for mode in args.modes:
+            result = run_mode(path, mode)
+            print(f"{size:>8g} {mode:<22} {result['seconds']:>9.2f} {result['peak_rss_mb']:>12.0f} {result['rows']:>12}")
+        if not args.keep:
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
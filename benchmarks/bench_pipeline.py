@@ -0,0 +1,273 @@
+"""Benchmark the app's load -> generate -> execute -> export path end to end.
+
+Synthetic CSV datasets of several shapes (wide, tall, string-heavy, mixed) and sizes are
+cleaned with a fixed list of instructions. Code generation goes through the real
+``CodeGenerator`` but a deterministic stand-in answers instead of the DeepInfra model,
+so runs are reproducible offline. Every (shape, size) runs ``--repeat`` times in fresh
+subprocesses; wall time and peak RSS are reported per stage (the medians over the runs).
+Peak RSS is the high-water mark within the stage (reset through ``/proc/self/clear_refs``
+on Linux; elsewhere it is the process peak so far).
+
+    python -m benchmarks.bench_pipeline --sizes small medium
+    python -m benchmarks.bench_pipeline --save-baseline      # record this machine's baseline
+    python -m benchmarks.bench_pipeline --check              # exit 1 on a regression
+
+Baselines are machine specific: record one on the machine that runs the checks.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_load import DATA_DIR, peak_rss_mb
+
+STAGES = ('load', 'generate', 'execute', 'export')
+SIZES = {'small': 20_000, 'medium': 200_000, 'large': 2_000_000}
+# Rows relative to the size: the wide dataset has ~150 columns, the tall one 5
+ROW_FACTORS = {'wide': 0.1, 'tall': 5, 'strings': 1, 'mixed': 1}
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'pipeline.json')
+
+COMMON_STEPS = [
+    ("fill missing amount values with the median",
+     "df['amount'] = df['amount'].fillna(df['amount'].median())"),
+    ("remove rows with a duplicate id",
+     "df = df.drop_duplicates(subset=['id'])"),
+    ("add the log of amount as amount_log",
+     "df['amount_log'] = np.log1p(df['amount'].clip(lower=0))"),
+]
+STEPS = {
+    'wide': COMMON_STEPS + [
+        ("standardize every feature column",
+         "features = [column for column in df.columns if column.startswith('f_')]\n"
+         "df[features] = (df[features] - df[features].mean()) / df[features].std()"),
+    ],
+    'tall': COMMON_STEPS + [
+        ("drop rows where count is above 990",
+         "df = df[df['count'] <= 990]"),
+    ],
+    'strings': COMMON_STEPS + [
+        ("trim and lowercase name, city and email",
+         "for column in ['name', 'city', 'email']:\n"
+         "    df[column] = df[column].str.strip().str.lower()"),
+    ],
+    'mixed': COMMON_STEPS + [
+        ("convert the date column to datetime",
+         "df['date'] = pd.to_datetime(df['date'])"),
+    ],
+}
+
+class CannedModel:
+    """Deterministic stand-in for the DeepInfra model: answers each known instruction with fixed code"""
+    model_name = "canned"
+    system_prompt = ""
+    temperature = 0.0
+
+    def __init__(self, steps):
+        self.steps = steps
+
+    def generate_response(self, prompt: str) -> str:
+        for instruction, code in self.steps:
+            if instruction in prompt:
+                return f"Here is the code:\n```python\n{code}\n```"
+        raise KeyError("No canned answer for this prompt")
+
+def make_dataset(shape: str, rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    amount = rng.normal(100, 25, rows).round(2)
+    amount[rng.random(rows) < 0.05] = np.nan
+    frame = {'id': rng.integers(0, rows * 2, rows), 'amount': amount}
+    if shape == 'wide':
+        frame['segment'] = np.array(['a', 'b', 'c', 'd'])[rng.integers(0, 4, rows)]
+        for feature in range(150):
+            frame[f'f_{feature:03d}'] = rng.random(rows).round(4)
+    elif shape == 'tall':
+        frame['count'] = rng.integers(0, 1000, rows)
+        frame['flag'] = rng.integers(0, 2, rows).astype(bool)
+    elif shape == 'strings':
+        letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+        names = ["".join(word) for word in letters[rng.integers(0, 26, (rows, 8))]]
+        frame['name'] = [f"  {name.title()} " for name in names]
+        frame['city'] = np.array(['Berlin', 'Cairo', 'Damascus', 'Lima', 'Oslo', 'Tokyo'])[rng.integers(0, 6, rows)]
+        frame['email'] = [f"{name}@Example.com" for name in names]
+        frame['comment'] = np.array(['ok', 'late delivery', 'damaged box', 'great service', ''])[rng.integers(0, 5, rows)]
+    elif shape == 'mixed':
+        frame['count'] = rng.integers(0, 1000, rows)
+        frame['category'] = np.array(['alpha', 'beta', 'gamma', 'delta'])[rng.integers(0, 4, rows)]
+        frame['label'] = rng.integers(0, 10_000, rows).astype(str)
+        frame['date'] = (np.datetime64('2020-01-01') + rng.integers(0, 1500, rows).astype('timedelta64[D]')).astype(str)
+        frame['flag'] = rng.integers(0, 2, rows).astype(bool)
+    else:
+        raise ValueError(f"Unknown dataset shape: {shape}")
+    return pd.DataFrame(frame)
+
+def dataset_rows(shape: str, size: str) -> int:
+    return int(SIZES[size] * ROW_FACTORS[shape])
+
+def reset_peak_rss() -> bool:
+    """Reset the peak RSS counter (Linux); returns False where that is not possible"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+@contextmanager
+def _measure(stage: str, results: dict):
+    reset_peak_rss()
+    start = time.perf_counter()
+    yield
+    result = results.setdefault(stage, {'seconds': 0.0, 'peak_rss_mb': 0.0})
+    result['seconds'] += time.perf_counter() - start
+    result['peak_rss_mb'] = max(result['peak_rss_mb'], peak_rss_mb())
+
+def run_pipeline(path: str, shape: str, export_format: str) -> dict:
+    """Run the app's cleaning path over ``path`` once and return per-stage measurements"""
+    import tempfile
+    from agents.code_conversion.code_generator import CodeGenerator
+    from agents.code_conversion.models import CleaningHistory, CleaningHistoryEntry
+    from data_processor.execution import run_code
+    from data_processor.history import DataFrameHistory
+    from data_processor.processor import DataProcessor
+    from utils.config import EXPORT_SPOOL_MAX_MB, HISTORY_MEMORY_BUDGET_MB
+
+    run_code('df = df', pd.DataFrame())  # pay the imports before measuring
+    processor = DataProcessor(None)
+    generator = CodeGenerator(CannedModel(STEPS[shape]))
+    results = {}
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        with _measure('load', results):
+            df = processor.load_data(path)
+            history = DataFrameHistory(memory_budget_bytes=HISTORY_MEMORY_BUDGET_MB * 1024 * 1024, spill_dir=spill_dir)
+            history.push(df)
+            cleaning_history = CleaningHistory()
+
+        for instruction, _ in STEPS[shape]:
+            with _measure('generate', results):
+                code = generator.generate_code(instruction, list(df.columns), df.dtypes.astype(str).to_dict())
+            with _measure('execute', results):
+                result = processor.execute_step(df, code)
+                if result.changed:
+                    history.push(result.df)
+                    cleaning_history.add_entry(CleaningHistoryEntry(
+                        iteration=len(history) - 1,
+                        instruction=instruction,
+                        code=result.code,
+                        successful=True,
+                        changes=result.diff.summary() if result.diff else ''
+                    ))
+                    df = result.df
+
+        with _measure('export', results):
+            with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MB * 1024 * 1024) as buffer:
+                processor.save_data(df, buffer, export_format)
+        history.clear()
+
+    results['rows'] = len(df)
+    return results
+
+def run_case(path: str, shape: str, export_format: str) -> dict:
+    """``run_pipeline`` in a fresh subprocess, so memory is measured in isolation"""
+    script = (
+        "import json, sys\n"
+        "from benchmarks.bench_pipeline import run_pipeline\n"
+        "print(json.dumps(run_pipeline(sys.argv[1], sys.argv[2], sys.argv[3])))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', script, os.path.abspath(path), shape, export_format],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def summarize(runs: list) -> dict:
+    """Median seconds and peak RSS of each stage over repeated runs"""
+    return {
+        stage: {
+            metric: statistics.median(run[stage][metric] for run in runs)
+            for metric in ('seconds', 'peak_rss_mb')
+        }
+        for stage in STAGES
+    }
+
+def find_regressions(results: dict, baseline: dict, threshold: float, min_seconds: float, min_rss_mb: float) -> list:
+    """Stages slower or bigger than the baseline by more than ``threshold`` (and the absolute floor)"""
+    regressions = []
+    for case, stages in results.items():
+        for stage, metrics in stages.items():
+            expected = baseline.get(case, {}).get(stage)
+            if expected is None:
+                continue
+            for metric, floor in (('seconds', min_seconds), ('peak_rss_mb', min_rss_mb)):
+                value, reference = metrics[metric], expected[metric]
+                if value > reference * (1 + threshold) and value - reference > floor:
+                    regressions.append(f"{case} {stage} {metric}: {value:.3f} vs baseline {reference:.3f}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', nargs='+', default=list(STEPS), choices=list(STEPS))
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=list(SIZES))
+    parser.add_argument('--format', default='parquet', help="export format (see data_processor.export)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per case; medians are reported")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--check', action='store_true', help="compare against the baseline, exit 1 on regression")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed relative slowdown/growth")
+    parser.add_argument('--min-seconds', type=float, default=0.15,
+                        help="ignore time differences below this (small cases vary by ~0.1s between runs)")
+    parser.add_argument('--min-rss-mb', type=float, default=16, help="ignore memory differences below this")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    print(f"{'case':<16} {'stage':<9} {'seconds':>9} {'peak_rss_mb':>12}")
+    for size in args.sizes:
+        for shape in args.shapes:
+            path = os.path.join(args.data_dir, f"pipeline_{shape}_{size}.csv")
+            if not os.path.exists(path):
+                make_dataset(shape, dataset_rows(shape, size)).to_csv(path, index=False)
+            case = f"{shape}/{size}"
+            results[case] = summarize([run_case(path, shape, args.format) for _ in range(args.repeat)])
+            for stage, metrics in results[case].items():
+                print(f"{case:<16} {stage:<9} {metrics['seconds']:>9.3f} {metrics['peak_rss_mb']:>12.0f}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as handle:
+                baseline = json.load(handle)
+        baseline.setdefault('results', {}).update(results)
+        baseline['machine'] = f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}"
+        baseline['format'] = args.format
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+
+    if args.check:
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        if baseline.get('format') != args.format:
+            print(f"Baseline was recorded with --format {baseline.get('format')}", file=sys.stderr)
+            return 2
+        regressions = find_regressions(results, baseline['results'], args.threshold, args.min_seconds, args.min_rss_mb)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against the baseline", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
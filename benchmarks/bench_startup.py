@@ -0,0 +1,83 @@
+"""Measure the app's cold start, first paint and warm rerun times.
+
+Each run uses a fresh interpreter. ``import_seconds`` is the time to import ``main``;
+``first_run_seconds`` is the first script run under Streamlit's ``AppTest``, up to the
+first complete page; ``rerun_seconds`` is the next run in the same process (what every
+``st.rerun()`` costs), once any background imports have finished. ``--compare REF``
+measures another commit the same way, from a temporary git worktree.
+
+    python -m benchmarks.bench_startup --repeat 5 --compare HEAD~1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+METRICS = ('import_seconds', 'first_run_seconds', 'rerun_seconds')
+
+SCRIPT = (
+    "import importlib, json, sys, time\n"
+    "from streamlit.testing.v1 import AppTest\n"
+    "start = time.perf_counter()\n"
+    "import main\n"
+    "imported = time.perf_counter()\n"
+    "app = AppTest.from_file('main.py', default_timeout=120)\n"
+    "start_run = time.perf_counter()\n"
+    "app.run()\n"
+    "first_run = time.perf_counter()\n"
+    "importlib.import_module('agents.code_conversion.agent')  # wait for any background preloading\n"
+    "start_rerun = time.perf_counter()\n"
+    "app.run()\n"
+    "rerun = time.perf_counter()\n"
+    "assert not app.exception, app.exception\n"
+    "print(json.dumps({'import_seconds': imported - start, 'first_run_seconds': first_run - start_run,\n"
+    "                  'rerun_seconds': rerun - start_rerun}))\n"
+)
+
+def measure(root: str, sandbox: bool = False) -> dict:
+    """One cold start of the app in ``root`` in a fresh interpreter"""
+    with tempfile.TemporaryDirectory() as log_dir:
+        env = dict(os.environ, LOG_DIR=log_dir, SANDBOX_ENABLED=str(sandbox).lower(),
+                   CODE_CACHE_PATH=os.path.join(log_dir, 'code_cache.sqlite3'))
+        env.setdefault('DEEPINFRA_API_TOKEN', 'benchmark')
+        output = subprocess.run(
+            [sys.executable, '-c', SCRIPT], cwd=root, env=env, capture_output=True, text=True, check=True
+        )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def measure_repeated(root: str, repeat: int, sandbox: bool) -> dict:
+    runs = [measure(root, sandbox) for _ in range(repeat)]
+    return {metric: statistics.median(run[metric] for run in runs) for metric in METRICS}
+
+def measure_ref(root: str, ref: str, repeat: int, sandbox: bool) -> dict:
+    """Measure commit ``ref`` from a temporary worktree of the repository at ``root``"""
+    worktree = tempfile.mkdtemp(prefix='bench_startup_')
+    subprocess.run(['git', 'worktree', 'add', '--detach', worktree, ref], cwd=root,
+                   check=True, capture_output=True)
+    try:
+        return measure_repeated(worktree, repeat, sandbox)
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', worktree], cwd=root, capture_output=True)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help="cold starts per tree; medians are reported")
+    parser.add_argument('--compare', metavar='REF', help="also measure this git commit")
+    parser.add_argument('--sandbox', action='store_true', help="start the sandbox worker as the app would")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {'working tree': measure_repeated(root, args.repeat, args.sandbox)}
+    if args.compare:
+        results[args.compare] = measure_ref(root, args.compare, args.repeat, args.sandbox)
+
+    print(f"{'tree':<14} {'import_s':>9} {'first_run_s':>12} {'rerun_s':>9}")
+    for tree, result in results.items():
+        print(f"{tree:<14} {result['import_seconds']:>9.3f} {result['first_run_seconds']:>12.3f} "
+              f"{result['rerun_seconds']:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark the peak memory of one cleaning step with eager copies vs. copy-on-write.
+
+Each (rows, snippet, mode) combination runs in a fresh subprocess. The frame is built
+first, then the snippet is executed through ``run_code`` with ``tracemalloc`` running
+(numpy and pandas report their buffers to it), so ``step_peak_mb`` is the peak memory
+the step allocated on top of the frame. RSS is not used because the allocator reuses
+pages freed while building the frame.
+
+    python -m benchmarks.bench_step --rows 1000000 5000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+MODES = {
+    'eager_copy': False,
+    'copy_on_write': True,
+}
+
+# Typical single-column instructions: the eager path copies every column for each of them
+SNIPPETS = {
+    'fillna_one_column': "df['amount'] = df['amount'].fillna(0)",
+    'add_column': "df['amount_x2'] = df['amount'] * 2",
+    'drop_column': "df = df.drop(columns=['label'])",
+    'loc_assign': "df.loc[df['count'] > 900, 'count'] = 900",
+}
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    amount = rng.normal(100, 25, rows)
+    amount[rng.random(rows) < 0.05] = np.nan
+    frame = {
+        'id': rng.integers(0, 1 << 40, rows),
+        'amount': amount,
+        'count': rng.integers(0, 1000, rows),
+        'label': rng.integers(0, 10_000, rows).astype(str),
+    }
+    for extra in range(8):
+        frame[f'feature_{extra}'] = rng.random(rows)
+    return pd.DataFrame(frame)
+
+def run_mode(rows: int, mode: str, snippet: str) -> dict:
+    script = (
+        "import json, sys, time, tracemalloc\n"
+        "from benchmarks.bench_step import SNIPPETS, make_frame\n"
+        "from data_processor.execution import run_code\n"
+        "df = make_frame(int(sys.argv[1]))\n"
+        "frame_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)\n"
+        "run_code('df = df', df.head())  # pay the imports before measuring\n"
+        "tracemalloc.start()\n"
+        "start = time.perf_counter()\n"
+        "result = run_code(SNIPPETS[sys.argv[3]], df, copy_on_write=sys.argv[2] == 'True')\n"
+        "elapsed = time.perf_counter() - start\n"
+        "peak = tracemalloc.get_traced_memory()[1]\n"
+        "print(json.dumps({'seconds': elapsed, 'frame_mb': frame_mb, 'step_peak_mb': peak / (1024 * 1024)}))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', script, str(rows), str(MODES[mode]), snippet],
+        cwd=root, capture_output=True, text=True, check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 5_000_000])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--snippets', nargs='+', default=list(SNIPPETS), choices=list(SNIPPETS))
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'snippet':<18} {'mode':<14} {'seconds':>8} {'frame_mb':>9} {'step_peak_mb':>13}")
+    for rows in args.rows:
+        for snippet in args.snippets:
+            for mode in args.modes:
+                result = run_mode(rows, mode, snippet)
+                print(f"{rows:>10} {snippet:<18} {mode:<14} {result['seconds']:>8.3f} "
+                      f"{result['frame_mb']:>9.0f} {result['step_peak_mb']:>13.0f}")
+
+if __name__ == "__main__":
+    main()
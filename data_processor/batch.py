@@ -0,0 +1,262 @@
+"""Apply a saved cleaning pipeline to many files without the UI or the language model.
+
+    python -m data_processor.batch pipeline.json "data/*.csv" --output-dir cleaned --workers 4
+
+Each input is processed in its own worker process: a failure (or crash) in one file is
+reported and does not stop the others. Consecutive steps are fused and only the columns the
+pipeline uses are read (see ``compiler``); ``--columns used`` also drops the untouched columns
+from the output, which lets CSV inputs skip parsing them too. A summary is printed, and written as JSON with
+``--report``; the exit status is 1 when any file failed.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from utils.logger import forward_logs, worker_log_queue
+
+from .export import EXPORT_FORMATS
+
+INPUT_EXTENSIONS = ('csv', 'txt', 'xlsx', 'xls', 'xlsm', 'json', 'parquet')
+
+@dataclass
+class FileResult:
+    """Outcome of running the pipeline on one input file"""
+    input_path: str
+    output_path: Optional[str] = None
+    status: str = 'ok'
+    rows_in: int = 0
+    rows_out: int = 0
+    load_seconds: float = 0.0
+    stage_seconds: List[float] = field(default_factory=list)
+    save_seconds: float = 0.0
+    total_seconds: float = 0.0
+    failed_step: Optional[int] = None
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+
+@dataclass
+class BatchReport:
+    pipeline: str
+    files: List[FileResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def failed(self) -> List[FileResult]:
+        return [result for result in self.files if result.status != 'ok']
+
+    def to_dict(self) -> Dict:
+        return {
+            'pipeline': self.pipeline,
+            'seconds': self.seconds,
+            'succeeded': len(self.files) - len(self.failed),
+            'failed': len(self.failed),
+            'files': [asdict(result) for result in self.files]
+        }
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Resolve directories (their supported files) and glob patterns to a sorted list of paths"""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for name in os.listdir(pattern):
+                path = os.path.join(pattern, name)
+                if os.path.isfile(path) and name.lower().split('.')[-1] in INPUT_EXTENSIONS:
+                    paths.add(path)
+        else:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+def output_paths_for(input_paths: List[str], output_dir: str, file_format: str) -> Dict[str, str]:
+    """Output path of each input, mirroring its directory relative to the inputs' common directory"""
+    if not input_paths:
+        return {}
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in input_paths])
+    return {path: output_path_for(path, output_dir, file_format, root) for path in input_paths}
+
+def output_path_for(input_path: str, output_dir: str, file_format: str, root: Optional[str] = None) -> str:
+    directory = os.path.relpath(os.path.dirname(os.path.abspath(input_path)), root) if root else ''
+    stem = os.path.basename(input_path)
+    for extension in sorted(INPUT_EXTENSIONS, key=len, reverse=True):
+        if stem.lower().endswith('.' + extension):
+            stem = stem[:-len(extension) - 1]
+            break
+    return os.path.normpath(os.path.join(output_dir, directory, f"{stem}.{EXPORT_FORMATS[file_format].extension}"))
+
+def process_file(pipeline: Dict, input_path: str, output_path: str, file_format: str,
+                 columns: str = 'all') -> FileResult:
+    """Load one file, run the compiled pipeline on it and save the result (runs in a worker)"""
+    from .compiler import compile_pipeline, failed_iteration, load_for_pipeline
+    from .pipeline import load_pipeline, pipeline_engine
+    from .processor import DataProcessor
+
+    result = FileResult(input_path=input_path, output_path=output_path)
+    start = time.perf_counter()
+    stage = None
+    try:
+        # The steps run with the engine they were written for
+        processor = DataProcessor(None, engine=pipeline_engine(pipeline))
+        compiled = compile_pipeline(load_pipeline(pipeline).get_all_entries(),
+                                    analyze=processor.engine.pandas_api)
+        df, finish = load_for_pipeline(processor, compiled, input_path, columns)
+        result.rows_in = len(df)
+        result.load_seconds = time.perf_counter() - start
+
+        for stage in compiled.stages:
+            stage_start = time.perf_counter()
+            df = processor.engine.run(stage.code, df)
+            result.stage_seconds.append(time.perf_counter() - stage_start)
+        stage = None
+
+        save_start = time.perf_counter()
+        df = finish(df)
+        processor.save_data(df, output_path, file_format)
+        result.save_seconds = time.perf_counter() - save_start
+        result.rows_out = len(df)
+    except Exception as e:
+        result.status = 'failed'
+        result.failed_step = failed_iteration(stage, e) if stage is not None else None
+        result.error = f"{type(e).__name__}: {e}"
+        result.traceback = traceback.format_exc()
+    result.total_seconds = time.perf_counter() - start
+    return result
+
+class BatchRunner:
+    """Runs a pipeline over many input files with a process pool"""
+    def __init__(self, pipeline_path: str, output_dir: str, file_format: str = 'parquet',
+                 workers: Optional[int] = None, columns: str = 'all'):
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        if columns not in ('all', 'used'):
+            raise ValueError(f"Unknown output columns mode: {columns}")
+        with open(pipeline_path, encoding='utf-8') as handle:
+            self.pipeline = json.load(handle)
+        from .engines import get_engine
+        from .pipeline import load_pipeline, pipeline_engine
+        load_pipeline(self.pipeline)  # fail fast on a malformed file
+        get_engine(pipeline_engine(self.pipeline))
+        self.pipeline_path = pipeline_path
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.workers = workers or os.cpu_count() or 1
+        self.columns = columns
+
+    def run(self, inputs: List[str], progress_callback=None) -> BatchReport:
+        os.makedirs(self.output_dir, exist_ok=True)
+        report = BatchReport(pipeline=self.pipeline_path)
+        start = time.perf_counter()
+        outputs = output_paths_for(inputs, self.output_dir, self.file_format)
+        inputs = self._skip_shared_outputs(inputs, outputs, report, progress_callback)
+        for path in inputs:
+            os.makedirs(os.path.dirname(outputs[path]) or '.', exist_ok=True)
+        unfinished = self._run_pool(inputs, outputs, self.workers, report, progress_callback)
+        # A worker that dies (e.g. out of memory) breaks the whole pool, so the files that were
+        # still in flight are retried one per pool to find out which one actually crashes
+        for path in unfinished:
+            if self._run_pool([path], outputs, 1, report, progress_callback):
+                result = FileResult(input_path=path, status='crashed', error="Worker process died")
+                report.files.append(result)
+                if progress_callback:
+                    progress_callback(result)
+        report.files.sort(key=lambda result: result.input_path)
+        report.seconds = time.perf_counter() - start
+        return report
+
+    @staticmethod
+    def _skip_shared_outputs(inputs: List[str], outputs: Dict[str, str], report: BatchReport,
+                             progress_callback) -> List[str]:
+        """Fail the inputs whose output path another input would overwrite (x.csv and x.parquet)"""
+        by_output: Dict[str, List[str]] = {}
+        for path in inputs:
+            by_output.setdefault(outputs[path], []).append(path)
+        remaining = []
+        for path in inputs:
+            sharing = by_output[outputs[path]]
+            if len(sharing) == 1:
+                remaining.append(path)
+                continue
+            others = ", ".join(other for other in sharing if other != path)
+            result = FileResult(input_path=path, output_path=outputs[path], status='failed',
+                                error=f"Output path {outputs[path]} is shared with {others}")
+            report.files.append(result)
+            if progress_callback:
+                progress_callback(result)
+        return remaining
+
+    def _run_pool(self, inputs: List[str], outputs: Dict[str, str], workers: int, report: BatchReport,
+                  progress_callback) -> List[str]:
+        """Process ``inputs`` and return the ones lost to a broken pool"""
+        unfinished = []
+        context = multiprocessing.get_context('spawn')
+        if not inputs:
+            return unfinished
+        with ProcessPoolExecutor(max_workers=min(workers, len(inputs)), mp_context=context,
+                                 initializer=forward_logs, initargs=(worker_log_queue(),)) as pool:
+            futures = {
+                pool.submit(process_file, self.pipeline, path, outputs[path], self.file_format,
+                            self.columns): path
+                for path in inputs
+            }
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    unfinished.append(futures[future])
+                    continue
+                report.files.append(result)
+                if progress_callback:
+                    progress_callback(result)
+        return unfinished
+
+def format_report(report: BatchReport) -> str:
+    lines = [f"{'status':<8} {'rows_in':>10} {'rows_out':>10} {'seconds':>8}  file"]
+    for result in report.files:
+        lines.append(
+            f"{result.status:<8} {result.rows_in:>10} {result.rows_out:>10} {result.total_seconds:>8.2f}  {result.input_path}"
+        )
+        if result.error:
+            step = f" at step {result.failed_step}" if result.failed_step is not None else ""
+            lines.append(f"{'':<8} error{step}: {result.error}")
+    lines.append(
+        f"{len(report.files) - len(report.failed)} succeeded, {len(report.failed)} failed "
+        f"in {report.seconds:.2f}s"
+    )
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pipeline', help="pipeline file exported from the app (JSON)")
+    parser.add_argument('inputs', nargs='+', help="input files, directories or glob patterns")
+    parser.add_argument('--output-dir', default='cleaned')
+    parser.add_argument('--format', default='parquet', choices=list(EXPORT_FORMATS))
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--columns', default='all', choices=['all', 'used'],
+                        help="output every input column, or only the ones the pipeline uses")
+    parser.add_argument('--report', help="write the summary report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print("No input files matched", file=sys.stderr)
+        return 2
+
+    runner = BatchRunner(args.pipeline, args.output_dir, args.format, args.workers, args.columns)
+    report = runner.run(inputs, progress_callback=lambda result: print(
+        f"[{result.status}] {result.input_path} ({result.total_seconds:.2f}s)", file=sys.stderr
+    ))
+    print(format_report(report))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as handle:
+            json.dump(report.to_dict(), handle, indent=2, default=str)
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
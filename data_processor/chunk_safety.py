@@ -0,0 +1,277 @@
+import ast
+from typing import Dict, Optional, Set
+
+import pandas as pd
+
+# Series / DataFrame methods whose result for a row only depends on that row (elementwise
+# operations, row filters and column bookkeeping); _RowLocalChecker narrows a few by argument.
+# Anything not listed is assumed to look at other rows.
+ROW_LOCAL_METHODS = {
+    'astype', 'fillna', 'replace', 'map', 'apply', 'isna', 'notna', 'isnull', 'notnull', 'abs', 'round',
+    'clip', 'where', 'mask', 'between', 'isin', 'rename', 'drop', 'dropna', 'query', 'filter', 'assign',
+    'copy', 'add', 'sub', 'mul', 'div', 'truediv', 'floordiv', 'mod', 'pow', 'radd', 'rsub', 'rmul',
+    'rdiv', 'rtruediv', 'eq', 'ne', 'lt', 'gt', 'le', 'ge', 'combine_first', 'to_frame', 'any', 'all',
+}
+# Methods that are elementwise on the .str / .dt accessors (and on plain values inside a lambda)
+# but mean something else on a Series (Series.count, Series.get, ...)
+ELEMENT_METHODS = {
+    'lower', 'upper', 'title', 'capitalize', 'casefold', 'swapcase', 'strip', 'lstrip', 'rstrip',
+    'split', 'rsplit', 'contains', 'startswith', 'endswith', 'match', 'fullmatch', 'extract', 'findall',
+    'slice', 'get', 'len', 'pad', 'zfill', 'center', 'ljust', 'rjust', 'join', 'cat', 'count', 'find',
+    'isdigit', 'isnumeric', 'isalpha', 'isalnum', 'isspace', 'isdecimal', 'islower', 'isupper', 'format',
+    'replace', 'strftime', 'normalize', 'floor', 'ceil', 'round', 'tz_localize', 'tz_convert', 'day_name',
+    'month_name', 'total_seconds',
+}
+ACCESSORS = {'str', 'dt'}
+# Datetime and timedelta fields of the .dt accessor
+DT_FIELDS = {
+    'year', 'month', 'day', 'hour', 'minute', 'second', 'microsecond', 'date', 'time', 'dayofweek',
+    'day_of_week', 'weekday', 'dayofyear', 'day_of_year', 'quarter', 'is_month_start', 'is_month_end',
+    'days', 'seconds',
+}
+# Module members that work element by element
+MODULE_MEMBERS = {
+    'pd': {'to_datetime', 'to_numeric', 'to_timedelta', 'isna', 'notna', 'isnull', 'notnull', 'NA', 'NaT',
+           'Timestamp', 'Timedelta'},
+    'np': {'where', 'select', 'log', 'log1p', 'log2', 'log10', 'exp', 'expm1', 'sqrt', 'abs', 'absolute',
+           'round', 'floor', 'ceil', 'clip', 'isnan', 'isfinite', 'isinf', 'maximum', 'minimum', 'sign',
+           'nan', 'inf', 'pi', 'int64', 'float64', 'int32', 'float32', 'bool_', 'sin', 'cos', 'tan',
+           'power', 'logical_and', 'logical_or', 'logical_not'},
+    're': {'sub', 'match', 'search', 'fullmatch', 'findall', 'split', 'compile', 'escape', 'IGNORECASE', 'I'},
+    'math': {'log', 'log1p', 'exp', 'sqrt', 'floor', 'ceil', 'isnan', 'fabs', 'nan', 'inf', 'pi'},
+}
+SAFE_MODULES = {'pandas': 'pd', 'numpy': 'np', 're': 're', 'math': 'math'}
+SAFE_BUILTINS = {'str', 'int', 'float', 'bool', 'abs', 'round', 'isinstance', 'None', 'True', 'False'}
+# Builtins that reduce a whole column outside a lambda but work on one value inside it
+ELEMENT_BUILTINS = {'len', 'min', 'max'}
+# Methods whose lambda receives one cell (or one row with axis=1) rather than a whole chunk
+ELEMENT_CALLBACKS = {'apply', 'map', 'replace'}
+
+def is_chunk_safe(code: str, frame: str = 'df') -> bool:
+    """Conservatively decide whether ``code`` gives the same rows when run chunk by chunk.
+
+    Only code built entirely from known row-local operations qualifies; any function, method or
+    construct the checker does not know (statistics, ordering, encoders, positional access,
+    user-defined helpers, ...) makes the step unsafe.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    return _RowLocalChecker(frame).statements(tree.body)
+
+class _RowLocalChecker:
+    def __init__(self, frame: str):
+        self.frame = frame
+        self.names: Set[str] = {frame}
+        # Local alias -> key of MODULE_MEMBERS; generated code gets pd and np without importing them
+        self.modules: Dict[str, str] = {'pd': 'pd', 'np': 'np'}
+        self.loop_names: Set[str] = set()  # bound to literal column labels
+        # Inside a lambda, values are single cells or rows, and only these names may be used
+        self.lambda_names: Set[str] = set()
+        self.lambda_depth = 0
+
+    # -- statements ----------------------------------------------------------------------------
+
+    def statements(self, body) -> bool:
+        return all(self.statement(node) for node in body)
+
+    def statement(self, node: ast.stmt) -> bool:
+        if isinstance(node, ast.Import):
+            return all(self._import(alias.name, alias.asname or alias.name) for alias in node.names)
+        if isinstance(node, ast.Assign):
+            return self.expression(node.value) and all(self.target(target) for target in node.targets)
+        if isinstance(node, ast.AugAssign):
+            return self.expression(node.value) and self.target(node.target)
+        if isinstance(node, ast.Expr):
+            return self.expression(node.value)
+        if isinstance(node, ast.For):
+            # Loops over a literal list of columns: for col in ['a', 'b']: ...
+            if (not isinstance(node.iter, (ast.List, ast.Tuple)) or node.orelse
+                    or not isinstance(node.target, ast.Name)
+                    or not all(isinstance(element, ast.Constant) for element in node.iter.elts)):
+                return False
+            self.names.add(node.target.id)
+            self.loop_names.add(node.target.id)
+            return self.statements(node.body)
+        return isinstance(node, ast.Pass)  # from-imports, defs, if/while/with, ...
+
+    def target(self, node: ast.expr) -> bool:
+        if isinstance(node, ast.Name):
+            self.names.add(node.id)
+            return True
+        if isinstance(node, ast.Subscript):
+            return self._subscript(node)
+        if isinstance(node, ast.Attribute):
+            return self._is_frame(node.value) and node.attr == 'columns'
+        return False
+
+    def _import(self, module: str, alias: str) -> bool:
+        if module not in SAFE_MODULES:
+            return False
+        self.modules[alias] = SAFE_MODULES[module]
+        return True
+
+    # -- expressions ---------------------------------------------------------------------------
+
+    def expression(self, node: Optional[ast.expr]) -> bool:
+        if node is None or isinstance(node, ast.Constant):
+            return True
+        if isinstance(node, ast.Name):
+            if node.id in self.modules or node.id in SAFE_BUILTINS:
+                return True
+            if self.lambda_depth > 0:
+                # The frame, its columns or anything computed from them would be seen one chunk
+                # at a time: max(df['a']), len(df), df['a'].count(), ...
+                return node.id in self.lambda_names or node.id in self.loop_names or node.id in ELEMENT_BUILTINS
+            return node.id in self.names
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            return all(self.expression(element) for element in node.elts)
+        if isinstance(node, ast.Dict):
+            return all(self.expression(part) for part in [*node.keys, *node.values])
+        if isinstance(node, ast.BinOp):
+            return self.expression(node.left) and self.expression(node.right)
+        if isinstance(node, ast.UnaryOp):
+            return self.expression(node.operand)
+        if isinstance(node, ast.BoolOp):
+            return all(self.expression(value) for value in node.values)
+        if isinstance(node, ast.Compare):
+            return self.expression(node.left) and all(self.expression(value) for value in node.comparators)
+        if isinstance(node, ast.IfExp):
+            return all(self.expression(part) for part in (node.test, node.body, node.orelse))
+        if isinstance(node, ast.JoinedStr):
+            return all(self.expression(value) for value in node.values)
+        if isinstance(node, ast.FormattedValue):
+            return self.expression(node.value) and self.expression(node.format_spec)
+        if isinstance(node, ast.Subscript):
+            return self._subscript(node)
+        if isinstance(node, ast.Attribute):
+            return self._attribute(node)
+        if isinstance(node, ast.Call):
+            return self._call(node)
+        return False
+
+    def _lambda(self, node: ast.Lambda) -> bool:
+        if node.args.vararg or node.args.kwarg or node.args.defaults or node.args.kwonlyargs:
+            return False
+        outer = set(self.lambda_names)
+        self.lambda_names.update(argument.arg for argument in node.args.args)
+        self.lambda_depth += 1
+        try:
+            return self.expression(node.body)
+        finally:
+            self.lambda_depth -= 1
+            self.lambda_names = outer
+
+    def _subscript(self, node: ast.Subscript) -> bool:
+        value, key = node.value, node.slice
+        if not self.expression(value):
+            return False
+        if self._is_loc(value):
+            # df.loc[mask, cols]: the row part must be a mask or ':', never a row label
+            rows, *columns = key.elts if isinstance(key, ast.Tuple) else [key]
+            if isinstance(rows, ast.Slice):
+                if rows.lower is not None or rows.upper is not None or rows.step is not None:
+                    return False
+            elif isinstance(rows, ast.Constant) or not self.expression(rows):
+                return False
+            return all(self.expression(column) for column in columns)
+        if self._is_frame(value):
+            # Column labels and boolean masks; positional slices pick different rows per chunk
+            return not isinstance(key, ast.Slice) and self.expression(key)
+        if (self.lambda_depth > 0 or isinstance(value, (ast.Dict, ast.List, ast.Tuple, ast.Constant))
+                or isinstance(value, ast.Attribute) and value.attr == 'str'):
+            # Cells and rows inside a lambda, literal lookups and .str[...] element slicing
+            if isinstance(key, ast.Slice):
+                return all(self.expression(part) for part in (key.lower, key.upper, key.step))
+            return self.expression(key)
+        return False  # series[0], series[1:3], ... look rows up by label or position
+
+    def _attribute(self, node: ast.Attribute) -> bool:
+        if isinstance(node.value, ast.Name) and node.value.id in self.modules:
+            return node.attr in MODULE_MEMBERS[self.modules[node.value.id]]
+        if not self.expression(node.value):
+            return False
+        if self._is_frame(node.value):
+            # df.loc, df.columns, df.column_name
+            return node.attr in ('loc', 'columns') or not hasattr(pd.DataFrame, node.attr)
+        if node.attr in ACCESSORS:
+            return True
+        if node.attr in DT_FIELDS:
+            return self._is_accessor(node.value, 'dt')
+        return False
+
+    def _call(self, node: ast.Call) -> bool:
+        if any(keyword.arg is None for keyword in node.keywords) or any(
+                isinstance(argument, ast.Starred) for argument in node.args):
+            return False
+        func = node.func
+        arguments = [*node.args, *(keyword.value for keyword in node.keywords)]
+        # A lambda passed anywhere else (assign, loc, where, pipe, ...) receives the whole chunk
+        if any(isinstance(argument, ast.Lambda) for argument in arguments) and not (
+                isinstance(func, ast.Attribute) and func.attr in ELEMENT_CALLBACKS):
+            return False
+        if not all(self._lambda(argument) if isinstance(argument, ast.Lambda) else self.expression(argument)
+                   for argument in arguments):
+            return False
+        keywords = {keyword.arg: keyword.value for keyword in node.keywords}
+        if isinstance(func, ast.Name):
+            return func.id in SAFE_BUILTINS or self.lambda_depth > 0 and func.id in ELEMENT_BUILTINS
+        if not isinstance(func, ast.Attribute):
+            return False
+        if isinstance(func.value, ast.Name) and func.value.id in self.modules:
+            return func.attr in MODULE_MEMBERS[self.modules[func.value.id]]
+        if not self.expression(func.value):
+            return False
+        if self._is_accessor(func.value, 'str') or self._is_accessor(func.value, 'dt') or (
+                self.lambda_depth > 0 and not self._is_frame(func.value)):
+            return func.attr in ELEMENT_METHODS or func.attr in ROW_LOCAL_METHODS
+        return func.attr in ROW_LOCAL_METHODS and self._method_is_row_local(func, keywords, node.args)
+
+    def _method_is_row_local(self, func: ast.Attribute, keywords, args) -> bool:
+        method, receiver = func.attr, func.value
+        axis = keywords.get('axis')
+        by_row = isinstance(axis, ast.Constant) and axis.value in (1, 'columns')
+        whole_frame = self._is_frame(receiver) or self._is_frame_selection(receiver)
+        if method in ('fillna', 'replace'):
+            return 'method' not in keywords and 'limit' not in keywords  # ffill/bfill reach other rows
+        if method == 'astype':
+            dtype = args[0] if args else keywords.get('dtype')
+            # Categories would be inferred per chunk
+            return dtype is not None and not any(isinstance(part, ast.Constant) and part.value == 'category'
+                                                 for part in ast.walk(dtype))
+        if method in ('any', 'all'):
+            return whole_frame and by_row  # otherwise a reduction over rows
+        if method == 'apply':
+            return by_row or not whole_frame  # DataFrame.apply works column by column by default
+        if method == 'drop':
+            return 'columns' in keywords or by_row  # dropping index labels depends on the chunk
+        if method == 'dropna':
+            return not by_row  # dropping columns looks at every row
+        if method == 'rename':
+            return 'index' not in keywords and ('columns' in keywords or by_row or not whole_frame)
+        if method == 'query':
+            # Only plain comparisons: no method calls, @variables or index references
+            query = args[0] if args else keywords.get('expr')
+            return (isinstance(query, ast.Constant) and isinstance(query.value, str)
+                    and not any(token in query.value for token in ('(', '@', 'index')))
+        return True
+
+    # -- helpers -------------------------------------------------------------------------------
+
+    def _is_frame(self, node: ast.expr) -> bool:
+        # A lambda parameter named like the frame is a cell or row, not the frame
+        return isinstance(node, ast.Name) and node.id == self.frame and self.frame not in self.lambda_names
+
+    @staticmethod
+    def _is_loc(node: ast.expr) -> bool:
+        return isinstance(node, ast.Attribute) and node.attr == 'loc'
+
+    @staticmethod
+    def _is_accessor(node: ast.expr, accessor: str) -> bool:
+        return isinstance(node, ast.Attribute) and node.attr == accessor
+
+    def _is_frame_selection(self, node: ast.expr) -> bool:
+        # df[['a', 'b']] is a frame, df['a'] a Series
+        return (isinstance(node, ast.Subscript) and self._is_frame(node.value)
+                and isinstance(node.slice, (ast.List, ast.Tuple)))
@@ -0,0 +1,445 @@
+import ast
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+from agents.code_conversion.models import CleaningHistoryEntry
+
+# DataFrame methods whose column footprint can be read from their arguments; any other method
+# (fillna(0), apply, query, ...) may touch every column and makes the step opaque
+ROW_SELECTING_METHODS = ('head', 'tail')
+LABEL_PRESERVING_METHODS = ('copy',)
+SCALAR_ATTRIBUTES = ('shape', 'empty', 'size', 'ndim', 'index')
+
+@dataclass
+class StepAnalysis:
+    """Columns one step reads, writes, drops and renames, as far as static analysis can tell.
+
+    ``opaque`` steps use the frame in a way whose column footprint is unknown (``df.columns``,
+    ``df.fillna(0)``, passing ``df`` to a function, ...); a pipeline containing one is never
+    projected.
+    """
+    reads: List = field(default_factory=list)
+    writes: List = field(default_factory=list)
+    drops: List = field(default_factory=list)
+    renames: Dict = field(default_factory=dict)
+    changes_rows: bool = False
+    keeps_index: bool = True
+    opaque_reason: Optional[str] = None
+
+    @property
+    def opaque(self) -> bool:
+        return self.opaque_reason is not None
+
+@dataclass
+class CompiledStage:
+    """Consecutive steps fused into one snippet, executed with a single namespace"""
+    code: str
+    iterations: List[int]
+    line_starts: List[int]
+    chunk_safe: Optional[bool] = None
+
+    def iteration_at_line(self, lineno: int) -> Optional[int]:
+        """Map a line of the fused code (e.g. from a traceback) back to its step"""
+        iteration = None
+        for start, step in zip(self.line_starts, self.iterations):
+            if lineno >= start:
+                iteration = step
+        return iteration
+
+@dataclass
+class CompiledPipeline:
+    stages: List[CompiledStage]
+    steps: List[StepAnalysis]
+    required_columns: Optional[List]  # input columns the pipeline reads; None when unknown
+    touched_columns: List  # input columns written, dropped or renamed (never passed through)
+    renames: Dict
+    keeps_alignment: bool  # result rows can be matched to input rows by index label
+
+    @property
+    def projectable(self) -> bool:
+        return self.required_columns is not None
+
+    def input_columns(self, available: Iterable) -> Optional[List]:
+        """Columns to load from a source with ``available`` columns; None means all of them"""
+        if not self.projectable:
+            return None
+        # Columns that are only overwritten, renamed away or dropped never need to be read
+        return [column for column in available if column in self.required_columns]
+
+    def passthrough_columns(self, available: Iterable) -> List:
+        """Input columns no step uses; they can be attached to the result unprocessed"""
+        if not self.projectable:
+            return []
+        skip = set(self.required_columns) | set(self.touched_columns)
+        return [column for column in available if column not in skip]
+
+    def assemble(self, result: pd.DataFrame, passthrough: pd.DataFrame, available: Iterable) -> pd.DataFrame:
+        """Re-attach ``passthrough`` columns, keeping the input column order (renamed in place)"""
+        if passthrough.shape[1] == 0:
+            return result
+        if not self.keeps_alignment:
+            raise ValueError("Pipeline results cannot be aligned with the input rows")
+        # Rows are matched by label, so filtered and reordered results pick up their own rows
+        aligned = passthrough if result.index.equals(passthrough.index) else passthrough.loc[result.index]
+
+        order, seen = [], set()
+        for column in available:
+            column = self.renames.get(column, column)
+            if column in seen:
+                continue
+            if column in aligned.columns or column in result.columns:
+                order.append(column)
+                seen.add(column)
+        order += [column for column in result.columns if column not in seen]
+        combined = pd.concat([result, aligned], axis=1)
+        return combined[order]
+
+def analyze_step(code: str, frame: str = 'df') -> StepAnalysis:
+    """Statically find the columns of ``frame`` that ``code`` reads and writes"""
+    analysis = StepAnalysis()
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        analysis.opaque_reason = f"syntax error: {e.msg}"
+        return analysis
+    _StepAnalyzer(frame, analysis).run(tree)
+    return analysis
+
+def compile_pipeline(entries: Iterable[CleaningHistoryEntry], fuse_by=None, analyze: bool = True) -> CompiledPipeline:
+    """Analyze and fuse the successful steps of a pipeline.
+
+    Consecutive steps are fused into one stage; ``fuse_by`` (a function of the entry) splits
+    stages wherever its value changes, e.g. chunk-safety for out-of-core replay. Steps that are
+    not pandas code (``analyze=False``) are treated as opaque, so nothing is projected.
+    """
+    entries = [entry for entry in entries if entry.successful]
+    steps = [analyze_step(entry.code) if analyze else StepAnalysis(opaque_reason="not pandas code")
+             for entry in entries]
+
+    stages: List[CompiledStage] = []
+    for entry in entries:
+        key = fuse_by(entry) if fuse_by else None
+        header = f"# step {entry.iteration}: {' '.join(entry.instruction.split())}"
+        if stages and stages[-1].chunk_safe == key:
+            stage = stages[-1]
+            stage.line_starts.append(stage.code.count("\n") + 2)
+            stage.code += "\n" + header + "\n" + entry.code
+            stage.iterations.append(entry.iteration)
+        else:
+            stages.append(CompiledStage(header + "\n" + entry.code, [entry.iteration], [1], key))
+
+    opaque = next((step for step in steps if step.opaque), None)
+    required, touched, created, renames = [], [], set(), {}
+    for step in steps:
+        for column in step.reads:
+            if column not in created and column not in required:
+                required.append(column)
+        for column in [*step.writes, *step.drops, *step.renames]:
+            if column not in created and column not in touched:
+                touched.append(column)
+        created.update(step.writes)
+        created.update(step.renames.values())
+        for old, new in step.renames.items():
+            original = next((key for key, value in renames.items() if value == old), old)
+            renames[original] = new
+
+    return CompiledPipeline(
+        stages=stages,
+        steps=steps,
+        required_columns=None if opaque else required,
+        touched_columns=touched,
+        renames=renames,
+        keeps_alignment=all(step.keeps_index for step in steps)
+    )
+
+def load_for_pipeline(processor, compiled: CompiledPipeline, source, output: str = 'all'):
+    """Load ``source`` reading only the columns ``compiled`` needs.
+
+    Returns ``(df, finish)``; call ``finish(result)`` on the pipeline result to get the output.
+    With ``output='used'`` the output only has the columns the pipeline reads or writes. With
+    ``output='all'`` every input column is kept: columns no step uses are read separately and
+    re-attached unprocessed, which only pays off (and is only done) for columnar Parquet files.
+    """
+    if output not in ('all', 'used'):
+        raise ValueError(f"Unknown output columns mode: {output}")
+    available = processor.source_columns(source) if compiled.projectable else None
+    usecols = compiled.input_columns(available) if available is not None else None
+    columnar = str(source).lower().endswith('.parquet')
+    if not usecols or (output == 'all' and not (columnar and compiled.keeps_alignment)):
+        return processor.load_data(source), lambda result: result
+
+    passthrough = compiled.passthrough_columns(available) if output == 'all' else []
+    processor.logger.info(f"Reading {len(usecols)} of {len(available)} columns used by the pipeline")
+    df = processor.load_data(source, usecols=usecols)
+    if not passthrough:
+        return df, lambda result: result
+    return df, lambda result: compiled.assemble(result, processor.load_data(source, usecols=passthrough), available)
+
+def failed_iteration(stage: CompiledStage, error: BaseException) -> Optional[int]:
+    """The step of a fused stage that raised ``error``, from the traceback of the executed code"""
+    lines = [frame.lineno for frame in traceback.extract_tb(error.__traceback__) if frame.filename == '<string>']
+    return stage.iteration_at_line(lines[-1]) if lines else stage.iterations[0]
+
+class _Opaque(Exception):
+    pass
+
+class _StepAnalyzer:
+    """Follows every use of the frame variable up its chain of attribute/subscript/call parents"""
+    def __init__(self, frame: str, analysis: StepAnalysis):
+        self.frame = frame
+        self.analysis = analysis
+        self.parents: Dict[ast.AST, ast.AST] = {}
+
+    def run(self, tree: ast.AST) -> None:
+        for parent in ast.walk(tree):
+            for child in ast.iter_child_nodes(parent):
+                self.parents[child] = parent
+        names = [node for node in ast.walk(tree) if isinstance(node, ast.Name) and node.id == self.frame]
+        try:
+            for name in sorted(names, key=lambda node: (node.lineno, node.col_offset)):
+                if isinstance(name.ctx, ast.Load):
+                    self._follow(name)
+                elif not self._is_rebinding(name):
+                    raise _Opaque(f"'{self.frame}' is bound in an unsupported way")
+        except _Opaque as e:
+            self.analysis.opaque_reason = str(e)
+
+    # -- chain walking -------------------------------------------------------------------------
+
+    def _follow(self, node: ast.AST) -> None:
+        kind = 'frame'
+        while kind == 'frame':
+            parent = self.parents.get(node)
+            if isinstance(parent, ast.Attribute) and parent.value is node:
+                node, kind = self._attribute(parent)
+            elif isinstance(parent, ast.Subscript) and parent.value is node:
+                node, kind = self._subscript(parent)
+            elif isinstance(parent, ast.Call) and node in parent.args and _is_name(parent.func, 'len'):
+                return
+            else:
+                self._check_frame_position(node, parent)
+                return
+
+    def _check_frame_position(self, node: ast.AST, parent: Optional[ast.AST]) -> None:
+        # A whole (possibly filtered) frame may only be assigned back to the frame variable or
+        # be an expression statement (in-place method calls)
+        if isinstance(parent, ast.Assign) and parent.value is node and all(
+                _is_name(target, self.frame) for target in parent.targets):
+            return
+        if isinstance(parent, ast.Expr):
+            return
+        raise _Opaque(f"'{self.frame}' is used as a whole frame")
+
+    def _check_not_rebound(self, node: ast.AST) -> None:
+        # df = df[['a', 'b']] (or a method chain on it) narrows the frame to those columns
+        parent = self.parents.get(node)
+        while (isinstance(parent, (ast.Attribute, ast.Subscript)) and parent.value is node
+               or isinstance(parent, ast.Call) and parent.func is node):
+            node, parent = parent, self.parents.get(parent)
+        if isinstance(parent, ast.Assign) and parent.value is node and any(
+                _is_name(target, self.frame) for target in parent.targets):
+            raise _Opaque(f"reassigns '{self.frame}' to a subset of its columns")
+
+    def _is_rebinding(self, name: ast.Name) -> bool:
+        parent = self.parents.get(name)
+        return isinstance(parent, ast.Assign) and name in parent.targets
+
+    def _attribute(self, node: ast.Attribute):
+        attr, parent = node.attr, self.parents.get(node)
+        if isinstance(parent, ast.Call) and parent.func is node and hasattr(pd.DataFrame, attr):
+            return parent, self._method(attr, parent)
+        if attr in ('loc', 'at') and isinstance(parent, ast.Subscript) and parent.value is node:
+            return self._loc(parent)
+        if attr == 'index' and isinstance(node.ctx, ast.Store):
+            self.analysis.keeps_index = False
+            return node, 'done'
+        if attr in SCALAR_ATTRIBUTES and isinstance(node.ctx, ast.Load):
+            return node, 'done'
+        if not hasattr(pd.DataFrame, attr) and isinstance(node.ctx, ast.Load):
+            self._read(attr)  # df.column_name
+            return node, 'done'
+        raise _Opaque(f"uses '{self.frame}.{attr}'")
+
+    def _subscript(self, node: ast.Subscript):
+        columns = _column_labels(node.slice)
+        if columns is not None:
+            self._column_access(node, columns, partial=False, selection=_is_selection(node.slice))
+            return node, 'done'
+        if isinstance(node.ctx, ast.Load) and _is_row_selector(node.slice):
+            self.analysis.changes_rows = True
+            return node, 'frame'
+        raise _Opaque(f"indexes '{self.frame}' with a non-literal key")
+
+    def _loc(self, node: ast.Subscript):
+        rows, cols = (node.slice.elts if isinstance(node.slice, ast.Tuple) and len(node.slice.elts) == 2
+                      else (node.slice, None))
+        all_rows = isinstance(rows, ast.Slice) and rows.lower is None and rows.upper is None and rows.step is None
+        if cols is None or (isinstance(cols, ast.Slice) and cols.lower is None and cols.upper is None):
+            if isinstance(node.ctx, ast.Load) and _is_row_selector(rows):
+                self.analysis.changes_rows = self.analysis.changes_rows or not all_rows
+                return node, 'frame'
+            raise _Opaque("assigns to whole rows with .loc")
+        columns = _column_labels(cols)
+        if columns is None:
+            raise _Opaque("selects .loc columns with a non-literal key")
+        if isinstance(node.ctx, ast.Load) and not all_rows:
+            self.analysis.changes_rows = True
+        self._column_access(node, columns, partial=not all_rows, selection=_is_selection(cols))
+        return node, 'done'
+
+    def _column_access(self, node: ast.Subscript, columns: List, partial: bool, selection: bool) -> None:
+        augmented = isinstance(self.parents.get(node), ast.AugAssign)
+        if isinstance(node.ctx, ast.Load):
+            for column in columns:
+                self._read(column)
+            if selection:
+                self._check_not_rebound(node)
+        elif isinstance(node.ctx, ast.Store):
+            for column in columns:
+                if partial or augmented:
+                    self._read(column)  # rows not assigned keep their old values
+                self._write(column)
+        else:
+            for column in columns:
+                self._drop(column)
+
+    def _method(self, method: str, call: ast.Call) -> str:
+        keywords = {keyword.arg: keyword.value for keyword in call.keywords if keyword.arg}
+        if any(keyword.arg is None for keyword in call.keywords):
+            raise _Opaque(f"passes **kwargs to {method}()")
+        inplace = isinstance(keywords.get('inplace'), ast.Constant) and keywords['inplace'].value is True
+        axis = _literal(keywords.get('axis'))
+        argument = call.args[0] if call.args else None
+
+        if method in ('dropna', 'drop_duplicates'):
+            subset = _column_labels(keywords.get('subset'))
+            if subset is None or axis in (1, 'columns'):
+                raise _Opaque(f"{method}() without a literal subset looks at every column")
+            for column in subset:
+                self._read(column)
+            self.analysis.changes_rows = True
+        elif method == 'drop':
+            columns = _column_labels(keywords.get('columns'))
+            if columns is None and axis in (1, 'columns'):
+                columns = _column_labels(keywords.get('labels', argument))
+            if columns is not None:
+                for column in columns:
+                    self._drop(column)
+            elif 'index' in keywords or (argument is not None and axis in (None, 0, 'index')):
+                self.analysis.changes_rows = True
+            else:
+                raise _Opaque("drop() with non-literal labels")
+        elif method == 'rename':
+            mapping = _literal(keywords.get('columns'))
+            if (not isinstance(mapping, dict) or not all(isinstance(name, str) for name in mapping.values())
+                    or argument is not None or 'index' in keywords):
+                raise _Opaque("rename() without a literal columns mapping")
+            for old, new in mapping.items():
+                self._read(old)
+                self._drop(old)
+                self._write(new)
+                self.analysis.renames[old] = new
+        elif method in ('fillna', 'astype'):
+            columns = _mapping_keys(keywords.get('value' if method == 'fillna' else 'dtype', argument))
+            if columns is None:
+                raise _Opaque(f"{method}() without a per-column mapping applies to every column")
+            for column in columns:
+                self._read(column)
+                self._write(column)
+        elif method == 'sort_values':
+            columns = _column_labels(keywords.get('by', argument))
+            if columns is None or axis in (1, 'columns'):
+                raise _Opaque("sort_values() without literal columns")
+            for column in columns:
+                self._read(column)
+            self.analysis.changes_rows = True  # reorders rows; labels follow them
+        elif method == 'sort_index':
+            if axis in (1, 'columns') or 'level' in keywords:
+                raise _Opaque("sort_index() over columns or levels")
+            self.analysis.changes_rows = True
+        elif method == 'assign':
+            if call.args:
+                raise _Opaque("assign() with positional arguments")
+            for column, value in keywords.items():
+                if isinstance(value, ast.Lambda):
+                    raise _Opaque("assign() with a callable")
+                self._write(column)
+        elif method == 'pop':
+            columns = _column_labels(argument)
+            if columns is None or len(columns) != 1:
+                raise _Opaque("pop() with a non-literal column")
+            self._read(columns[0])
+            self._drop(columns[0])
+            return 'done'
+        elif method == 'insert':
+            columns = _column_labels(call.args[1] if len(call.args) > 1 else keywords.get('column'))
+            if columns is None:
+                raise _Opaque("insert() with a non-literal column")
+            self._write(columns[0])
+            return 'done'
+        elif method == 'reset_index':
+            if _literal(keywords.get('drop')) is not True:
+                raise _Opaque("reset_index() without drop=True adds columns")
+            # New labels: result rows can no longer be matched to input rows
+            self.analysis.changes_rows = True
+            self.analysis.keeps_index = False
+        elif method in ROW_SELECTING_METHODS:
+            self.analysis.changes_rows = True
+        elif method not in LABEL_PRESERVING_METHODS:
+            raise _Opaque(f"calls {self.frame}.{method}()")
+        return 'done' if inplace else 'frame'
+
+    # -- recording ------------------------------------------------------------------------------
+
+    def _read(self, column) -> None:
+        if column not in self.analysis.reads:
+            self.analysis.reads.append(column)
+
+    def _write(self, column) -> None:
+        if column not in self.analysis.writes:
+            self.analysis.writes.append(column)
+
+    def _drop(self, column) -> None:
+        self._read(column)  # drop() and del raise for a column that was not loaded
+        if column not in self.analysis.drops:
+            self.analysis.drops.append(column)
+
+def _is_name(node: ast.AST, name: str) -> bool:
+    return isinstance(node, ast.Name) and node.id == name
+
+def _literal(node: Optional[ast.AST]):
+    if node is None:
+        return None
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+def _column_labels(node: Optional[ast.AST]) -> Optional[List]:
+    """Literal column label(s): 'a' or ['a', 'b'] -> list of labels; anything else -> None"""
+    value = _literal(node)
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, str) for item in value):
+        return list(value)
+    return None
+
+def _is_selection(node: ast.AST) -> bool:
+    return isinstance(node, (ast.List, ast.Tuple))
+
+def _mapping_keys(node: Optional[ast.AST]) -> Optional[List]:
+    """Keys of a dict display with literal string keys (the values may be any expression)"""
+    if not isinstance(node, ast.Dict) or not node.keys:
+        return None
+    keys = [_literal(key) for key in node.keys]
+    return keys if all(isinstance(key, str) for key in keys) else None
+
+def _is_row_selector(node: ast.AST) -> bool:
+    # Boolean masks and slices select rows; a name or 'a' + suffix could be a column label
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, (ast.BitAnd, ast.BitOr, ast.BitXor))
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, ast.Invert)
+    return isinstance(node, (ast.Compare, ast.BoolOp, ast.Call, ast.Slice))
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+INT_HEADROOM_BITS = 16
+
+@dataclass
+class DtypeChange:
+    """One column converted to a smaller dtype"""
+    column: object
+    before: str
+    after: str
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+def optimize_dtypes(df: pd.DataFrame, columns: Optional[Iterable] = None, category_max_ratio: float = 0.5,
+                    arrow_strings: bool = False) -> Tuple[pd.DataFrame, List[DtypeChange]]:
+    """Shrink column dtypes without changing any value; returns the new frame and what changed.
+
+    Integers are downcast to int32 when their magnitude leaves ``INT_HEADROOM_BITS`` of
+    headroom, floats to float32 only when every value survives the round trip, and string
+    columns whose distinct/total ratio is at most ``category_max_ratio`` become categoricals
+    (the rest become Arrow strings when ``arrow_strings`` is set). Only ``columns`` are considered when given; a
+    conversion is kept only if it actually saves memory. ``df`` itself is not modified.
+    """
+    targets = set(df.columns if columns is None else columns)
+    result, changes = None, []
+    for position, name in enumerate(df.columns):
+        if name not in targets:
+            continue
+        series = df.iloc[:, position]
+        converted = _shrink(series, category_max_ratio, arrow_strings)
+        if converted is None:
+            continue
+        bytes_before = int(series.memory_usage(deep=True, index=False))
+        bytes_after = int(converted.memory_usage(deep=True, index=False))
+        if bytes_after >= bytes_before:
+            continue
+        if result is None:
+            result = df.copy(deep=False)
+        result.isetitem(position, converted)
+        changes.append(DtypeChange(name, str(series.dtype), str(converted.dtype), bytes_before, bytes_after))
+    return (df if result is None else result), changes
+
+def _shrink(series: pd.Series, category_max_ratio: float, arrow_strings: bool) -> Optional[pd.Series]:
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or not isinstance(dtype, np.dtype):
+        return None  # booleans are already 1 byte; extension dtypes are left as chosen
+    if pd.api.types.is_integer_dtype(dtype):
+        # numpy wraps on integer overflow without an error, so never go below int32 and keep
+        # INT_HEADROOM_BITS spare: values * 65536 (or sums of many values) still fit
+        if dtype.itemsize <= 4 or len(series) == 0:
+            return None
+        limit = 2 ** (31 - INT_HEADROOM_BITS)
+        if series.min() <= -limit or series.max() >= limit:
+            return None
+        return series.astype(np.int32)
+    if pd.api.types.is_float_dtype(dtype):
+        if dtype == np.float32:
+            return None
+        values = series.to_numpy()
+        narrowed = values.astype(np.float32)
+        # Only lossless conversions: every value (and NaN position) must survive the round trip
+        if not np.array_equal(narrowed.astype(dtype), values, equal_nan=True):
+            return None
+        return pd.Series(narrowed, index=series.index, name=series.name)
+    if dtype == object:
+        non_null = series.dropna()
+        if len(non_null) == 0 or pd.api.types.infer_dtype(non_null, skipna=False) != 'string':
+            return None
+        if non_null.nunique() <= category_max_ratio * len(series):
+            return series.astype('category')
+        if arrow_strings:
+            try:
+                return series.astype('string[pyarrow]')
+            except ImportError:
+                return None
+    return None
+
+def expand_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with string categoricals (as ``optimize_dtypes`` makes them) back to object columns.
+
+    Returns ``df`` itself when there are none.
+    """
+    positions = [position for position, dtype in enumerate(df.dtypes)
+                 if isinstance(dtype, pd.CategoricalDtype) and dtype.categories.dtype == object]
+    if not positions:
+        return df
+    df = df.copy(deep=False)
+    for position in positions:
+        df.isetitem(position, df.iloc[:, position].astype(object))
+    return df
+
+def format_changes(changes: List[DtypeChange]) -> str:
+    return ", ".join(
+        f"{change.column}: {change.before} -> {change.after} (-{change.bytes_saved / (1024 * 1024):.1f} MB)"
+        for change in changes
+    )
@@ -0,0 +1,96 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .execution import run_code
+
+def _polars():
+    try:
+        import polars as pl
+    except ImportError as e:
+        raise ImportError("the polars engine requires the 'polars' package") from e
+    return pl
+
+def to_arrow_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with every column that is not pyarrow-backed yet converted (where Arrow can hold it)"""
+    positions = [position for position, dtype in enumerate(df.dtypes) if not isinstance(dtype, pd.ArrowDtype)]
+    if not positions:
+        return df
+    df = df.copy(deep=False)
+    for position in positions:
+        try:
+            df.isetitem(position, df.iloc[:, position].convert_dtypes(dtype_backend='pyarrow'))
+        except (TypeError, ValueError):
+            pass  # mixed or nested objects stay as they are
+    return df
+
+class PandasEngine:
+    """NumPy-backed pandas, the default: generated code gets ``df`` as a pandas DataFrame"""
+    name = 'pandas'
+    pandas_api = True  # code is pandas code: validated, analyzed for replay, answered by the fast path
+    arrow_dtypes = False  # load with pyarrow-backed dtypes
+
+    def run(self, code: str, df: pd.DataFrame) -> pd.DataFrame:
+        return run_code(code, df)
+
+    def finish(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Bring a loaded frame or a step result into the engine's representation"""
+        return df
+
+    def read(self, data_source, encoding: Optional[str], read_options: Dict) -> Optional[pd.DataFrame]:
+        """Read ``data_source`` with the engine's own reader; None leaves it to the pandas readers"""
+        return None
+
+class ArrowEngine(PandasEngine):
+    """pandas with pyarrow-backed dtypes: columnar strings and nullable types throughout"""
+    name = 'arrow'
+    arrow_dtypes = True
+
+    def finish(self, df: pd.DataFrame) -> pd.DataFrame:
+        return to_arrow_dtypes(df)
+
+class PolarsEngine(ArrowEngine):
+    """Each step runs as a Polars LazyFrame query, optimized as a whole and multi-threaded.
+
+    Session state stays Arrow-backed pandas (undo history, diffs, previews and export all
+    work on it), so conversion happens at the edges of a step; ``pl.from_pandas`` shares the
+    Arrow buffers. Polars has no index: step results get a fresh RangeIndex.
+    """
+    name = 'polars'
+    pandas_api = False
+
+    def run(self, code: str, df: pd.DataFrame) -> pd.DataFrame:
+        pl = _polars()
+        namespace = {'df': pl.from_pandas(df).lazy(), 'pl': pl, 'np': np}
+        exec(code, namespace)
+        result = namespace['df']
+        if isinstance(result, pl.LazyFrame):
+            result = result.collect()
+        if not isinstance(result, pl.DataFrame):
+            raise TypeError(f"'df' must be a polars LazyFrame or DataFrame after execution, got {type(result).__name__}")
+        return result.to_pandas(use_pyarrow_extension_array=True)
+
+    def read(self, data_source, encoding: Optional[str], read_options: Dict) -> Optional[pd.DataFrame]:
+        # Polars' multi-threaded readers cover Parquet and plain UTF-8 CSV read in one go
+        if read_options.get('dtype') is not None or read_options.get('chunksize'):
+            return None
+        usecols = read_options.get('usecols')
+        if usecols is not None and not isinstance(usecols, (list, tuple)):
+            return None
+        pl = _polars()
+        if data_source.extension == 'parquet':
+            frame = pl.read_parquet(data_source.reader(), columns=usecols)
+        elif data_source.extension == 'csv' and (encoding or '').lower().replace('_', '-') in ('utf-8', 'ascii'):
+            frame = pl.read_csv(data_source.reader(), columns=usecols)
+        else:
+            return None
+        return frame.to_pandas(use_pyarrow_extension_array=True)
+
+ENGINES = {engine.name: engine for engine in (PandasEngine, ArrowEngine, PolarsEngine)}
+
+def get_engine(name: str) -> PandasEngine:
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown DataFrame engine: {name} (expected one of {', '.join(ENGINES)})") from None
@@ -0,0 +1,155 @@
+import ast
+import warnings
+from dataclasses import dataclass, field
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from pandas.errors import ChainedAssignmentError
+from .dtypes import DtypeChange
+from .fingerprint import FrameDiff
+
+@dataclass
+class StepResult:
+    """Outcome of running one cleaning step against a DataFrame"""
+    df: pd.DataFrame
+    code: str
+    changed: bool
+    diff: Optional[FrameDiff] = None
+    dtype_changes: List[DtypeChange] = field(default_factory=list)  # from the optional dtype optimizer
+
+# Attributes that hand out the frame's own buffers; writes through them bypass copy-on-write
+BUFFER_ATTRIBUTES = ('values', 'to_numpy', 'array', '_values')
+# Methods that modify their object in place even without inplace=True
+MUTATING_METHODS = ('update', 'fill', 'put', 'itemset', 'setflags', 'resize', 'sort', '__setitem__')
+
+_process_copy_on_write = False
+
+def use_copy_on_write(enabled: bool = True) -> None:
+    """Let ``run_code`` use copy-on-write by default in this process.
+
+    ``mode.copy_on_write`` and the warning filter ``run_code`` relies on are process-wide, so
+    this is only for single-threaded processes that do nothing but run steps (the sandbox
+    worker); threads of the app server always run against an eager copy.
+    """
+    global _process_copy_on_write
+    _process_copy_on_write = enabled
+
+def writes_through_alias(code: str, frame: str = 'df') -> bool:
+    """Whether ``code`` may modify data through something other than ``frame`` itself.
+
+    ``col = df['a']; col[mask] = v`` changes ``df`` with eager copies but not under
+    copy-on-write, and writes through ``.values`` hit read-only buffers; such code (and code
+    that does not parse) runs against an eager copy.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and node.attr in BUFFER_ATTRIBUTES:
+            return True
+        if isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            if _root_name(node) != frame:
+                return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and _root_name(node.func) != frame:
+            inplace = any(keyword.arg == 'inplace' and not (isinstance(keyword.value, ast.Constant)
+                                                            and keyword.value.value is False)
+                          for keyword in node.keywords)
+            if inplace or node.func.attr in MUTATING_METHODS:
+                return True
+    return False
+
+def writes_in_place(code: str, frame: str = 'df') -> bool:
+    """Whether ``code`` may write into ``frame``'s existing arrays rather than replace columns.
+
+    pandas 2 never writes into the old array for ``df['a'] = ...``, ``del df['a']``, new
+    ``df.columns`` or ``df = df.method(...)``, so such code is safe on a shallow copy. Anything
+    else (``.loc``/``.iloc`` writes, ``inplace=True``, ``df['a'] += 1``, ``df[mask] = v``,
+    ``df.update(...)``) needs a deep one.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True
+    loop_names = {node.target.id for node in ast.walk(tree)
+                  if isinstance(node, ast.For) and isinstance(node.target, ast.Name)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AugAssign) and not isinstance(node.target, ast.Name):
+            return True
+        if isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            if isinstance(node, ast.Attribute):
+                if not (_is_frame(node.value, frame) and node.attr in ('columns', 'index')):
+                    return True
+            elif not (_is_frame(node.value, frame) and _is_column_key(node.slice, loop_names)):
+                return True
+        if isinstance(node, ast.Call):
+            inplace = any(keyword.arg == 'inplace' and not (isinstance(keyword.value, ast.Constant)
+                                                            and keyword.value.value is False)
+                          for keyword in node.keywords)
+            if inplace or isinstance(node.func, ast.Attribute) and node.func.attr in MUTATING_METHODS:
+                return True
+    return False
+
+def _is_frame(node: ast.AST, frame: str) -> bool:
+    return isinstance(node, ast.Name) and node.id == frame
+
+def _is_column_key(node: ast.AST, loop_names) -> bool:
+    # Labels, lists of labels, f-strings and loop variables; a mask would set rows in place
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return all(_is_column_key(element, loop_names) for element in node.elts)
+    return (isinstance(node, (ast.Constant, ast.JoinedStr))
+            or isinstance(node, ast.Name) and node.id in loop_names)
+
+def _root_name(node: ast.AST) -> Optional[str]:
+    while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+# Preprocessing classes generated code may use without importing them
+SKLEARN_NAMES = ('LabelEncoder', 'StandardScaler', 'MinMaxScaler')
+
+def build_namespace(df: pd.DataFrame, copy: bool = True, code: Optional[str] = None) -> dict:
+    """Create the globals that generated code is executed in.
+
+    ``copy=False`` hands over a shallow copy; only use it under copy-on-write, where the
+    first write to a column copies that column instead of modifying ``df``, or for code that
+    only replaces whole columns (see ``writes_in_place``).
+    When ``code`` is given, sklearn (slow to import) is only imported if the code names one
+    of ``SKLEARN_NAMES``.
+    """
+    namespace = {'df': df.copy(deep=copy), 'pd': pd, 'np': np}
+    if code is None or any(name in code for name in SKLEARN_NAMES):
+        from sklearn import preprocessing
+        namespace.update({name: getattr(preprocessing, name) for name in SKLEARN_NAMES})
+    return namespace
+
+def run_code(code: str, df: pd.DataFrame, copy_on_write: Optional[bool] = None) -> pd.DataFrame:
+    """Execute ``code`` against ``df`` and return the resulting ``df``; ``df`` itself is never modified.
+
+    With ``copy_on_write`` (by default only in processes set up with ``use_copy_on_write``)
+    the code runs under pandas copy-on-write, so only the columns it writes are copied. Code
+    that writes through aliases or relies on chained assignment
+    (``df['a'].fillna(0, inplace=True)``) runs against an eager copy instead. Without
+    copy-on-write, code that only replaces whole columns still gets a shallow copy.
+    """
+    if copy_on_write is None:
+        copy_on_write = _process_copy_on_write
+    if writes_through_alias(code):
+        return _run_eager(code, df)
+    if not copy_on_write:
+        return _run_eager(code, df, deep=writes_in_place(code))
+
+    try:
+        # pandas only emits this under copy-on-write, right before a chained write that would be lost
+        with warnings.catch_warnings(), pd.option_context('mode.copy_on_write', True):
+            warnings.simplefilter('error', ChainedAssignmentError)
+            namespace = build_namespace(df, copy=False, code=code)
+            exec(code, namespace)
+    except ChainedAssignmentError:
+        return _run_eager(code, df)
+    return namespace['df']
+
+def _run_eager(code: str, df: pd.DataFrame, deep: bool = True) -> pd.DataFrame:
+    namespace = build_namespace(df, copy=deep, code=code)
+    exec(code, namespace)
+    return namespace['df']
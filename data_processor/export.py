@@ -0,0 +1,103 @@
+import gzip
+import io
+from dataclasses import dataclass
+from typing import BinaryIO
+
+import pandas as pd
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """A file format the cleaned data can be exported to"""
+    label: str
+    extension: str
+    mime: str
+
+EXPORT_FORMATS = {
+    'csv': ExportFormat("CSV", "csv", "text/csv"),
+    'csv.gz': ExportFormat("CSV (gzip)", "csv.gz", "application/gzip"),
+    'csv.zst': ExportFormat("CSV (zstd)", "csv.zst", "application/zstd"),
+    'parquet': ExportFormat("Parquet", "parquet", "application/vnd.apache.parquet"),
+    'feather': ExportFormat("Feather", "feather", "application/vnd.apache.arrow.file"),
+}
+
+def format_for_path(path: str) -> str:
+    """Pick the export format from a file name, defaulting to plain CSV"""
+    lower = path.lower()
+    for file_format in sorted(EXPORT_FORMATS, key=len, reverse=True):
+        if lower.endswith('.' + EXPORT_FORMATS[file_format].extension):
+            return file_format
+    return 'csv'
+
+def write_frame(df: pd.DataFrame, target: BinaryIO, file_format: str, chunksize: int) -> None:
+    """Write ``df`` to the binary stream ``target`` ``chunksize`` rows at a time.
+
+    Only one chunk is ever serialized at once, so exporting never needs a second full copy
+    of the data in memory. ``target`` is flushed but left open.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    if file_format == 'parquet':
+        _write_parquet(df, target, chunksize)
+    elif file_format == 'feather':
+        _write_feather(df, target, chunksize)
+    else:
+        _write_csv(df, target, file_format, chunksize)
+    target.flush()
+
+def _chunks(df: pd.DataFrame, chunksize: int):
+    if len(df) == 0:
+        yield df
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def _write_csv(df: pd.DataFrame, target: BinaryIO, file_format: str, chunksize: int) -> None:
+    if file_format == 'csv.gz':
+        stream = gzip.GzipFile(fileobj=target, mode='wb')
+    elif file_format == 'csv.zst':
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd export requires the 'zstandard' package") from e
+        stream = zstandard.ZstdCompressor().stream_writer(target, closefd=False)
+    else:
+        stream = _Unclosable(target)
+
+    with io.TextIOWrapper(stream, encoding='utf-8', newline='') as text:
+        for position, chunk in enumerate(_chunks(df, chunksize)):
+            chunk.to_csv(text, header=position == 0, index=False)
+
+def _arrow_schema(df: pd.DataFrame):
+    """The Arrow schema of the whole frame, so chunks whose columns are all null still agree"""
+    import pyarrow as pa
+    return pa.Schema.from_pandas(df, preserve_index=False)
+
+def _write_parquet(df: pd.DataFrame, target: BinaryIO, chunksize: int) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _arrow_schema(df)
+    with pq.ParquetWriter(target, schema) as writer:
+        for chunk in _chunks(df, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+def _write_feather(df: pd.DataFrame, target: BinaryIO, chunksize: int) -> None:
+    # Feather v2 is the Arrow IPC file format, so record batches can be appended one by one
+    import pyarrow as pa
+    schema = _arrow_schema(df)
+    options = pa.ipc.IpcWriteOptions(compression='lz4')
+    with pa.ipc.new_file(target, schema, options=options) as writer:
+        for chunk in _chunks(df, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+class _Unclosable(io.RawIOBase):
+    """Forwards writes to a stream without closing it when the text wrapper is closed"""
+    def __init__(self, target: BinaryIO):
+        self._target = target
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        return self._target.write(data)
+
+    def flush(self) -> None:
+        self._target.flush()
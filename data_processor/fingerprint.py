@@ -0,0 +1,144 @@
+import hashlib
+import threading
+import weakref
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# (buffer key) -> (weak reference to the buffer owner, fingerprint)
+_cache: Dict[Tuple, Tuple[weakref.ref, str]] = {}
+_cache_lock = threading.Lock()
+
+@dataclass(frozen=True)
+class FrameFingerprint:
+    """Content fingerprint of a DataFrame: one digest per column plus one for the index"""
+    columns: Tuple
+    column_hashes: Tuple[str, ...]
+    index_hash: str
+
+@dataclass
+class FrameDiff:
+    """Which parts of a DataFrame differ between two versions"""
+    added: List = field(default_factory=list)
+    removed: List = field(default_factory=list)
+    modified: List = field(default_factory=list)
+    reordered: bool = False
+    index_changed: bool = False
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.removed or self.modified or self.reordered or self.index_changed)
+
+    @property
+    def changed_columns(self) -> List:
+        return self.added + self.modified
+
+    def summary(self) -> str:
+        parts = [f"{label}: {', '.join(map(str, names))}" for label, names in
+                 (('added', self.added), ('removed', self.removed), ('modified', self.modified)) if names]
+        if self.reordered:
+            parts.append("columns reordered")
+        if self.index_changed:
+            parts.append("index changed")
+        return "; ".join(parts) or "no changes"
+
+def fingerprint(values) -> str:
+    """Digest of a column's (or index's) dtype, length and contents.
+
+    The digest is cached against the memory buffer that backs the values, so asking again
+    for a column that is shared between DataFrame versions costs a dictionary lookup.
+    DataFrames are treated as immutable once fingerprinted: generated code always runs on
+    a copy, so a buffer is never rewritten while the cached digest is alive.
+    """
+    if isinstance(values, pd.RangeIndex):
+        return _range_fingerprint(values.start, values.stop, values.step, values.name)
+    key, owner = _buffer_key(values)
+    if key is not None:
+        with _cache_lock:
+            cached = _cache.get(key)
+        if cached is not None and cached[0]() is owner:
+            return cached[1]
+
+    digest = _compute(values)
+    if key is not None:
+        try:
+            ref = weakref.ref(owner, lambda _, key=key: _evict(key))
+        except TypeError:
+            return digest
+        with _cache_lock:
+            _cache[key] = (ref, digest)
+    return digest
+
+def fingerprint_frame(df: pd.DataFrame) -> FrameFingerprint:
+    return FrameFingerprint(
+        columns=tuple(df.columns),
+        column_hashes=tuple(fingerprint(df.iloc[:, position]) for position in range(df.shape[1])),
+        index_hash=fingerprint(df.index)
+    )
+
+def diff_frames(before, after) -> FrameDiff:
+    """Compare two DataFrames (or their ``FrameFingerprint``) column by column"""
+    if isinstance(before, pd.DataFrame):
+        before = fingerprint_frame(before)
+    if isinstance(after, pd.DataFrame):
+        after = fingerprint_frame(after)
+
+    diff = FrameDiff(index_changed=before.index_hash != after.index_hash)
+    before_hashes = dict(zip(before.columns, before.column_hashes))
+    after_hashes = dict(zip(after.columns, after.column_hashes))
+    if len(before_hashes) != len(before.columns) or len(after_hashes) != len(after.columns):
+        # Duplicate column names: fall back to a positional comparison
+        if before.columns != after.columns:
+            diff.modified = list(after.columns)
+        else:
+            diff.modified = [name for name, old, new in
+                             zip(after.columns, before.column_hashes, after.column_hashes) if old != new]
+        return diff
+
+    diff.added = [name for name in after.columns if name not in before_hashes]
+    diff.removed = [name for name in before.columns if name not in after_hashes]
+    diff.modified = [name for name in after.columns
+                     if name in before_hashes and before_hashes[name] != after_hashes[name]]
+    common = [name for name in before.columns if name in after_hashes]
+    diff.reordered = common != [name for name in after.columns if name in before_hashes]
+    return diff
+
+def _compute(values) -> str:
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{values.dtype}|{len(values)}|".encode())
+    if isinstance(values, pd.Index):
+        hasher.update(repr(values.names).encode())
+    try:
+        row_hashes = pd.util.hash_pandas_object(values, index=False)
+    except TypeError:
+        # Unhashable cells such as lists or dicts
+        row_hashes = pd.util.hash_pandas_object(values.astype(str), index=False)
+    hasher.update(np.ascontiguousarray(row_hashes.to_numpy()).data)
+    return hasher.hexdigest()
+
+@lru_cache(maxsize=64)
+def _range_fingerprint(start: int, stop: int, step: int, name) -> str:
+    # Hashed like the equivalent materialized index, so RangeIndex(3) matches Index([0, 1, 2])
+    return _compute(pd.Index(np.arange(start, stop, step, dtype='int64'), name=name))
+
+def _buffer_key(values):
+    """Identify the memory backing ``values``; returns ``(key, owner)`` or ``(None, None)``"""
+    array = values.array
+    if isinstance(array, pd.arrays.NumpyExtensionArray):
+        array = np.asarray(array)
+    if isinstance(array, np.ndarray):
+        owner = array
+        while isinstance(owner.base, np.ndarray):
+            owner = owner.base
+        interface = array.__array_interface__
+        return ('ndarray', interface['data'][0], array.strides, array.shape, array.dtype.str), owner
+    if isinstance(array, pd.api.extensions.ExtensionArray):
+        return ('extension', id(array), str(array.dtype), len(array)), array
+    return None, None
+
+def _evict(key) -> None:
+    with _cache_lock:
+        _cache.pop(key, None)
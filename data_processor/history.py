@@ -0,0 +1,237 @@
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+from utils.logger import get_logger
+from utils.tracing import span
+from .fingerprint import fingerprint
+
+
+@dataclass
+class _ColumnBlock:
+    """A single stored column (or index), shared by every state that contains it unchanged"""
+    key: int
+    nbytes: int
+    fingerprint: str
+    data: Optional[object] = None
+    path: Optional[str] = None
+    last_used: int = 0
+
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+
+
+@dataclass
+class _HistoryState:
+    """Column layout of one DataFrame version, expressed as references into the block store"""
+    columns: pd.Index
+    column_keys: List[int]
+    index_key: int
+    attrs: Dict = field(default_factory=dict)
+
+
+class DataFrameHistory:
+    """Undo/redo history that stores column-level deltas between DataFrame versions.
+
+    Each pushed DataFrame is split into columns; a column that is unchanged from the
+    previous version is stored once and shared, so a step only costs the memory of the
+    columns it added or modified. When the stored columns exceed ``memory_budget_bytes``
+    the least recently used blocks that are not part of the current state are spilled
+    to disk and reloaded on demand.
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None, spill_dir: Optional[str] = None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.spill_root = spill_dir
+        self.logger = get_logger("DataFrameHistory")
+        self._states: List[_HistoryState] = []
+        self._blocks: Dict[int, _ColumnBlock] = {}
+        self._next_key = 0
+        self._clock = 0
+        self._position = -1
+        self._spill_dir: Optional[str] = None
+        self._lock = threading.RLock()
+        self._finalizer = None
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __getitem__(self, position: int) -> pd.DataFrame:
+        return self.get(position)
+
+    @property
+    def position(self) -> int:
+        return self._position
+
+    @property
+    def memory_usage(self) -> int:
+        """Bytes held in memory by stored column blocks"""
+        return sum(block.nbytes for block in self._blocks.values() if block.in_memory)
+
+    @property
+    def spilled_usage(self) -> int:
+        """Bytes of stored column blocks that currently live on disk"""
+        return sum(block.nbytes for block in self._blocks.values() if not block.in_memory)
+
+    def push(self, df: pd.DataFrame) -> int:
+        """Append a new state after the current position, discarding any redo states"""
+        with self._lock:
+            self.truncate(self._position + 1)
+            previous = self._states[-1] if self._states else None
+            with span("history_push", columns=df.shape[1]) as push_span:
+                state = self._make_state(df, previous)
+                self._states.append(state)
+                self._position = len(self._states) - 1
+                self._touch(state)
+                self._enforce_budget()
+                push_span.set(position=self._position, stored_mb=round(self.memory_usage / (1024 * 1024), 1),
+                              spilled_mb=round(self.spilled_usage / (1024 * 1024), 1))
+            return self._position
+
+    def truncate(self, length: int) -> None:
+        """Drop every state from ``length`` onwards and release blocks no longer referenced"""
+        with self._lock:
+            if length >= len(self._states):
+                return
+            del self._states[length:]
+            self._position = min(self._position, len(self._states) - 1)
+            self._release_unreferenced()
+
+    def get(self, position: int) -> pd.DataFrame:
+        """Rebuild the DataFrame stored at ``position`` and make it the current state"""
+        with self._lock:
+            if position < 0:
+                position += len(self._states)
+            if not 0 <= position < len(self._states):
+                raise IndexError("history position out of range")
+            state = self._states[position]
+            self._position = position
+            self._touch(state)
+            index = self._load(state.index_key)
+            series = [self._load(key) for key in state.column_keys]
+            if series:
+                df = pd.concat(series, axis=1)
+                df.columns = state.columns
+            else:
+                df = pd.DataFrame(index=index, columns=state.columns)
+            df.index = index
+            df.attrs = dict(state.attrs)
+            self._enforce_budget()
+            return df
+
+    def clear(self) -> None:
+        """Forget all states and remove any spilled files"""
+        with self._lock:
+            self._states = []
+            self._blocks = {}
+            self._position = -1
+            if self._finalizer is not None:
+                self._finalizer()
+                self._finalizer = None
+            self._spill_dir = None
+
+    def _make_state(self, df: pd.DataFrame, previous: Optional[_HistoryState]) -> _HistoryState:
+        previous_columns = {}
+        if previous is not None and not previous.columns.has_duplicates:
+            previous_columns = dict(zip(previous.columns, previous.column_keys))
+
+        # Compare content fingerprints, so spilled blocks never have to be read back
+        index_key = None
+        index_fingerprint = fingerprint(df.index)
+        if previous is not None and self._blocks[previous.index_key].fingerprint == index_fingerprint:
+            index_key = previous.index_key
+        if index_key is None:
+            index_key = self._store(df.index.copy(), df.index.memory_usage(deep=True), index_fingerprint)
+
+        column_keys = []
+        for position, name in enumerate(df.columns):
+            column = df.iloc[:, position]
+            column_fingerprint = fingerprint(column)
+            key = previous_columns.get(name) if index_key == getattr(previous, 'index_key', None) else None
+            if key is not None and self._blocks[key].fingerprint != column_fingerprint:
+                key = None
+            if key is None:
+                column = column.copy()
+                key = self._store(column, column.memory_usage(deep=True, index=False), column_fingerprint)
+            column_keys.append(key)
+
+        return _HistoryState(
+            columns=df.columns.copy(),
+            column_keys=column_keys,
+            index_key=index_key,
+            attrs=dict(df.attrs)
+        )
+
+    def _store(self, data, nbytes: int, data_fingerprint: str) -> int:
+        key = self._next_key
+        self._next_key += 1
+        self._blocks[key] = _ColumnBlock(key=key, nbytes=int(nbytes), fingerprint=data_fingerprint, data=data)
+        return key
+
+    def _load(self, key: int):
+        block = self._blocks[key]
+        if block.in_memory:
+            return block.data
+        return pd.read_pickle(block.path)
+
+    def _touch(self, state: _HistoryState) -> None:
+        self._clock += 1
+        for key in (state.index_key, *state.column_keys):
+            self._blocks[key].last_used = self._clock
+
+    def _referenced_keys(self, states: List[_HistoryState]) -> set:
+        keys = set()
+        for state in states:
+            keys.add(state.index_key)
+            keys.update(state.column_keys)
+        return keys
+
+    def _release_unreferenced(self) -> None:
+        live = self._referenced_keys(self._states)
+        for key in [key for key in self._blocks if key not in live]:
+            block = self._blocks.pop(key)
+            if block.path and os.path.exists(block.path):
+                os.remove(block.path)
+
+    def _enforce_budget(self) -> None:
+        if self.memory_budget_bytes is None or self.memory_usage <= self.memory_budget_bytes:
+            return
+
+        pinned = self._referenced_keys([self._states[self._position]]) if self._position >= 0 else set()
+        candidates = sorted(
+            (block for block in self._blocks.values() if block.in_memory and block.key not in pinned),
+            key=lambda block: block.last_used
+        )
+        in_memory = self.memory_usage
+        for block in candidates:
+            if in_memory <= self.memory_budget_bytes:
+                break
+            self._spill(block)
+            in_memory -= block.nbytes
+
+        if in_memory > self.memory_budget_bytes:
+            self.logger.warning(
+                f"Current state alone ({in_memory} bytes) exceeds the history memory budget "
+                f"({self.memory_budget_bytes} bytes)"
+            )
+
+    def _spill(self, block: _ColumnBlock) -> None:
+        if block.path is None:
+            block.path = os.path.join(self._ensure_spill_dir(), f"block_{block.key}.pkl")
+            pd.to_pickle(block.data, block.path)
+        block.data = None
+        self.logger.info(f"Spilled history block {block.key} ({block.nbytes} bytes) to disk")
+
+    def _ensure_spill_dir(self) -> str:
+        if self._spill_dir is None:
+            if self.spill_root:
+                os.makedirs(self.spill_root, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix="df_history_", dir=self.spill_root)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        return self._spill_dir
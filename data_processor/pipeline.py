@@ -0,0 +1,39 @@
+import json
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
+
+from agents.code_conversion.models import CleaningHistory
+from utils.config import DATAFRAME_ENGINE
+
+PIPELINE_VERSION = 1
+
+def pipeline_to_json(history: CleaningHistory, source: Optional[str] = None,
+                     engine: Optional[str] = None) -> str:
+    """Serialize the successful steps of a session (instruction + code) as a pipeline document"""
+    steps = [entry for entry in history.to_dict()['entries'] if entry['successful']]
+    return json.dumps({
+        'version': PIPELINE_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'source': source,
+        'engine': engine or DATAFRAME_ENGINE,
+        'entries': steps
+    }, indent=2)
+
+def save_pipeline(history: CleaningHistory, path: str, source: Optional[str] = None,
+                  engine: Optional[str] = None) -> None:
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write(pipeline_to_json(history, source, engine))
+
+def load_pipeline(source: Union[str, Dict]) -> CleaningHistory:
+    """Read a pipeline file (or an already parsed document) back into a ``CleaningHistory``"""
+    if isinstance(source, str):
+        with open(source, encoding='utf-8') as handle:
+            source = json.load(handle)
+    version = source.get('version')
+    if version != PIPELINE_VERSION:
+        raise ValueError(f"Unsupported pipeline version: {version}")
+    return CleaningHistory.from_dict(source)
+
+def pipeline_engine(document: Dict) -> str:
+    """The engine a pipeline's code was written for; files from before engines existed are pandas"""
+    return document.get('engine') or 'pandas'
@@ -1,112 +1,255 @@
+import os
 import pandas as pd
 from utils.logger import get_logger
+from utils.tracing import span
+from utils.config import (
+    EXPORT_CHUNK_ROWS, LARGE_FILE_THRESHOLD_MB, LOAD_CHUNK_SIZE,
+    OPTIMIZE_DTYPES, OPTIMIZE_CATEGORY_MAX_RATIO, OPTIMIZE_ARROW_STRINGS, VALIDATE_CODE,
+    SAMPLE_FIRST_ENABLED, SAMPLE_FIRST_MIN_ROWS, SAMPLE_FIRST_ROWS, SAMPLE_CACHE_ENTRIES, DATAFRAME_ENGINE
+)
+from .sniffer import SAMPLE_BYTES, CsvDialect, detect_encoding, sniff_dialect
+from .sources import DataSource, open_source
+from .execution import StepResult
+from .engines import get_engine
+from .dtypes import expand_categories, format_changes, optimize_dtypes
+from .export import format_for_path, write_frame
+from .fingerprint import diff_frames
+from .validation import check_code
+from .sampling import SampleCache
+
+def _has_undecoded_columns(df):
+    """Whether a text read left any column as raw bytes (what pyarrow does with undecodable text)"""
+    for position, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            series = df.iloc[:, position]
+            present = series.notna().to_numpy()
+            if present.any() and isinstance(series.iloc[present.argmax()], bytes):
+                return True
+    return False
 
 class DataProcessor:
-    def __init__(self, agent):
+    def __init__(self, agent, sandbox=None, shrink_dtypes=OPTIMIZE_DTYPES, validate=VALIDATE_CODE,
+                 sample_first=SAMPLE_FIRST_ENABLED, engine=DATAFRAME_ENGINE):
         self.agent = agent
+        self.engine = get_engine(engine) if isinstance(engine, str) else engine
+        self.sandbox = sandbox
+        self.shrink_dtypes = shrink_dtypes
+        self.validate = validate
+        self.sample_first = sample_first
+        self.samples = SampleCache(SAMPLE_FIRST_ROWS, SAMPLE_CACHE_ENTRIES)
         self.logger = get_logger("DataProcessor")
+        self.dialects = {}  # Pinned with pin_dialect, by file name
+        self.last_dialect = None
+        self.last_encoding = None
+
+    def load_data(self, source, file_name=None, large_file=None, use_arrow_dtypes=False, usecols=None,
+                  dtype=None, chunksize=None, progress_callback=None, dialect=None, encoding=None):
+        """Load a dataset from a path, bytes-like object or file-like object.
 
-    def load_data(self, file_path):
+        In-memory sources (such as a Streamlit upload) are parsed straight from their buffer;
+        ``file_name`` supplies the format when the object has no ``name``.
+        ``large_file`` switches CSV parsing to the multi-threaded pyarrow reader; when left as
+        ``None`` it is enabled automatically for files above ``LARGE_FILE_THRESHOLD_MB``.
+        ``chunksize`` reads CSV files in row chunks and reports ``(bytes_read, total_bytes)``
+        to ``progress_callback`` after each chunk.
+        ``dialect`` pins the delimiter/quoting/header layout of a ``.txt`` file; otherwise the
+        dialect pinned for the same source (or sniffed from a sample) is used.
+        ``encoding`` skips detection for CSV/TXT files; by default it is detected once from the
+        same byte sample.
+        When the processor was created with ``shrink_dtypes`` (``OPTIMIZE_DTYPES``), columns are
+        downcast to smaller dtypes after loading and again after every step that changes them.
+        The processor's engine (``DATAFRAME_ENGINE``) may read the file itself and decides the
+        dtypes of the loaded frame.
+        """
+        source_name = file_name or getattr(source, 'name', None) or str(source)
         try:
-            file_extension = file_path.lower().split('.')[-1]
-            
-            if file_extension == 'csv':
-                df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='warn')
-            elif file_extension in ['xls', 'xlsx', 'xlsm']:
-                df = pd.read_excel(file_path, engine='openpyxl')
-            elif file_extension == 'json':
-                df = pd.read_json(file_path)
-            elif file_extension == 'parquet':
-                df = pd.read_parquet(file_path)
-            elif file_extension == 'txt':
-                # Try different delimiters
-                for delimiter in [',', ';', '\t', '|']:
-                    try:
-                        df = pd.read_csv(file_path, sep=delimiter, encoding='utf-8')
-                        if len(df.columns) > 1:  # Found correct delimiter
-                            break
-                    except:
-                        continue
-                else:  # If no delimiter worked
-                    raise ValueError("Could not determine delimiter for txt file")
-            else:
-                raise ValueError(f"Unsupported file format: {file_extension}")
+            with span("load_data", source=os.path.basename(source_name)) as load_span:
+                with open_source(source, file_name) as data_source:
+                    load_span.set(bytes=data_source.size)
+                    df = self._load_source(
+                        data_source, large_file, use_arrow_dtypes or self.engine.arrow_dtypes, usecols, dtype,
+                        chunksize, progress_callback, dialect, encoding
+                    )
+                df = self.engine.finish(df)
 
-            if df.empty:
-                raise ValueError("The loaded dataframe is empty")
+                if df.empty:
+                    raise ValueError("The loaded dataframe is empty")
+                if self.shrink_dtypes:
+                    df, _ = self._shrink_dtypes(df)
+                load_span.set(rows=len(df), columns=df.shape[1])
 
-            self.logger.info(f"Data loaded successfully from {file_path}")
+            self.logger.info(f"Data loaded successfully from {source_name}")
             self.logger.info(f"Shape of loaded data: {df.shape}")
             return df
 
-        except UnicodeDecodeError:
-            # Try different encodings
-            for encoding in ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']:
-                try:
-                    if file_extension == 'csv':
-                        df = pd.read_csv(file_path, encoding=encoding)
-                        self.logger.info(f"Successfully read with {encoding} encoding")
-                        return df
-                except:
-                    continue
-            raise ValueError("Could not read file with any supported encoding")
-            
         except Exception as e:
-            self.logger.error(f"Error loading data from {file_path}: {str(e)}")
+            self.logger.error(f"Error loading data from {source_name}: {str(e)}")
             raise
 
+    def _load_source(self, data_source, large_file, use_arrow_dtypes, usecols, dtype,
+                     chunksize, progress_callback, dialect, encoding):
+        file_extension = data_source.extension
+        if large_file is None:
+            large_file = data_source.size >= LARGE_FILE_THRESHOLD_MB * 1024 * 1024
+        read_options = {
+            'usecols': usecols,
+            'dtype': dtype,
+            'dtype_backend': 'pyarrow' if use_arrow_dtypes else None,
+            'large_file': large_file,
+            'chunksize': chunksize,
+            'progress_callback': progress_callback
+        }
+
+        if file_extension in ('csv', 'txt'):
+            sample = data_source.read_sample(SAMPLE_BYTES)
+            if encoding is None:
+                encoding = detect_encoding(sample)
+                self.logger.info(f"Detected encoding {encoding} for {os.path.basename(data_source.name)}")
+            self.last_encoding = encoding
+            if file_extension == 'txt':
+                dialect = self._resolve_dialect(data_source.name, dialect, sample, encoding)
+                read_options.update(dialect.read_csv_options())
+            else:
+                df = self.engine.read(data_source, encoding, read_options)
+                if df is not None:
+                    return df
+            return self._read_text(data_source, encoding, read_options)
+        elif file_extension in ['xls', 'xlsx', 'xlsm']:
+            return pd.read_excel(data_source.reader(), engine='openpyxl', usecols=usecols, dtype=dtype)
+        elif file_extension == 'json':
+            return pd.read_json(data_source.reader())
+        elif file_extension == 'parquet':
+            df = self.engine.read(data_source, None, read_options)
+            if df is not None:
+                return df
+            parquet_options = {'columns': usecols}
+            if use_arrow_dtypes:
+                parquet_options['dtype_backend'] = 'pyarrow'
+            return pd.read_parquet(data_source.reader(), **parquet_options)
+        else:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+
+    def source_columns(self, source, file_name=None):
+        """Column names of a source without loading its rows; None when the format cannot tell cheaply"""
+        with open_source(source, file_name) as data_source:
+            file_extension = data_source.extension
+            if file_extension == 'parquet':
+                import pyarrow.parquet as pq
+                schema = pq.read_schema(data_source.reader())
+                index_columns = (schema.pandas_metadata or {}).get('index_columns', [])
+                return [name for name in schema.names if name not in index_columns]
+            if file_extension in ('csv', 'txt'):
+                sample = data_source.read_sample(SAMPLE_BYTES)
+                encoding = detect_encoding(sample)
+                options = {}
+                if file_extension == 'txt':
+                    options = self._resolve_dialect(data_source.name, None, sample, encoding).read_csv_options()
+                return list(pd.read_csv(data_source.reader(), encoding=encoding, nrows=0, **options).columns)
+            if file_extension in ('xls', 'xlsx', 'xlsm'):
+                return list(pd.read_excel(data_source.reader(), engine='openpyxl', nrows=0).columns)
+            return None
+
+    def pin_dialect(self, source, dialect: CsvDialect):
+        """Reuse ``dialect`` for every later load of ``source`` instead of sniffing it again"""
+        self.dialects[os.path.basename(source)] = dialect
+
+    def _resolve_dialect(self, source_name, dialect, sample, encoding):
+        source = os.path.basename(source_name)
+        if dialect is None:
+            dialect = self.dialects.get(source)
+        if dialect is None:
+            dialect = sniff_dialect(sample, encoding)
+            self.logger.info(f"Detected dialect for {source}: {dialect}")
+        # Sniffed dialects are not kept: another file uploaded under the same name may differ
+        self.last_dialect = dialect
+        return dialect
+
+    def _read_text(self, data_source, encoding, read_options):
+        try:
+            df = self._read_csv(data_source, encoding=encoding, **read_options)
+        except UnicodeDecodeError:
+            df = None
+        # The sample decoded cleanly but a later part of the file did not. The pyarrow engine
+        # does not raise for that: it returns the affected columns as raw bytes instead
+        if df is not None and not _has_undecoded_columns(df):
+            return df
+        self.logger.warning(f"{encoding} failed beyond the detection sample, re-reading as latin1")
+        self.last_encoding = 'latin1'
+        return self._read_csv(data_source, encoding='latin1', **read_options)
+
+    def iter_chunks(self, source, chunksize=None, encoding='utf-8', usecols=None, dtype=None,
+                    dtype_backend=None, file_name=None, **csv_options):
+        """Yield ``(chunk, bytes_read, total_bytes)`` for a CSV/TXT or Parquet source without loading it whole"""
+        if isinstance(source, DataSource):
+            yield from self._iter_source_chunks(source, chunksize, encoding, usecols, dtype, dtype_backend, csv_options)
+            return
+        with open_source(source, file_name) as data_source:
+            yield from self._iter_source_chunks(data_source, chunksize, encoding, usecols, dtype, dtype_backend, csv_options)
+
+    def _iter_source_chunks(self, data_source, chunksize, encoding, usecols, dtype, dtype_backend, csv_options):
+        chunksize = chunksize or LOAD_CHUNK_SIZE
+        total_bytes = data_source.size
+
+        if data_source.extension == 'parquet':
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(data_source.reader())
+            bytes_read = 0
+            for row_group in range(parquet_file.num_row_groups):
+                bytes_read += parquet_file.metadata.row_group(row_group).total_byte_size
+                table = parquet_file.read_row_group(row_group, columns=usecols)
+                for batch in table.to_batches(max_chunksize=chunksize):
+                    chunk = batch.to_pandas(types_mapper=pd.ArrowDtype if dtype_backend == 'pyarrow' else None)
+                    yield chunk, min(bytes_read, total_bytes), total_bytes
+            return
+
+        options = {key: value for key, value in {
+            'usecols': usecols,
+            'dtype': dtype,
+            'dtype_backend': dtype_backend
+        }.items() if value is not None}
+        options.setdefault('on_bad_lines', 'warn')
+        options.update(csv_options)
+        reader = data_source.reader()
+        handle = open(reader, 'rb') if isinstance(reader, str) else reader
+        try:
+            with pd.read_csv(handle, chunksize=chunksize, encoding=encoding, **options) as chunks:
+                for chunk in chunks:
+                    yield chunk, handle.tell(), total_bytes
+        finally:
+            if handle is not reader:
+                handle.close()
+
+    def _read_csv(self, data_source, encoding, usecols=None, dtype=None, dtype_backend=None,
+                  large_file=False, chunksize=None, progress_callback=None, **csv_options):
+        options = {key: value for key, value in {
+            'usecols': usecols,
+            'dtype': dtype,
+            'dtype_backend': dtype_backend
+        }.items() if value is not None}
+        options.update(csv_options)
+
+        if chunksize:
+            chunks = []
+            for chunk, bytes_read, total_bytes in self.iter_chunks(data_source, chunksize, encoding, **options):
+                chunks.append(chunk)
+                if progress_callback:
+                    progress_callback(bytes_read, total_bytes)
+            self.logger.info(f"Read {data_source.name} in {len(chunks)} chunks")
+            return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+        if large_file:
+            self.logger.info(f"Reading {data_source.name} with the pyarrow engine")
+            df = pd.read_csv(data_source.reader(), engine='pyarrow', encoding=encoding, on_bad_lines='warn', **options)
+        else:
+            df = pd.read_csv(data_source.reader(), encoding=encoding, on_bad_lines='warn', **options)
+        if progress_callback:
+            progress_callback(data_source.size, data_source.size)
+        return df
+
     def process_data(self, df, custom_code=None):
         try:
             if custom_code:
-                # Create a namespace with necessary imports and variables
-                namespace = {
-                    'df': df.copy(),  # Work with a copy of the DataFrame
-                    'pd': pd,
-                    'np': __import__('numpy'),
-                    'LabelEncoder': __import__('sklearn.preprocessing').preprocessing.LabelEncoder,
-                    'StandardScaler': __import__('sklearn.preprocessing').preprocessing.StandardScaler,
-                    'MinMaxScaler': __import__('sklearn.preprocessing').preprocessing.MinMaxScaler
-                }
-                
-                try:
-                    # Execute the custom code in the prepared namespace
-                    exec(custom_code, namespace)
-                    cleaned_df = namespace['df']
-                    
-                    # Verify if the operation actually changed the DataFrame
-                    if cleaned_df.equals(df):
-                        self.logger.info("Operation resulted in no changes to the data")
-                        return df
-                    
-                    # Verify if all required columns are still present
-                    if not all(col in cleaned_df.columns for col in df.columns):
-                        missing_cols = set(df.columns) - set(cleaned_df.columns)
-                        self.logger.info(f"Operation attempted to remove columns: {missing_cols}")
-                        if any(col not in df.columns for col in missing_cols):
-                            # If trying to remove non-existent columns, return original
-                            return df
-                    
-                    return cleaned_df
-                    
-                except Exception as code_error:
-                    # Use CodeExecutor to handle the error
-                    fixed_code = self.agent.code_executor._handle_error(
-                        code_error,
-                        custom_code,
-                        df
-                    )
-                    
-                    # Try executing the fixed code
-                    namespace['df'] = df.copy()  # Reset DataFrame
-                    exec(fixed_code, namespace)
-                    cleaned_df = namespace['df']
-                    
-                    # Verify the fixed code result
-                    if cleaned_df.equals(df):
-                        return df
-                    
-                    return cleaned_df
-                
+                cleaned_df = self.execute_step(df, custom_code).df
                 self.logger.info("Custom code processing completed")
             else:
                 cleaned_df = self.agent.process_data(df)
@@ -116,14 +259,160 @@ class DataProcessor:
             self.logger.error(f"Error during processing: {e}")
             return df  # Return original DataFrame instead of raising exception
 
-    def save_data(self, df, output_file):
+    def execute_step(self, df, code, on_preview=None):
+        """Run generated code against ``df``, asking the agent for a fix once if it fails.
+
+        Frames of at least ``SAMPLE_FIRST_MIN_ROWS`` rows first run the code on a cached
+        stratified sample, where any fixing happens too; ``on_preview`` gets the sample result
+        before the one full run. Returns a ``StepResult`` carrying the code that actually ran
+        and a column-level ``FrameDiff``, so the step can be recorded and replayed later.
+        """
         try:
-            df.to_csv(output_file, index=False)
-            self.logger.info(f"Processed data saved to: {output_file}")
+            if self.sample_first and len(df) >= SAMPLE_FIRST_MIN_ROWS:
+                code, preview = self._run_on_sample(code, df)
+                if on_preview is not None:
+                    on_preview(preview)
+            try:
+                # Execute the custom code in the prepared namespace
+                with span("exec", rows=len(df), sandboxed=self.sandbox is not None):
+                    cleaned_df = self._run_code(code, df)
+            except Exception as code_error:
+                # Use CodeExecutor to get a fix (possibly racing several candidates) and run it
+                with span("fix_code", error=type(code_error).__name__):
+                    code, cleaned_df = self.agent.code_executor.fix_code(
+                        code_error,
+                        code,
+                        df,
+                        run=self._run_code
+                    )
+
+                # Verify the fixed code result
+                diff = self._diff(df, cleaned_df)
+                if not diff.changed:
+                    return StepResult(df, code, changed=False, diff=diff)
+
+                self.logger.info(f"Step changed the data ({diff.summary()})")
+                cleaned_df, dtype_changes = self._shrink_step_dtypes(cleaned_df, diff)
+                return StepResult(cleaned_df, code, changed=True, diff=diff, dtype_changes=dtype_changes)
+
+            # Verify if the operation actually changed the DataFrame (per-column fingerprints,
+            # cached for the unchanged input columns)
+            diff = self._diff(df, cleaned_df)
+            if not diff.changed:
+                self.logger.info("Operation resulted in no changes to the data")
+                return StepResult(df, code, changed=False, diff=diff)
+
+            # Verify if all required columns are still present
+            if diff.removed:
+                missing_cols = set(diff.removed)
+                self.logger.info(f"Operation attempted to remove columns: {missing_cols}")
+                if any(col not in df.columns for col in missing_cols):
+                    # If trying to remove non-existent columns, return original
+                    return StepResult(df, code, changed=False, diff=diff)
+
+            self.logger.info(f"Step changed the data ({diff.summary()})")
+            cleaned_df, dtype_changes = self._shrink_step_dtypes(cleaned_df, diff)
+            return StepResult(cleaned_df, code, changed=True, diff=diff, dtype_changes=dtype_changes)
+        except Exception as e:
+            self.logger.error(f"Error during processing: {e}")
+            return StepResult(df, code, changed=False)
+
+    def _run_on_sample(self, code, df):
+        """Run ``code`` (or a fix for it) on a sample of ``df``; returns ``(code, sample_result)``"""
+        # Checked against the full frame's size, so row-wise code is still caught on the sample
+        run = lambda code, frame: self._run_code(code, frame, validate_against=df)
+        with span("sample_exec") as sample_span:
+            hits = self.samples.hits
+            sample = self.samples.get(df)
+            sample_span.set(rows=len(sample), sample_cached=self.samples.hits > hits)
+            try:
+                return code, run(code, sample)
+            except Exception as sample_error:
+                sample_span.set(error=type(sample_error).__name__)
+                error = sample_error
+        # Every failing attempt costs a sample run, not a full-data pass
+        with span("fix_code", error=type(error).__name__, rows=len(sample)):
+            return self.agent.code_executor.fix_code(error, code, sample, run=run)
+
+    @staticmethod
+    def _diff(before, after):
+        with span("diff") as diff_span:
+            diff = diff_frames(before, after)
+            diff_span.set(changed_columns=len(diff.changed_columns), removed_columns=len(diff.removed))
+        return diff
+
+    def _shrink_step_dtypes(self, df, diff):
+        # Columns the step did not touch were already optimized; only re-check the rest
+        if not self.shrink_dtypes:
+            return df, []
+        return self._shrink_dtypes(df, diff.changed_columns)
+
+    def _shrink_dtypes(self, df, columns=None):
+        optimized, changes = optimize_dtypes(
+            df,
+            columns,
+            category_max_ratio=OPTIMIZE_CATEGORY_MAX_RATIO,
+            arrow_strings=OPTIMIZE_ARROW_STRINGS
+        )
+        if changes:
+            saved = sum(change.bytes_saved for change in changes)
+            self.logger.info(f"Optimized dtypes, saved {saved / (1024 * 1024):.1f} MB: {format_changes(changes)}")
+        return optimized, changes
+
+    def _run_code(self, code, df, validate_against=None):
+        try:
+            return self._execute_code(code, df, validate_against)
+        except Exception as e:
+            # Categoricals from the dtype optimizer reject values outside their categories
+            # (df.loc[mask, 'col'] = 'new'); such steps run again on plain object columns
+            if not self.shrink_dtypes or 'categor' not in str(e).lower():
+                raise
+            plain = expand_categories(df)
+            if plain is df:
+                raise
+            self.logger.info(f"Step failed on categorical columns ({e}), retrying on object columns")
+            return self._execute_code(code, plain, validate_against)
+
+    def _execute_code(self, code, df, validate_against=None):
+        # Code that cannot work is sent back for a fix before it spends time on the full frame
+        if self.validate and self.engine.pandas_api:
+            check_code(code, df if validate_against is None else validate_against)
+        if self.sandbox is not None:
+            result = self.sandbox.run(code, df, self.engine.name)
+        else:
+            result = self.engine.run(code, df)
+        return self.engine.finish(result)
+
+    def save_data(self, df, output_file, file_format=None, chunksize=None):
+        """Write ``df`` to a path or a writable binary stream (e.g. a spooled buffer).
+
+        ``file_format`` is one of ``EXPORT_FORMATS`` (csv, csv.gz, csv.zst, parquet, feather)
+        and is taken from the file extension when omitted. Rows are written ``chunksize``
+        at a time; a stream is left open and is not rewound.
+        """
+        try:
+            chunksize = chunksize or EXPORT_CHUNK_ROWS
+            with span("save_data", rows=len(df), columns=df.shape[1]) as save_span:
+                if isinstance(output_file, (str, os.PathLike)):
+                    file_format = file_format or format_for_path(os.fspath(output_file))
+                    with open(output_file, 'wb') as handle:
+                        write_frame(df, handle, file_format, chunksize)
+                    destination = output_file
+                else:
+                    file_format = file_format or 'csv'
+                    write_frame(df, output_file, file_format, chunksize)
+                    destination = "in-memory buffer"
+                save_span.set(format=file_format)
+            self.logger.info(f"Processed data saved to: {destination} ({file_format})")
         except Exception as e:
             self.logger.error(f"Error saving data: {e}")
             raise
 
-    def log_processing_history(self):
-        for entry in self.agent.data_processor.cleaning_history.get_all_entries():
-            self.logger.info(f"Step {entry.iteration}: {entry.instruction}")
\ No newline at end of file
+    def log_processing_history(self, cleaning_history=None):
+        if cleaning_history is None:
+            cleaning_history = self.agent.data_processor.cleaning_history
+        for entry in cleaning_history.get_all_entries():
+            if entry.changes:
+                self.logger.info(f"Step {entry.iteration}: {entry.instruction} ({entry.changes})")
+            else:
+                self.logger.info(f"Step {entry.iteration}: {entry.instruction}")
\ No newline at end of file
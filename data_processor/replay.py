@@ -0,0 +1,177 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+from agents.code_conversion.models import CleaningHistory, CleaningHistoryEntry
+from utils.config import LOAD_CHUNK_SIZE
+from utils.logger import get_logger
+from .chunk_safety import is_chunk_safe
+from .compiler import CompiledStage, compile_pipeline
+from .sniffer import SAMPLE_BYTES, detect_encoding, sniff_dialect
+from .sources import open_source
+
+@dataclass
+class ReplayReport:
+    """Summary of an out-of-core replay"""
+    input_path: str
+    output_path: str
+    steps: int
+    chunks: int = 0
+    rows_in: int = 0
+    rows_out: int = 0
+    seconds: float = 0.0
+    materialized_steps: List[int] = field(default_factory=list)
+
+class _ChunkWriter:
+    """Streams DataFrame chunks to a CSV (optionally compressed) or Parquet file.
+
+    The Parquet schema has to be fixed before the first write, but a column that is all null
+    in the first chunks has no type yet: those chunks are held back (up to ``max_pending``)
+    until every column has one, and columns still untyped by then are written as strings.
+    """
+    def __init__(self, output_path: str, max_pending: int = 8):
+        self.output_path = output_path
+        self.is_parquet = output_path.lower().endswith('.parquet')
+        self.max_pending = max_pending
+        self._writer = None
+        self._schema = None
+        self._pending: List[pd.DataFrame] = []
+        self._wrote_header = False
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if not self.is_parquet:
+            chunk.to_csv(self.output_path, mode='a' if self._wrote_header else 'w',
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+            return
+        import pyarrow as pa
+        if self._writer is not None:
+            self._writer.write_table(pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+            return
+        self._pending.append(chunk)
+        schema = self._pending_schema()
+        if len(self._pending) >= self.max_pending or not any(pa.types.is_null(f.type) for f in schema):
+            self._open(schema)
+
+    def close(self) -> None:
+        if self._pending:
+            self._open(self._pending_schema())
+        if self._writer is not None:
+            self._writer.close()
+
+    def _pending_schema(self):
+        import pyarrow as pa
+        schemas = [pa.Schema.from_pandas(chunk, preserve_index=False) for chunk in self._pending]
+        return pa.unify_schemas(schemas, promote_options='permissive')
+
+    def _open(self, schema) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                  for field in schema], metadata=schema.metadata)
+        self._writer = pq.ParquetWriter(self.output_path, self._schema)
+        pending, self._pending = self._pending, []
+        for chunk in pending:
+            self._writer.write_table(pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+
+class PipelineReplayer:
+    """Replays recorded cleaning steps over a file that does not fit in memory.
+
+    Consecutive chunk-safe steps are applied chunk by chunk and the result is streamed to the
+    output file. A step that is not chunk-safe (see ``is_chunk_safe`` or the entry's
+    ``chunk_safe`` flag) needs the whole intermediate frame: it is either materialized in
+    memory when ``allow_materialize`` is set, or the replay is refused up front. Consecutive
+    steps of the same kind are fused and run once per chunk. With ``columns='used'`` only the
+    columns the pipeline reads are loaded and the output keeps just those plus the ones it writes.
+    """
+    def __init__(self, processor, chunksize: Optional[int] = None, allow_materialize: bool = False,
+                 columns: str = 'all'):
+        if columns not in ('all', 'used'):
+            raise ValueError(f"Unknown output columns mode: {columns}")
+        self.processor = processor
+        self.chunksize = chunksize
+        self.allow_materialize = allow_materialize
+        self.columns = columns
+        self.logger = get_logger("PipelineReplayer")
+
+    def replay(self, steps: Union[CleaningHistory, Iterable[CleaningHistoryEntry]], input_path: str,
+               output_path: str, progress_callback: Optional[Callable[[int, int], None]] = None) -> ReplayReport:
+        entries = steps.get_all_entries() if isinstance(steps, CleaningHistory) else list(steps)
+        entries = [entry for entry in entries if entry.successful]
+        unsafe = [position for position, entry in enumerate(entries) if not self._chunk_safe(entry)]
+        if unsafe and not self.allow_materialize:
+            raise ValueError(
+                "Steps " + ", ".join(str(entries[position].iteration) for position in unsafe)
+                + " are not chunk-safe; pass allow_materialize=True to run them on the full intermediate data"
+            )
+
+        report = ReplayReport(input_path=str(input_path), output_path=output_path, steps=len(entries),
+                              materialized_steps=[entries[position].iteration for position in unsafe])
+        start = time.perf_counter()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+        compiled = compile_pipeline(entries, fuse_by=self._chunk_safe, analyze=self.processor.engine.pandas_api)
+        usecols = None
+        if self.columns == 'used' and compiled.projectable:
+            available = self.processor.source_columns(input_path)
+            usecols = compiled.input_columns(available) if available is not None else None
+
+        writer = _ChunkWriter(output_path)
+        try:
+            chunks = self._read_chunks(input_path, report, progress_callback, usecols or None)
+            for stage in compiled.stages:
+                if stage.chunk_safe:
+                    chunks = self._apply_streaming(stage, chunks)
+                else:
+                    chunks = self._apply_materialized(stage, chunks)
+            for chunk in chunks:
+                writer.write(chunk)
+                report.chunks += 1
+                report.rows_out += len(chunk)
+        finally:
+            writer.close()
+
+        report.seconds = time.perf_counter() - start
+        self.logger.info(
+            f"Replayed {report.steps} steps over {report.rows_in} rows in {report.seconds:.2f}s "
+            f"-> {report.rows_out} rows written to {output_path}"
+        )
+        return report
+
+    def _chunk_safe(self, entry: CleaningHistoryEntry) -> bool:
+        if entry.chunk_safe is not None:
+            return entry.chunk_safe
+        # The patterns describe pandas code; other engines' steps are materialized unless marked
+        return self.processor.engine.pandas_api and is_chunk_safe(entry.code)
+
+    def _read_chunks(self, input_path, report: ReplayReport, progress_callback,
+                     usecols: Optional[List] = None) -> Iterator[pd.DataFrame]:
+        with open_source(input_path) as data_source:
+            options = {'usecols': usecols}
+            if data_source.extension in ('csv', 'txt'):
+                sample = data_source.read_sample(SAMPLE_BYTES)
+                options['encoding'] = detect_encoding(sample)
+                if data_source.extension == 'txt':
+                    options.update(sniff_dialect(sample, options['encoding']).read_csv_options())
+            for chunk, bytes_read, total_bytes in self.processor.iter_chunks(data_source, self.chunksize, **options):
+                report.rows_in += len(chunk)
+                if progress_callback:
+                    progress_callback(bytes_read, total_bytes)
+                yield chunk
+
+    def _apply_streaming(self, stage: CompiledStage, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            yield self.processor.engine.run(stage.code, chunk)
+
+    def _apply_materialized(self, stage: CompiledStage, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        frames = list(chunks)
+        steps = ", ".join(map(str, stage.iterations))
+        self.logger.warning(f"Steps {steps} are not chunk-safe, materializing {sum(map(len, frames))} rows")
+        df = self.processor.engine.run(stage.code, pd.concat(frames) if frames else pd.DataFrame())
+        del frames
+        size = self.chunksize or LOAD_CHUNK_SIZE
+        for start in range(0, len(df), size):
+            yield df.iloc[start:start + size]
@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .fingerprint import FrameFingerprint, fingerprint_frame
+
+PREVIEW_ROWS = 5  # the rows df.head() shows in the chat
+
+def stratified_sample(df: pd.DataFrame, rows: int, seed: int = 0, max_strata: int = 50,
+                      rows_per_stratum: int = 2) -> pd.DataFrame:
+    """About ``rows`` rows of ``df`` that cover the cases code most often trips over.
+
+    The sample keeps the first ``PREVIEW_ROWS`` rows, so previews show the same rows as the
+    full result; values from steps that depend on column statistics (``fillna(df.mean())``,
+    scalers, ranks) are computed on the sample and can differ. It adds, for every column, a few null and a few non-null rows,
+    and a row for each value of columns with at most ``max_strata`` distinct values (booleans,
+    categories, low-cardinality text). The rest are uniform random rows. Rows keep their order
+    and index labels.
+    """
+    if len(df) <= rows:
+        return df
+    rng = np.random.default_rng(seed)
+    pilot = rng.choice(len(df), size=min(len(df), rows), replace=False)
+    chosen: List[np.ndarray] = [np.arange(PREVIEW_ROWS)]
+    for position in range(df.shape[1]):
+        series = df.iloc[:, position]
+        missing = series.isna().to_numpy()
+        for mask in (missing, ~missing):
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > rows_per_stratum:
+                candidates = rng.choice(candidates, size=rows_per_stratum, replace=False)
+            chosen.append(candidates)
+        if _is_low_cardinality(series, pilot, max_strata):
+            codes, _ = pd.factorize(series)
+            chosen.append(np.unique(codes, return_index=True)[1])
+
+    # Strata take at most half of the budget; uniform rows fill the rest
+    strata = pd.unique(np.concatenate(chosen))[:max(rows // 2, PREVIEW_ROWS)]
+    available = np.ones(len(df), dtype=bool)
+    available[strata] = False
+    remaining = np.flatnonzero(available)
+    uniform = rng.choice(remaining, size=min(len(remaining), rows - len(strata)), replace=False)
+    return df.take(np.sort(np.concatenate([strata, uniform])))
+
+def _is_low_cardinality(series: pd.Series, pilot: np.ndarray, max_strata: int) -> bool:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return len(series.cat.categories) <= max_strata
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return True
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        try:
+            return series.iloc[pilot].nunique() <= max_strata
+        except TypeError:
+            return False  # unhashable cells
+    return False
+
+class SampleCache:
+    """Stratified samples keyed on the frame's content fingerprint, so each state is sampled once"""
+    def __init__(self, rows: int, max_entries: int = 8, seed: int = 0):
+        self.rows = rows
+        self.max_entries = max_entries
+        self.seed = seed
+        self.hits = 0
+        self.misses = 0
+        self._samples: "OrderedDict[FrameFingerprint, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, df: pd.DataFrame) -> pd.DataFrame:
+        key = fingerprint_frame(df)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is not None:
+                self._samples.move_to_end(key)
+                self.hits += 1
+                return sample
+        sample = stratified_sample(df, self.rows, self.seed)
+        with self._lock:
+            self.misses += 1
+            self._samples[key] = sample
+            while len(self._samples) > self.max_entries:
+                self._samples.popitem(last=False)
+        return sample
@@ -0,0 +1,264 @@
+import multiprocessing
+import pickle
+import threading
+import time
+import traceback
+import weakref
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import pandas as pd
+from utils.logger import forward_logs, get_logger, worker_log_queue
+
+WORKER_STARTUP_TIMEOUT = 60
+
+class SandboxExecutionError(Exception):
+    """Structured failure of a sandboxed run.
+
+    ``kind`` is one of ``error`` (the code raised), ``timeout``, ``memory``, ``cancelled``
+    or ``crashed`` (the worker died for another reason).
+    """
+    def __init__(self, kind: str, message: str, error_type: str = '', traceback_text: str = ''):
+        super().__init__(f"{error_type or kind}: {message}")
+        self.kind = kind
+        self.message = message
+        self.error_type = error_type
+        self.traceback_text = traceback_text
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'kind': self.kind,
+            'error_type': self.error_type,
+            'message': self.message,
+            'traceback': self.traceback_text
+        }
+
+def _write_frame(df: pd.DataFrame) -> Dict:
+    """Copy ``df`` into a new shared memory segment as Arrow IPC (pickle for data Arrow would
+    not give back with the same dtypes)"""
+    import pyarrow as pa
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        if not _arrow_keeps_dtypes(df, table.schema):
+            raise TypeError("Arrow would change column dtypes")
+        sink = pa.MockOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        size, payload_format = sink.size(), 'arrow'
+    except (pa.ArrowException, TypeError, ValueError):
+        data = pickle.dumps(df, protocol=5)
+        size, payload_format = len(data), 'pickle'
+
+    segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        if payload_format == 'arrow':
+            _write_table(segment.buf, table)
+        else:
+            segment.buf[:size] = data
+        return {'name': segment.name, 'size': size, 'format': payload_format}
+    finally:
+        segment.close()
+
+def _arrow_keeps_dtypes(df: pd.DataFrame, schema) -> bool:
+    """False when an object column would come back typed: ints with None as float64, datetimes
+    as datetime64, ... so a step that never touched it would appear to change its dtype"""
+    import pyarrow as pa
+    typed = (pa.types.is_integer, pa.types.is_floating, pa.types.is_boolean, pa.types.is_timestamp,
+             pa.types.is_duration)
+    for position, dtype in enumerate(df.dtypes):
+        if dtype == object:
+            arrow_type = schema.field(position).type
+            if any(is_type(arrow_type) for is_type in typed):
+                return False
+    return True
+
+def _write_table(buf: memoryview, table) -> None:
+    # Kept in its own frame so every Arrow reference to ``buf`` is gone before the segment closes
+    import pyarrow as pa
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(buf)), table.schema) as writer:
+        writer.write_table(table)
+
+def _read_frame(payload: Dict, unlink: bool = False) -> pd.DataFrame:
+    segment = shared_memory.SharedMemory(name=payload['name'])
+    try:
+        view = segment.buf[:payload['size']]
+        if payload['format'] == 'arrow':
+            import pyarrow as pa
+            # Copy out of the segment once so the frame never points into memory we unmap below
+            df = pa.ipc.open_stream(pa.py_buffer(bytes(view))).read_all().to_pandas()
+        else:
+            df = pickle.loads(view)
+        del view
+        return df
+    finally:
+        segment.close()
+        if unlink:
+            segment.unlink()
+
+def _worker_main(conn, log_queue) -> None:
+    """Worker process loop: receive (code, payload, engine), exec, send back a result payload"""
+    forward_logs(log_queue)
+    from .engines import get_engine
+    from .execution import build_namespace, run_code, use_copy_on_write
+    # This process only ever runs one step at a time, so the process-wide copy-on-write
+    # option can be used to avoid copying the frame it was sent
+    use_copy_on_write()
+    # Pay the heavy imports (sklearn included) in the worker, before the first timed run
+    run_code('df = df', pd.DataFrame())
+    build_namespace(pd.DataFrame())
+    conn.send(('ready',))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        code, payload, engine = message
+        try:
+            result = get_engine(engine).run(code, _read_frame(payload))
+            if not isinstance(result, pd.DataFrame):
+                raise TypeError(f"'df' must be a DataFrame after execution, got {type(result).__name__}")
+            conn.send(('ok', _write_frame(result)))
+        except MemoryError as e:
+            conn.send(('memory', type(e).__name__, str(e), traceback.format_exc()))
+        except Exception as e:
+            conn.send(('error', type(e).__name__, str(e), traceback.format_exc()))
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+class SandboxExecutor:
+    """Runs generated code in a separate worker process with a wall-clock timeout and RSS cap.
+
+    The DataFrame travels through shared memory as Arrow IPC. The worker is started lazily,
+    reused across runs, and killed (then restarted on the next run) on timeout, memory
+    overrun or ``cancel()``, so a runaway snippet never takes the Streamlit server down.
+    """
+    def __init__(self, timeout_seconds: float = 120, memory_limit_mb: Optional[int] = None,
+                 poll_interval: float = 0.1):
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.poll_interval = poll_interval
+        self.logger = get_logger("SandboxExecutor")
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._finalizer = weakref.finalize(self, SandboxExecutor._stop, self.__dict__)
+
+    def run(self, code: str, df: pd.DataFrame, engine: str = 'pandas') -> pd.DataFrame:
+        """Execute ``code`` against ``df`` in the worker with the named engine and return the resulting ``df``"""
+        with self._lock:
+            self._cancelled.clear()
+            self._ensure_worker()
+            payload = _write_frame(df)
+            try:
+                self._conn.send((code, payload, engine))
+                response = self._wait_for_response()
+            finally:
+                self._unlink(payload)
+
+            status = response[0]
+            if status == 'ok':
+                return _read_frame(response[1], unlink=True)
+            _, error_type, message, traceback_text = response
+            raise SandboxExecutionError(status, message, error_type, traceback_text)
+
+    def cancel(self) -> None:
+        """Abort the currently running snippet, if any"""
+        self._cancelled.set()
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def _wait_for_response(self):
+        start = time.monotonic()
+        while not self._conn.poll(self.poll_interval):
+            elapsed = time.monotonic() - start
+            if self._cancelled.is_set():
+                self._kill("cancelled", "Execution was cancelled")
+            if self.timeout_seconds and elapsed > self.timeout_seconds:
+                self._kill("timeout", f"Execution exceeded the {self.timeout_seconds}s time limit")
+            if self.memory_limit_bytes:
+                rss = _rss_bytes(self._process.pid)
+                if rss is not None and rss > self.memory_limit_bytes:
+                    self._kill(
+                        "memory",
+                        f"Execution used {rss // (1024 * 1024)} MB, above the "
+                        f"{self.memory_limit_bytes // (1024 * 1024)} MB limit"
+                    )
+            if not self._process.is_alive():
+                exitcode = self._process.exitcode
+                self._reset()
+                raise SandboxExecutionError("crashed", f"Worker process exited with code {exitcode}")
+        try:
+            return self._conn.recv()
+        except EOFError:
+            self._reset()
+            raise SandboxExecutionError("crashed", "Worker process closed the connection")
+
+    def _kill(self, kind: str, message: str) -> None:
+        self.logger.warning(f"Killing sandbox worker: {message}")
+        self._process.kill()
+        self._process.join()
+        self._reset()
+        raise SandboxExecutionError(kind, message)
+
+    def _ensure_worker(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            return
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_worker_main, args=(child_conn, worker_log_queue()),
+                                              daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        try:
+            ready = parent_conn.poll(WORKER_STARTUP_TIMEOUT) and parent_conn.recv() == ('ready',)
+        except EOFError:
+            ready = False
+        if not ready:
+            self._process.kill()
+            self._reset()
+            raise SandboxExecutionError("crashed", "Sandbox worker failed to start")
+        self.logger.info(f"Started sandbox worker (pid {self._process.pid})")
+
+    def _reset(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._process = None
+
+    @staticmethod
+    def _unlink(payload: Dict) -> None:
+        try:
+            segment = shared_memory.SharedMemory(name=payload['name'])
+            segment.close()
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _stop(state: Dict) -> None:
+        process, conn = state.get('_process'), state.get('_conn')
+        if conn is not None:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+            conn.close()
+        if process is not None:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+        state['_process'] = None
+        state['_conn'] = None
@@ -0,0 +1,109 @@
+import codecs
+import csv
+from dataclasses import dataclass
+from typing import Dict
+
+SAMPLE_BYTES = 256 * 1024
+CANDIDATE_DELIMITERS = [',', ';', '\t', '|']
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+FALLBACK_ENCODING = 'cp1252'
+
+@dataclass(frozen=True)
+class CsvDialect:
+    """Delimiter, quoting and header layout detected for a delimited text file"""
+    delimiter: str
+    quotechar: str = '"'
+    has_header: bool = True
+
+    def read_csv_options(self) -> Dict:
+        return {
+            'sep': self.delimiter,
+            'quotechar': self.quotechar,
+            'header': 0 if self.has_header else None
+        }
+
+def detect_encoding(sample: bytes) -> str:
+    """Detect the text encoding of a file from a byte sample (BOM, strict UTF-8, then statistical)"""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        # An incremental decoder tolerates a multi-byte character cut off at the sample boundary
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        from charset_normalizer import from_bytes
+        matches = from_bytes(sample)
+        best = matches.best()
+        if best is not None:
+            # Short samples are often equally plausible as several code pages; prefer the common Western one
+            for match in matches:
+                if match.encoding == FALLBACK_ENCODING and match.chaos <= best.chaos:
+                    return FALLBACK_ENCODING
+            return best.encoding
+    except ImportError:
+        pass
+
+    try:
+        sample.decode(FALLBACK_ENCODING)
+        return FALLBACK_ENCODING
+    except UnicodeDecodeError:
+        return 'latin1'
+
+def sniff_dialect(sample: bytes, encoding: str = 'utf-8') -> CsvDialect:
+    """Detect the dialect from a bounded byte sample instead of trial-parsing the whole file"""
+    text = sample.decode(encoding, errors='replace')
+    lines = text.splitlines()
+    if len(sample) and not text.endswith(('\n', '\r')) and len(lines) > 1:
+        lines = lines[:-1]  # the last line is probably cut off by the sample boundary
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        raise ValueError("Could not determine delimiter for txt file")
+    text = '\n'.join(lines)
+
+    sniffer = csv.Sniffer()
+    try:
+        sniffed = sniffer.sniff(text, delimiters=''.join(CANDIDATE_DELIMITERS))
+        delimiter, quotechar = sniffed.delimiter, sniffed.quotechar or '"'
+    except csv.Error:
+        delimiter, quotechar = _most_consistent_delimiter(lines), '"'
+
+    if delimiter is None or not any(len(row) > 1 for row in csv.reader(lines[:50], delimiter=delimiter, quotechar=quotechar)):
+        raise ValueError("Could not determine delimiter for txt file")
+
+    # csv.Sniffer.has_header misfires on all-text tables, so only treat the first row as data
+    # when it contains numeric fields, which real header rows almost never do
+    first_row = next(csv.reader(lines[:1], delimiter=delimiter, quotechar=quotechar))
+    has_header = not any(_is_number(field) for field in first_row)
+
+    return CsvDialect(delimiter=delimiter, quotechar=quotechar, has_header=has_header)
+
+def _most_consistent_delimiter(lines):
+    """Pick the candidate that splits the most sample lines into the same number of fields"""
+    best, best_score = None, 0
+    for delimiter in CANDIDATE_DELIMITERS:
+        counts = [len(row) for row in csv.reader(lines, delimiter=delimiter)]
+        if not counts or max(counts) < 2:
+            continue
+        modal = max(set(counts), key=counts.count)
+        score = counts.count(modal) * (modal > 1)
+        if score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+def _is_number(field: str) -> bool:
+    try:
+        float(field.strip())
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,80 @@
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional, Union
+
+@dataclass
+class DataSource:
+    """A dataset to read: either a real path or an in-memory, rewindable reader"""
+    name: str
+    size: int
+    path: Optional[str] = None
+    handle: Optional[object] = None
+
+    @property
+    def extension(self) -> str:
+        return self.name.lower().split('.')[-1]
+
+    def reader(self) -> Union[str, object]:
+        """Return something pandas can read from, positioned at the start of the data"""
+        if self.path is not None:
+            return self.path
+        self.handle.seek(0)
+        return self.handle
+
+    def read_sample(self, sample_bytes: int) -> bytes:
+        if self.path is not None:
+            with open(self.path, 'rb') as handle:
+                return handle.read(sample_bytes)
+        self.handle.seek(0)
+        sample = self.handle.read(sample_bytes)
+        self.handle.seek(0)
+        return bytes(sample)
+
+@contextmanager
+def open_source(source, file_name: Optional[str] = None) -> Iterator[DataSource]:
+    """Open a path, bytes-like object or file-like object (e.g. a Streamlit upload) for reading.
+
+    In-memory uploads are wrapped in a zero-copy reader over their buffer. Only streams that
+    cannot seek are spooled to a uniquely named temporary file, which is removed afterwards.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        yield DataSource(name=file_name or path, size=os.path.getsize(path), path=path)
+        return
+
+    name = file_name or getattr(source, 'name', None)
+    if not name:
+        raise ValueError("A file name is required to load data from a buffer")
+
+    if hasattr(source, 'getbuffer'):  # io.BytesIO and Streamlit's UploadedFile
+        source = source.getbuffer()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = memoryview(source)
+        yield DataSource(name=name, size=buffer.nbytes, handle=_buffer_reader(buffer))
+        return
+
+    if source.seekable():
+        size = source.seek(0, io.SEEK_END)
+        source.seek(0)
+        yield DataSource(name=name, size=size, handle=source)
+        return
+
+    extension = os.path.splitext(name)[1]
+    descriptor, path = tempfile.mkstemp(prefix='upload_', suffix=extension)
+    try:
+        with os.fdopen(descriptor, 'wb') as spooled:
+            shutil.copyfileobj(source, spooled)
+        yield DataSource(name=name, size=os.path.getsize(path), path=path)
+    finally:
+        os.remove(path)
+
+def _buffer_reader(buffer: memoryview):
+    try:
+        import pyarrow as pa
+        return pa.BufferReader(pa.py_buffer(buffer))
+    except ImportError:
+        return io.BytesIO(buffer)
@@ -0,0 +1,405 @@
+import ast
+import builtins
+import difflib
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from utils.config import VALIDATION_ROWWISE_MAX_ROWS
+from utils.tracing import span
+from .compiler import _column_labels, _literal, _mapping_keys
+from .execution import SKLEARN_NAMES
+
+# Names generated code may use without defining them (see execution.build_namespace)
+NAMESPACE_NAMES = frozenset({'df', 'pd', 'np', *SKLEARN_NAMES, *dir(builtins)})
+
+# df = df.<method>(...) keeps every column the step did not name (rename() is handled separately);
+# rebinding df in any other way hides its columns from the checks that follow
+COLUMN_PRESERVING_METHODS = frozenset({
+    'dropna', 'drop_duplicates', 'drop', 'fillna', 'astype', 'sort_values', 'sort_index', 'head', 'tail',
+    'copy', 'replace', 'query', 'sample', 'round', 'clip', 'abs', 'ffill', 'bfill', 'interpolate',
+    'infer_objects', 'convert_dtypes', 'where', 'mask', 'assign', 'nlargest', 'nsmallest'
+})
+
+# DataFrame methods whose column arguments must exist: method -> (keyword, position of the argument)
+COLUMN_ARGUMENTS = {
+    'dropna': ('subset', None),
+    'drop_duplicates': ('subset', 0),
+    'sort_values': ('by', 0),
+    'groupby': ('by', 0),
+    'set_index': ('keys', 0),
+    'pop': ('item', 0),
+    'nlargest': ('columns', 1),
+    'nsmallest': ('columns', 1),
+}
+
+ACCESSORS = {'str': pd.Series.str, 'dt': pd.Series.dt, 'cat': pd.Series.cat}
+
+@dataclass
+class ValidationIssue:
+    """One problem found in generated code before running it"""
+    kind: str  # syntax, column, name, attribute or performance
+    message: str
+    lineno: Optional[int] = None
+
+    def __str__(self) -> str:
+        return f"line {self.lineno}: {self.message}" if self.lineno else self.message
+
+class CodeValidationError(Exception):
+    """Generated code rejected by static checks; carries every issue found"""
+    kind = 'validation'
+
+    def __init__(self, issues: List[ValidationIssue]):
+        super().__init__("; ".join(str(issue) for issue in issues))
+        self.issues = issues
+
+def validate_code(code: str, df: pd.DataFrame,
+                  rowwise_max_rows: int = VALIDATION_ROWWISE_MAX_ROWS) -> List[ValidationIssue]:
+    """Statically check ``code`` against the columns and size of ``df`` without running it.
+
+    Only reports what is certain to fail (unknown columns, names, methods) or to crawl
+    (row-wise Python over more than ``rowwise_max_rows`` rows; 0 disables that check).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [ValidationIssue('syntax', f"syntax error: {e.msg}", e.lineno)]
+    checker = _Checker(tree, df.columns)
+    checker.check_names()
+    checker.check_attributes()
+    checker.check_columns()
+    if rowwise_max_rows and len(df) > rowwise_max_rows:
+        checker.check_rowwise(len(df))
+    return sorted(checker.issues, key=lambda issue: issue.lineno or 0)
+
+def check_code(code: str, df: pd.DataFrame, rowwise_max_rows: int = VALIDATION_ROWWISE_MAX_ROWS) -> None:
+    """Raise ``CodeValidationError`` if ``validate_code`` finds anything"""
+    with span("validate", rows=len(df)) as validate_span:
+        issues = validate_code(code, df, rowwise_max_rows)
+        validate_span.set(issues=len(issues))
+    if issues:
+        raise CodeValidationError(issues)
+
+def _suggest(word: str, candidates: Iterable) -> str:
+    by_text = {str(candidate): candidate for candidate in candidates}
+    close = difflib.get_close_matches(str(word), list(by_text), n=1, cutoff=0.6)
+    if not close:
+        close = [text for text in by_text if text.lower() == str(word).lower()][:1]
+    return f" (did you mean {by_text[close[0]]!r}?)" if close else ""
+
+class _Checker:
+    def __init__(self, tree: ast.Module, columns: Iterable):
+        self.tree = tree
+        self.columns = list(columns)
+        self.issues: List[ValidationIssue] = []
+        self.parents = {child: parent for parent in ast.walk(tree) for child in ast.iter_child_nodes(parent)}
+        # Position of the top-level statement each node belongs to, to order creation before use
+        self.order = {node: position for position, statement in enumerate(tree.body)
+                      for node in ast.walk(statement)}
+        self.bound = self._bound_names()
+        self.frame_is_local = any(isinstance(node, ast.arg) and node.arg == 'df' for node in ast.walk(tree))
+        self.cutoff = self._cutoff(self._frame_uses())
+
+    def _checked(self, node: ast.AST) -> bool:
+        """Whether df at ``node`` is still the input frame, with its columns known"""
+        if self.frame_is_local:
+            return False
+        return self.cutoff is None or node.lineno <= self.cutoff
+
+    def _issue(self, kind: str, message: str, node: ast.AST) -> None:
+        self.issues.append(ValidationIssue(kind, message, getattr(node, 'lineno', None)))
+
+    def _frame_uses(self) -> List[ast.Name]:
+        return [node for node in ast.walk(self.tree) if isinstance(node, ast.Name) and node.id == 'df']
+
+    # -- names ---------------------------------------------------------------------------------
+
+    def _bound_names(self) -> Set[str]:
+        bound = set()
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                bound.add(node.id)
+            elif isinstance(node, ast.arg):
+                bound.add(node.arg)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bound.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    bound.add(alias.asname or alias.name.split('.')[0])
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                bound.add(node.name)
+            elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+                bound.add(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                bound.update(node.names)
+        return bound
+
+    def check_names(self) -> None:
+        if any(isinstance(node, ast.ImportFrom) and any(alias.name == '*' for alias in node.names)
+               for node in ast.walk(self.tree)):
+            return
+        known = NAMESPACE_NAMES | self.bound
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in known:
+                hint = (f" (use df[{node.id!r}] for the column)" if node.id in self.columns
+                        else _suggest(node.id, known - set(dir(builtins))))
+                self._issue('name', f"name '{node.id}' is not defined{hint}", node)
+
+    # -- attributes ----------------------------------------------------------------------------
+
+    def check_attributes(self) -> None:
+        for node in ast.walk(self.tree):
+            if not isinstance(node, ast.Attribute) or not isinstance(node.ctx, ast.Load):
+                continue
+            owner = self._owner(node.value)
+            if owner is None:
+                continue
+            label, target = owner
+            if not hasattr(target, node.attr):
+                members = [name for name in dir(target) if not name.startswith('_')]
+                self._issue('attribute', f"{label} has no attribute '{node.attr}'{_suggest(node.attr, members)}", node)
+
+    def _owner(self, node: ast.AST):
+        """(label, object to check attributes against) for pd, np, a df column and its accessors"""
+        if isinstance(node, ast.Name) and node.id in ('pd', 'np') and node.id not in self.bound:
+            return node.id, pd if node.id == 'pd' else np
+        if _is_frame(node) and self._checked(node) and self._is_called(self.parents[node]):
+            return "DataFrame", pd.DataFrame  # df.method(...); df.column_name is checked as a column
+        if self._is_column(node):
+            return f"Series {_literal(node.slice)!r}", pd.Series
+        if (isinstance(node, ast.Attribute) and node.attr in ACCESSORS and self._is_column(node.value)):
+            return f"the .{node.attr} accessor", ACCESSORS[node.attr]
+        return None
+
+    def _is_called(self, node: ast.AST) -> bool:
+        parent = self.parents.get(node)
+        return isinstance(parent, ast.Call) and parent.func is node
+
+    def _is_column(self, node: ast.AST) -> bool:
+        # df['a'] is a Series as long as df is the input frame and has one column named 'a'
+        return (isinstance(node, ast.Subscript) and _is_frame(node.value) and self._checked(node)
+                and isinstance(_literal(node.slice), str) and self.columns.count(_literal(node.slice)) == 1)
+
+    # -- columns -------------------------------------------------------------------------------
+
+    def check_columns(self) -> None:
+        """Flag reads of columns that neither exist nor are created by the code.
+
+        Checks stop after the first statement that rebinds ``df`` in a way that could add
+        columns (merge, get_dummies, rename with a function, ...). A column created anywhere
+        in a loop or branch counts as known throughout it. Reads guarded by ``if 'a' in df``
+        or ``if 'a' in df.columns``, or inside a ``try`` that catches ``KeyError``, are left alone.
+        """
+        created = self._created()
+        for name in self._frame_uses():
+            if not self._checked(name):
+                continue
+            position = self.order[name]
+            for label, node in self._column_reads(name):
+                if label in self.columns or label in created and (
+                        created[label] < position
+                        or created[label] == position and not isinstance(self.tree.body[position], ast.Assign)):
+                    continue
+                if self._guarded(node, label):
+                    continue
+                known = set(self.columns) | {column for column, at in created.items() if at < position}
+                self._issue('column', f"column {label!r} does not exist{_suggest(label, known)}", node)
+
+    def _guarded(self, node: ast.AST, label) -> bool:
+        """Whether ``node`` only runs once ``label`` is known to exist, or handles it missing"""
+        while node in self.parents:
+            child, node = node, self.parents[node]
+            if isinstance(node, (ast.If, ast.IfExp)) and child is not node.test and child in (
+                    node.body if isinstance(node.body, list) else [node.body]):
+                if any(_is_membership_test(test, label) for test in ast.walk(node.test)):
+                    return True
+            elif isinstance(node, ast.Try) and child in node.body:
+                if any(_catches_key_error(handler) for handler in node.handlers):
+                    return True
+        return False
+
+    def _cutoff(self, uses: List[ast.Name]) -> Optional[int]:
+        """Last line still checked: the end of the first statement that hides df's columns"""
+        for name in sorted(uses, key=lambda node: (node.lineno, node.col_offset)):
+            statement = self._statement(name)
+            hides = False
+            if isinstance(name.ctx, ast.Store):
+                hides = not (isinstance(statement, ast.Assign) and self._preserves_columns(statement.value))
+                hides = hides or self._in_loop(statement)
+            else:
+                parent = self.parents.get(name)
+                if isinstance(parent, ast.Attribute) and isinstance(parent.ctx, ast.Store):
+                    hides = True  # df.columns = [...]
+                elif isinstance(parent, ast.Attribute) and isinstance(self.parents.get(parent), ast.Call):
+                    call = self.parents[parent]
+                    hides = _literal(_keyword(call, 'inplace')) is True and not self._preserves_columns(call)
+            if hides:
+                return statement.end_lineno
+        return None
+
+    def _preserves_columns(self, node: ast.AST) -> bool:
+        while True:
+            if _is_frame(node):
+                return True
+            if isinstance(node, ast.Subscript):
+                if isinstance(_literal(node.slice), str):
+                    return False  # df['a'] is a Series
+                node = node.value
+            elif isinstance(node, ast.Attribute) and node.attr in ('loc', 'iloc'):
+                node = node.value
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                method = node.func.attr
+                if method == 'rename' and not isinstance(_keyword(node, 'columns'), ast.Dict):
+                    return False
+                if method == 'reset_index' and _literal(_keyword(node, 'drop')) is not True:
+                    return False
+                if method not in COLUMN_PRESERVING_METHODS | {'rename', 'reset_index'}:
+                    return False
+                node = node.func.value
+            else:
+                return False
+
+    def _created(self) -> Dict:
+        """Literal columns the code assigns, inserts, assigns via assign() or renames to, each
+        with the position of the first top-level statement that creates it"""
+        created = {}
+
+        def add(labels, node):
+            for label in labels:
+                created[label] = min(created.get(label, self.order[node]), self.order[node])
+
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+                frame = node.value
+                key = node.slice
+                if isinstance(frame, ast.Attribute) and frame.attr in ('loc', 'at'):
+                    frame = frame.value
+                    key = key.elts[1] if isinstance(key, ast.Tuple) and len(key.elts) == 2 else None
+                if _is_frame(frame):
+                    add(_column_labels(key) or [], node)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and _is_frame(node.func.value):
+                method = node.func.attr
+                if method == 'assign':
+                    add([keyword.arg for keyword in node.keywords if keyword.arg], node)
+                elif method == 'insert':
+                    add(_column_labels(_argument(node, 'column', 1)) or [], node)
+                elif method == 'rename':
+                    mapping = _literal(_keyword(node, 'columns'))
+                    if isinstance(mapping, dict):
+                        add(mapping.values(), node)
+        return created
+
+    def _column_reads(self, name: ast.Name):
+        """(label, node) for each column a single use of df certainly reads"""
+        parent = self.parents.get(name)
+        if isinstance(parent, ast.Subscript) and parent.value is name and not isinstance(parent.ctx, ast.Store):
+            for label in _column_labels(parent.slice) or []:
+                yield label, parent
+        elif isinstance(parent, ast.Attribute) and parent.value is name:
+            call = self.parents.get(parent)
+            if parent.attr == 'loc' and isinstance(call, ast.Subscript) and isinstance(call.ctx, ast.Load) \
+                    and isinstance(call.slice, ast.Tuple) and len(call.slice.elts) == 2:
+                for label in _column_labels(call.slice.elts[1]) or []:
+                    yield label, call
+            elif isinstance(call, ast.Call) and call.func is parent:
+                for label in self._method_columns(parent.attr, call):
+                    yield label, call
+            elif (not hasattr(pd.DataFrame, parent.attr) and isinstance(parent.ctx, ast.Load)
+                  and not self._is_called(parent)):
+                yield parent.attr, parent  # df.column_name
+
+    @staticmethod
+    def _method_columns(method: str, call: ast.Call) -> List:
+        if method == 'drop':
+            if _literal(_keyword(call, 'errors')) == 'ignore':
+                return []
+            labels = _keyword(call, 'columns')
+            if labels is None and _literal(_keyword(call, 'axis')) in (1, 'columns'):
+                labels = _argument(call, 'labels', 0)
+            return _column_labels(labels) or []
+        if method == 'astype':
+            return _mapping_keys(_argument(call, 'dtype', 0)) or []
+        if method in COLUMN_ARGUMENTS:
+            keyword, position = COLUMN_ARGUMENTS[method]
+            if method == 'groupby' and _literal(_keyword(call, 'axis')) in (1, 'columns'):
+                return []
+            return _column_labels(_argument(call, keyword, position)) or []
+        return []
+
+    # -- row-wise Python -----------------------------------------------------------------------
+
+    def check_rowwise(self, rows: int) -> None:
+        advice = f"over {rows:,} rows; use vectorized column operations instead"
+        for node in ast.walk(self.tree):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                method = node.func.attr
+                if method in ('iterrows', 'itertuples'):
+                    self._issue('performance', f"{method}() loops in Python {advice}", node)
+                elif method == 'apply' and _literal(_keyword(node, 'axis')) in (1, 'columns'):
+                    self._issue('performance', f"apply(axis=1) calls a Python function per row {advice}", node)
+            elif isinstance(node, ast.For) and self._is_row_iteration(node.iter):
+                self._issue('performance', f"the loop runs Python once per row {advice}", node)
+
+    @staticmethod
+    def _is_row_iteration(node: ast.AST) -> bool:
+        """range(len(df)), df.index, df['a'], df['a'].values, ... or a zip() of them"""
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id == 'range':
+                return any(_is_frame(inner) for argument in node.args for inner in ast.walk(argument))
+            if node.func.id in ('zip', 'enumerate'):
+                return any(_Checker._is_row_iteration(argument) for argument in node.args)
+            return False
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                and node.func.attr in ('tolist', 'to_numpy', 'items'):
+            node = node.func.value
+            if isinstance(node, ast.Name):
+                return False  # df.items() yields columns
+        elif isinstance(node, ast.Attribute) and node.attr == 'values':
+            node = node.value
+        if isinstance(node, ast.Attribute) and node.attr == 'index':
+            return _is_frame(node.value)
+        return (isinstance(node, ast.Subscript) and _is_frame(node.value)
+                and isinstance(_literal(node.slice), str))
+
+    # -- helpers -------------------------------------------------------------------------------
+
+    def _statement(self, node: ast.AST) -> ast.stmt:
+        while not isinstance(node, ast.stmt):
+            node = self.parents[node]
+        return node
+
+    def _in_loop(self, node: ast.AST) -> bool:
+        while node in self.parents:
+            node = self.parents[node]
+            if isinstance(node, (ast.For, ast.While, ast.FunctionDef, ast.AsyncFunctionDef)):
+                return True
+        return False
+
+def _is_frame(node: ast.AST) -> bool:
+    return isinstance(node, ast.Name) and node.id == 'df'
+
+def _is_membership_test(node: ast.AST, label) -> bool:
+    """'a' in df, 'a' in df.columns"""
+    if not (isinstance(node, ast.Compare) and len(node.ops) == 1 and isinstance(node.ops[0], ast.In)
+            and _literal(node.left) == label):
+        return False
+    container = node.comparators[0]
+    if isinstance(container, ast.Attribute) and container.attr == 'columns':
+        container = container.value
+    return _is_frame(container)
+
+def _catches_key_error(handler: ast.ExceptHandler) -> bool:
+    names = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(name is None or isinstance(name, ast.Name) and name.id in ('KeyError', 'LookupError', 'Exception')
+               for name in names)
+
+def _keyword(call: ast.Call, name: str) -> Optional[ast.AST]:
+    return next((keyword.value for keyword in call.keywords if keyword.arg == name), None)
+
+def _argument(call: ast.Call, name: str, position: Optional[int]) -> Optional[ast.AST]:
+    value = _keyword(call, name)
+    if value is None and position is not None and len(call.args) > position:
+        value = call.args[position]
+    return value
@@ -1,22 +1,52 @@
 from dotenv import load_dotenv
+import importlib
 import os
+import tempfile
+import threading
 import streamlit as st
-from agents.code_conversion.agent import CodeConversionAgent
+from agents.code_conversion.models import CleaningHistory, CleaningHistoryEntry
 from data_processor.processor import DataProcessor
-from utils.logger import get_logger
-from ui.state import initialize_session_state
+from data_processor.export import EXPORT_FORMATS
+from data_processor.history import DataFrameHistory
+from data_processor.sandbox import SandboxExecutor
+from utils.logger import get_logger, set_correlation_id
+from utils.tracing import collect_spans
+from utils.config import (
+    HISTORY_MEMORY_BUDGET_MB, HISTORY_SPILL_DIR,
+    SANDBOX_ENABLED, SANDBOX_TIMEOUT_SECONDS, SANDBOX_MEMORY_LIMIT_MB,
+    EXPORT_SPOOL_MAX_MB, EXPORT_SPOOL_DIR
+)
+from ui.state import applied_history, initialize_session_state, release_export
 from ui.components import (
     display_logo, display_code_history, 
-    display_chat_history, display_sidebar_actions
+    display_chat_history, display_sidebar_actions, display_sample_preview
 )
 from ui.constants import (
     APP_TITLE, APP_ICON,
     ALLOWED_FILE_TYPES, OUTPUT_FILENAME
 )
 
+@st.cache_resource(show_spinner=False)
+def get_agent(api_key):
+    """One agent (model client, code cache, generator, fixer) shared by every session.
+
+    Generated code always runs through the session's processor and sandbox, so the agent
+    holds no per-session state. The langchain stack is imported on first use.
+    """
+    from agents.code_conversion.agent import CodeConversionAgent
+    return CodeConversionAgent(api_key)
+
+@st.cache_resource(show_spinner=False)
+def preload_agent_module():
+    """Import the agent's dependencies in the background once, after the first page is drawn"""
+    thread = threading.Thread(target=importlib.import_module, args=("agents.code_conversion.agent",), daemon=True)
+    thread.start()
+    return thread
+
 def main():
     logger = get_logger("DataCleaning")
     initialize_session_state()
+    set_correlation_id(st.session_state.session_id)
     load_dotenv()
 
     api_key = os.getenv("DEEPINFRA_API_TOKEN")
@@ -29,8 +59,16 @@ def main():
     st.title(APP_TITLE)
 
     try:
-        agent = CodeConversionAgent(api_key)
-        processor = DataProcessor(agent)
+        # One sandbox worker per session, so a runaway snippet only affects its own user
+        if SANDBOX_ENABLED and st.session_state.get('sandbox') is None:
+            st.session_state.sandbox = SandboxExecutor(SANDBOX_TIMEOUT_SECONDS, SANDBOX_MEMORY_LIMIT_MB)
+        sandbox = st.session_state.get('sandbox')
+
+        # The processor keeps the session's sandbox and pinned CSV dialects, so it lives as long
+        # as the session instead of being rebuilt on every rerun
+        if st.session_state.get('processor') is None:
+            st.session_state.processor = DataProcessor(None, sandbox=sandbox)
+        processor = st.session_state.processor
 
         uploaded_file = st.file_uploader(
             "Upload your dataset",
@@ -39,16 +77,18 @@ def main():
 
         if uploaded_file and st.session_state.current_df is None:
             try:
-                temp_path = f"temp_{uploaded_file.name}"
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-
-                df = processor.load_data(temp_path)
+                # Parse straight from the upload buffer, no temp file in the working directory
+                df = processor.load_data(uploaded_file)
                 st.session_state.current_df = df
                 # Initialize history with the first DataFrame
-                st.session_state.df_history = [df.copy()]
-                st.session_state.df_history_position = 0
-                os.remove(temp_path)
+                if st.session_state.df_history is not None:
+                    st.session_state.df_history.clear()
+                st.session_state.df_history = DataFrameHistory(
+                    memory_budget_bytes=HISTORY_MEMORY_BUDGET_MB * 1024 * 1024,
+                    spill_dir=HISTORY_SPILL_DIR
+                )
+                st.session_state.df_history_position = st.session_state.df_history.push(df)
+                st.session_state.cleaning_history = CleaningHistory()
 
                 st.session_state.chat_history.append({
                     'type': 'data',
@@ -94,35 +134,55 @@ def main():
                         st.rerun()
 
             if user_prompt:
-                with st.spinner("Processing..."):
+                # Every span finished during the step (model call, exec, fixes, history) is kept
+                # with the step and shown in the sidebar
+                with st.spinner("Processing..."), collect_spans() as step_spans:
                     try:
                         st.session_state.chat_history.append({
                             'type': 'instruction',
                             'content': user_prompt
                         })
 
+                        agent = get_agent(api_key)
+                        processor.agent = agent
                         code = agent.code_generator.generate_code(
                             user_prompt,
-                            list(st.session_state.current_df.columns)
+                            list(st.session_state.current_df.columns),
+                            st.session_state.current_df.dtypes.astype(str).to_dict()
                         )
                         st.session_state.code_snippets.append(code)
+                        st.session_state.step_metrics.append(step_spans)
 
-                        new_df = processor.process_data(
+                        # Large frames are tried on a sample first; its result is shown while the full run goes on
+                        preview = st.empty()
+                        total_rows = len(st.session_state.current_df)
+                        result = processor.execute_step(
                             st.session_state.current_df,
-                            custom_code=code
+                            code,
+                            on_preview=lambda sample_df: display_sample_preview(preview, sample_df, total_rows)
                         )
 
-                        if not new_df.equals(st.session_state.current_df):
+                        if result.changed:
                             # Remove any future history if not at latest state
-                            st.session_state.df_history = st.session_state.df_history[:st.session_state.df_history_position + 1]
-                            # Append new state to history
-                            st.session_state.df_history.append(new_df.copy())
+                            st.session_state.df_history.truncate(st.session_state.df_history_position + 1)
+                            st.session_state.cleaning_history.truncate(st.session_state.df_history_position)
+                            # Append new state to history (only changed columns are stored)
+                            st.session_state.df_history.push(result.df)
                             st.session_state.df_history_position += 1
-                            st.session_state.current_df = new_df
+                            st.session_state.current_df = result.df
+                            # Record the code that actually ran so the pipeline can be replayed
+                            st.session_state.cleaning_history.add_entry(CleaningHistoryEntry(
+                                iteration=st.session_state.df_history_position,
+                                instruction=user_prompt,
+                                code=result.code,
+                                successful=True,
+                                changes=result.diff.summary() if result.diff else ''
+                            ))
 
                         st.session_state.chat_history.append({
                             'type': 'data',
-                            'content': st.session_state.current_df.head()
+                            'content': st.session_state.current_df.head(),
+                            'changes': result.diff.summary() if result.diff else None
                         })
 
                         st.rerun()
@@ -135,37 +195,51 @@ def main():
 
         if st.session_state.get("trigger_download") and st.session_state.current_df is not None:
             try:
-                output_file = "cleaned_data.csv"
-                processor.save_data(st.session_state.current_df, output_file)
-
-                with open(output_file, "rb") as f:
-                    st.session_state.cleaned_data = f.read()
+                # Export into a per-session spooled buffer: kept in memory while small, moved to
+                # a private temporary file when large, and never written to the working directory
+                release_export()
+                export_format = st.session_state.export_format
+                export_buffer = tempfile.SpooledTemporaryFile(
+                    max_size=EXPORT_SPOOL_MAX_MB * 1024 * 1024,
+                    dir=EXPORT_SPOOL_DIR
+                )
+                processor.save_data(st.session_state.current_df, export_buffer, export_format)
+                st.session_state.export_buffer = export_buffer
+                st.session_state.export_file_format = export_format
 
-                processor.log_processing_history()
+                processor.log_processing_history(applied_history())
                 st.session_state.trigger_download = False
                 st.session_state.show_download_message = True
             except Exception as e:
                 logger.error(f"Error saving data: {e}")
                 st.error(f"Error saving data: {str(e)}")
 
-        if st.session_state.get("show_download_message"):
+        if st.session_state.get("show_download_message") and st.session_state.export_buffer is not None:
+            export_format = EXPORT_FORMATS[st.session_state.export_file_format]
             with st.container():
                 st.success("✅ Data processed successfully! Download below.")
+                if st.session_state.export_data is None:
+                    # The download button serves bytes; read the export once, not on every rerun
+                    st.session_state.export_buffer.seek(0)
+                    st.session_state.export_data = st.session_state.export_buffer.read()
                 st.download_button(
-                    label="📥 Download Cleaned Data",
-                    data=st.session_state.cleaned_data,
-                    file_name="cleaned_data.csv",
-                    mime="text/csv",
-                    key="success_download_btn"
+                    label=f"📥 Download Cleaned Data ({export_format.label})",
+                    data=st.session_state.export_data,
+                    file_name=f"{os.path.splitext(OUTPUT_FILENAME)[0]}.{export_format.extension}",
+                    mime=export_format.mime,
+                    key="success_download_btn",
+                    on_click=release_export  # the buffer is released once it has been downloaded
                 )
                 if st.button("Close Message"):
-                    st.session_state.show_download_message = False
+                    release_export()
                     st.rerun()
 
     except Exception as e:
         logger.error(f"Error in processing pipeline: {e}")
         st.error(f"An error occurred: {str(e)}")
 
+    preload_agent_module()
+
 if __name__ == "__main__":
     st.set_page_config(
         page_title=APP_TITLE,
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep test runs from writing into the repo's logs/ directory; set before utils.config is imported
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="agent-logs-"))
@@ -0,0 +1,38 @@
+import pytest
+
+from data_processor.chunk_safety import is_chunk_safe
+
+
+@pytest.mark.parametrize("code", [
+    "df['b'] = df['a'] * 2",
+    "df['name'] = df['name'].str.strip().str.lower()",
+    "df = df[df['a'] > 3]",
+    "df['a'] = df['a'].fillna(0)",
+    "df['b'] = df['a'].apply(lambda x: max(x, 0))",
+    "df['n'] = df['s'].apply(lambda x: len(x) if isinstance(x, str) else 0)",
+    "df['c'] = df.apply(lambda row: row['a'] + row['b'], axis=1)",
+    "df['d'] = pd.to_datetime(df['d']).dt.year",
+    "for col in ['a', 'b']:\n    df[col] = df[col].apply(lambda x: x * 2)",
+])
+def test_row_local_code_is_safe(code):
+    assert is_chunk_safe(code)
+
+
+@pytest.mark.parametrize("code", [
+    "df['a'] = df['a'].fillna(df['a'].mean())",
+    "df = df.sort_values('a')",
+    "df = df.drop_duplicates()",
+    "df = df.head(10)",
+    "df['a'] = df['a'].fillna(method='ffill')",
+    "df['a'] = df['a'].astype('category')",
+    "df['b'] = df['a'].apply(lambda x: x / max(df['a']))",
+    "df['b'] = df['a'].apply(lambda x: x / len(df))",
+    "df['b'] = df['a'].apply(lambda x: x / df['a'].count())",
+    "df = df.assign(c=lambda d: d['a'] / d['a'].max())",
+    "m = df['a'] > 0\ndf['b'] = df['a'].apply(lambda x: x if m.any() else 0)",
+    "df = df.dropna(axis=1)",
+    "def f(x):\n    return x\ndf['a'] = df['a'].apply(f)",
+    "df['a'] = (",
+])
+def test_code_that_reads_other_rows_is_unsafe(code):
+    assert not is_chunk_safe(code)
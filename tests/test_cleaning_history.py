@@ -0,0 +1,28 @@
+import json
+
+from agents.code_conversion.models import CleaningHistory, CleaningHistoryEntry
+from data_processor.pipeline import load_pipeline, pipeline_to_json
+
+
+def history_of(count):
+    history = CleaningHistory()
+    for iteration in range(1, count + 1):
+        history.add_entry(CleaningHistoryEntry(iteration, f"step {iteration}", f"df['c{iteration}'] = 1", True))
+    return history
+
+
+def test_head_leaves_out_undone_steps():
+    history = history_of(3)
+    applied = history.head(1)
+    assert [entry.iteration for entry in applied.get_all_entries()] == [1]
+    assert len(history.get_all_entries()) == 3
+
+
+def test_head_before_any_step_is_empty():
+    assert history_of(2).head(-1).get_all_entries() == []
+
+
+def test_pipeline_round_trip():
+    history = history_of(2)
+    loaded = load_pipeline(json.loads(pipeline_to_json(history)))
+    assert loaded.get_all_entries() == history.get_all_entries()
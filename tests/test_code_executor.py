@@ -0,0 +1,52 @@
+import threading
+
+import pandas as pd
+
+from agents.code_conversion.code_executor import CodeExecutor
+
+
+class FakeGenerator:
+    """Returns one fix per candidate; candidate #1 answers at once, the others after ``release``"""
+    def __init__(self):
+        self.release = threading.Event()
+        self.prompts = []
+        self.discarded = []
+
+    def generate_code(self, prompt, columns, dtypes, fast_path=True):
+        self.prompts.append(prompt)
+        if "candidate #" in prompt and "candidate #1;" not in prompt:
+            self.release.wait(5)
+            return "df['b'] = 2"
+        return "df['b'] = 1"
+
+    def discard(self, code):
+        self.discarded.append(code)
+
+
+def test_single_candidate_by_default():
+    generator = FakeGenerator()
+    executor = CodeExecutor(generator, validate=False)
+    code, result = executor.fix_code(ValueError("boom"), "df['b'] = df['zz']", pd.DataFrame({'a': [1]}))
+    assert code == "df['b'] = 1"
+    assert result['b'].tolist() == [1]
+    assert len(generator.prompts) == 1
+
+
+def test_losing_candidates_do_not_run_after_a_fix_is_committed():
+    generator = FakeGenerator()
+    runs = []
+
+    def run(code, df):
+        runs.append((code, len(df)))
+        return df.assign(b=1)
+
+    executor = CodeExecutor(generator, candidates=3, concurrency=3, sample_rows=1, validate=False)
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    code, result = executor.fix_code(ValueError("boom"), "df['b'] = df['zz']", df, run=run)
+    generator.release.set()
+    assert code == "df['b'] = 1"
+    # Wait for the losers' threads to finish their model calls
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and thread.name.startswith('ThreadPoolExecutor'):
+            thread.join(5)
+    assert runs == [("df['b'] = 1", 1), ("df['b'] = 1", 3)]
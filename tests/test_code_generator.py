@@ -0,0 +1,55 @@
+import threading
+
+from agents.code_conversion.code_cache import CodeCache
+from agents.code_conversion.code_generator import CodeGenerator
+from agents.code_conversion.intent_matcher import IntentMatcher
+
+
+class FakeAgent:
+    model_name = 'fake'
+    system_prompt = 'prompt'
+    temperature = 0.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_response(self, prompt):
+        self.calls += 1
+        return "```python\ndf['b'] = 1\n```"
+
+
+def test_cached_code_is_reused_until_discarded(tmp_path):
+    agent = FakeAgent()
+    generator = CodeGenerator(agent, cache=CodeCache(str(tmp_path / "cache.db")))
+    code = generator.generate_code("add b", ['a'], {'a': 'int64'})
+    assert code == "df['b'] = 1"
+    generator.generate_code("add b", ['a'], {'a': 'int64'})
+    assert agent.calls == 1
+    generator.discard(code)
+    generator.generate_code("add b", ['a'], {'a': 'int64'})
+    assert agent.calls == 2
+
+
+def test_fast_path_skips_the_model():
+    agent = FakeAgent()
+    generator = CodeGenerator(agent, matcher=IntentMatcher())
+    code = generator.generate_code("trim name", ['name'], {'name': 'object'})
+    assert code == "df['name'] = df['name'].str.strip().fillna(df['name'])"
+    assert agent.calls == 0
+
+
+def test_counters_survive_concurrent_sessions():
+    generator = CodeGenerator(FakeAgent(), matcher=IntentMatcher())
+    generator.model_seconds = 1.0
+
+    def session():
+        for _ in range(200):
+            generator.generate_code("trim name", ['name'], {'name': 'object'})
+
+    threads = [threading.Thread(target=session) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert generator.matcher.matches == 800
+    assert generator.saved_seconds == 800.0
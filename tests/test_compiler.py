@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from agents.code_conversion.models import CleaningHistoryEntry
+from data_processor.compiler import analyze_step, compile_pipeline, failed_iteration
+from data_processor.execution import run_code
+
+
+def entries(*codes):
+    return [CleaningHistoryEntry(i, f"step {i}", code, True) for i, code in enumerate(codes, 1)]
+
+
+def test_analyze_reads_writes_and_drops():
+    analysis = analyze_step("df['c'] = df['a'] + 1\ndf = df.drop(columns=['b'])")
+    # drop() raises for a column that was not loaded, so dropped columns are read too
+    assert analysis.reads == ['a', 'b']
+    assert analysis.writes == ['c']
+    assert analysis.drops == ['b']
+    assert not analysis.opaque
+
+
+@pytest.mark.parametrize("code", ["df = df.fillna(0)", "df.columns = ['x', 'y']", "df = helper(df)", "df = ("])
+def test_steps_with_an_unknown_footprint_are_opaque(code):
+    assert analyze_step(code).opaque
+
+
+@pytest.mark.parametrize("code, changes_rows, keeps_index", [
+    ("df = df.sort_values('a')", True, True),
+    ("df = df.sort_index()", True, True),
+    ("df = df.reset_index(drop=True)", True, False),
+    ("df['b'] = df['a'] * 2", False, True),
+])
+def test_row_order_and_index(code, changes_rows, keeps_index):
+    analysis = analyze_step(code)
+    assert analysis.changes_rows == changes_rows
+    assert analysis.keeps_index == keeps_index
+
+
+def test_pipeline_reads_only_the_columns_it_needs():
+    compiled = compile_pipeline(entries("df['c'] = df['a'] * 2", "df['d'] = df['c'] + df['b']", "df['e'] = 1"))
+    assert compiled.required_columns == ['a', 'b']
+    assert compiled.input_columns(['a', 'b', 'x', 'e']) == ['a', 'b']
+    assert compiled.passthrough_columns(['a', 'b', 'x', 'e']) == ['x']
+    assert len(compiled.stages) == 1
+
+
+def test_opaque_step_disables_projection():
+    compiled = compile_pipeline(entries("df['c'] = df['a']", "df = df.fillna(0)"))
+    assert not compiled.projectable
+    assert compiled.input_columns(['a', 'b']) is None
+
+
+def test_fused_stage_runs_like_the_separate_steps():
+    df = pd.DataFrame({'a': [3, 1, 2], 'b': ['x', 'y', 'z']})
+    codes = ["df['c'] = df['a'] * 2", "df = df[df['c'] > 2]", "df = df.rename(columns={'b': 'B'})"]
+    separate = df
+    for code in codes:
+        separate = run_code(code, separate)
+    fused = run_code(compile_pipeline(entries(*codes)).stages[0].code, df)
+    pd.testing.assert_frame_equal(fused, separate)
+
+
+def test_assemble_reattaches_passthrough_rows_by_label():
+    compiled = compile_pipeline(entries("df = df[df['a'] > 1]", "df = df.sort_values('a', ascending=False)"))
+    df = pd.DataFrame({'a': [1, 3, 2], 'x': ['p', 'q', 'r']})
+    result = run_code(compiled.stages[0].code, df[['a']])
+    assembled = compiled.assemble(result, df[['x']], ['a', 'x'])
+    assert assembled.to_dict('list') == {'a': [3, 2], 'x': ['q', 'r']}
+
+
+def test_reset_index_prevents_alignment():
+    compiled = compile_pipeline(entries("df = df[df['a'] > 1].reset_index(drop=True)"))
+    assert not compiled.keeps_alignment
+    with pytest.raises(ValueError):
+        compiled.assemble(pd.DataFrame({'a': [3]}), pd.DataFrame({'x': ['q']}), ['a', 'x'])
+
+
+def test_failed_iteration_points_at_the_step():
+    stage = compile_pipeline(entries("df['c'] = 1", "df['d'] = df['zz']")).stages[0]
+    with pytest.raises(KeyError) as error:
+        run_code(stage.code, pd.DataFrame({'a': [1]}))
+    assert failed_iteration(stage, error.value) == 2
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from data_processor.dtypes import expand_categories, optimize_dtypes
+from data_processor.processor import DataProcessor
+
+
+def test_optimize_dtypes_keeps_values():
+    df = pd.DataFrame({'i': np.arange(1000), 'f': np.arange(1000) / 4, 'c': ['a', 'b'] * 500})
+    optimized, changes = optimize_dtypes(df)
+    assert optimized['i'].dtype == np.int32
+    assert isinstance(optimized['c'].dtype, pd.CategoricalDtype)
+    assert {change.column for change in changes} >= {'i', 'c'}
+    pd.testing.assert_frame_equal(optimized.astype(df.dtypes.to_dict()), df)
+
+
+def test_expand_categories_returns_object_columns():
+    df = pd.DataFrame({'c': pd.Categorical(['a', 'b']), 'n': [1, 2]})
+    expanded = expand_categories(df)
+    assert expanded['c'].dtype == object
+    assert expand_categories(expanded) is expanded
+
+
+def test_step_writing_a_new_category_value_is_retried():
+    processor = DataProcessor(None, shrink_dtypes=True, sample_first=False)
+    df, _ = processor._shrink_dtypes(pd.DataFrame({'c': ['a', 'b'] * 50, 'n': range(100)}))
+    assert isinstance(df['c'].dtype, pd.CategoricalDtype)
+    result = processor.execute_step(df, "df.loc[df['n'] > 50, 'c'] = 'zz'")
+    assert result.changed
+    assert (result.df['c'] == 'zz').sum() == 49
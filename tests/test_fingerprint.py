@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from data_processor.fingerprint import diff_frames, fingerprint, fingerprint_frame
+
+
+def test_equal_contents_give_equal_fingerprints():
+    assert fingerprint(pd.Series([1, 2, 3])) == fingerprint(pd.Series([1, 2, 3]))
+    assert fingerprint(pd.Series([1, 2, 3])) != fingerprint(pd.Series([1, 2, 4]))
+
+
+def test_dtype_is_part_of_the_fingerprint():
+    assert fingerprint(pd.Series([1, 2])) != fingerprint(pd.Series([1.0, 2.0]))
+
+
+def test_range_index_matches_the_materialized_index():
+    assert fingerprint(pd.RangeIndex(3)) == fingerprint(pd.Index(np.arange(3, dtype='int64')))
+
+
+def test_unhashable_values_still_fingerprint():
+    assert fingerprint(pd.Series([[1], [2]])) != fingerprint(pd.Series([[1], [3]]))
+
+
+def test_diff_finds_added_removed_and_modified_columns():
+    before = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y'], 'c': [0.5, 0.5]})
+    after = before.drop(columns=['c']).assign(d=1)
+    after['a'] = after['a'] * 10
+    diff = diff_frames(before, after)
+    assert diff.added == ['d']
+    assert diff.removed == ['c']
+    assert diff.modified == ['a']
+    assert diff.changed_columns == ['d', 'a']
+    assert not diff.index_changed
+
+
+def test_diff_of_a_copy_is_unchanged():
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', None]})
+    diff = diff_frames(df, df.copy())
+    assert not diff.changed
+    assert diff.summary() == "no changes"
+
+
+def test_diff_sees_row_filters_and_reordering():
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': [4, 5, 6]})
+    assert diff_frames(df, df[df['a'] > 1]).index_changed
+    assert diff_frames(df, df[['b', 'a']]).reordered
+
+
+def test_diff_accepts_fingerprints():
+    df = pd.DataFrame({'a': [1]})
+    assert not diff_frames(fingerprint_frame(df), df).changed
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processor.history import DataFrameHistory
+
+
+def frame(rows=1000):
+    return pd.DataFrame({'a': np.arange(rows), 'b': np.arange(rows) * 2.0, 's': ['x'] * rows})
+
+
+def test_states_round_trip_and_track_the_position():
+    history = DataFrameHistory()
+    first = frame()
+    second = first.assign(c=first['a'] + 1)
+    assert history.push(first) == 0
+    assert history.push(second) == 1
+    pd.testing.assert_frame_equal(history[0], first)
+    assert history.position == 0
+    pd.testing.assert_frame_equal(history[1], second)
+    assert history.position == 1
+
+
+def test_unchanged_columns_are_stored_once():
+    history = DataFrameHistory()
+    df = frame()
+    history.push(df)
+    before = history.memory_usage
+    history.push(df.assign(c=1))
+    # Only the new column is stored for the second state
+    assert history.memory_usage - before < before / 2
+
+
+def test_push_after_undo_drops_the_redo_states():
+    history = DataFrameHistory()
+    df = frame(10)
+    for value in range(3):
+        history.push(df.assign(c=value))
+    history.get(0)
+    assert history.push(df.assign(c=9)) == 1
+    assert len(history) == 2
+    assert history[1]['c'].iloc[0] == 9
+
+
+def test_blocks_over_budget_spill_and_reload(tmp_path):
+    df = frame(50_000)
+    history = DataFrameHistory(memory_budget_bytes=df.memory_usage(deep=True).sum(), spill_dir=str(tmp_path))
+    versions = [df.assign(c=value) for value in range(5)]
+    for version in versions:
+        history.push(version)
+    assert history.spilled_usage > 0
+    for position, version in enumerate(versions):
+        pd.testing.assert_frame_equal(history[position], version)
+
+
+def test_index_and_attrs_are_kept():
+    history = DataFrameHistory()
+    df = pd.DataFrame({'a': [1, 2]}, index=pd.Index(['x', 'y'], name='key'))
+    df.attrs['source'] = 'test'
+    history.push(df)
+    restored = history[0]
+    pd.testing.assert_frame_equal(restored, df)
+    assert restored.attrs == {'source': 'test'}
+
+
+def test_out_of_range_position():
+    history = DataFrameHistory()
+    history.push(frame(3))
+    with pytest.raises(IndexError):
+        history.get(1)
+
+
+def test_clear_forgets_everything(tmp_path):
+    history = DataFrameHistory(memory_budget_bytes=1, spill_dir=str(tmp_path))
+    history.push(frame(100))
+    history.push(frame(100).assign(c=1))
+    history.clear()
+    assert len(history) == 0
+    assert history.position == -1
@@ -0,0 +1,66 @@
+import pytest
+
+from agents.code_conversion.intent_matcher import IntentMatcher
+
+COLUMNS = ['age', 'name', 'city', 'income', 'first name']
+DTYPES = {'age': 'int64', 'name': 'object', 'city': 'object', 'income': 'float64', 'first name': 'object'}
+
+
+def match(instruction):
+    return IntentMatcher().match(instruction, COLUMNS, DTYPES)
+
+
+@pytest.mark.parametrize("instruction, expected", [
+    ("rename age to years", "df = df.rename(columns={'age': 'years'})"),
+    ("Rename the column age as years.", "df = df.rename(columns={'age': 'years'})"),
+    ("rename first name to given_name", "df = df.rename(columns={'first name': 'given_name'})"),
+    ("rename age to 'age in years'", "df = df.rename(columns={'age': 'age in years'})"),
+])
+def test_rename(instruction, expected):
+    result = match(instruction)
+    assert result is not None and result.code == expected
+
+
+@pytest.mark.parametrize("instruction", [
+    "rename age to years and drop city",
+    "rename age to years, name to full_name",
+    "rename age to years then fill missing income with mean",
+    "rename age to name",
+    "rename missing_column to x",
+])
+def test_rename_with_more_than_one_name_goes_to_the_model(instruction):
+    assert match(instruction) is None
+
+
+@pytest.mark.parametrize("instruction, method", [
+    ("strip whitespace from name", "strip"),
+    ("trim name", "strip"),
+    ("remove leading spaces from name", "lstrip"),
+    ("remove trailing spaces from name", "rstrip"),
+])
+def test_strip_whitespace(instruction, method):
+    result = match(instruction)
+    assert result is not None and result.intent == 'strip_whitespace'
+    assert f"df['name'].str.{method}()" in result.code
+
+
+@pytest.mark.parametrize("instruction", ["remove spaces in name", "remove whitespace"])
+def test_bare_remove_spaces_goes_to_the_model(instruction):
+    assert match(instruction) is None
+
+
+def test_fill_nulls_with_mean():
+    result = match("fill missing values in income with the mean")
+    assert result is not None
+    assert result.code == "df['income'] = df['income'].fillna(df['income'].mean())"
+
+
+def test_unknown_words_go_to_the_model():
+    assert match("fill missing income with the mean of similar customers") is None
+
+
+def test_match_rate_counts_hits_and_misses():
+    matcher = IntentMatcher()
+    matcher.match("trim name", COLUMNS, DTYPES)
+    matcher.match("do something clever", COLUMNS, DTYPES)
+    assert matcher.match_rate == 0.5
@@ -0,0 +1,44 @@
+import pytest
+
+from data_processor.processor import DataProcessor
+from data_processor.sniffer import SAMPLE_BYTES
+
+
+@pytest.fixture
+def late_latin1_csv(tmp_path):
+    # Only the last row is not valid UTF-8, well past the encoding detection sample
+    rows = ["a,b"] + [f"{i},x" for i in range(SAMPLE_BYTES // 4)] + ["1,caf\xe9"]
+    path = tmp_path / "late.csv"
+    path.write_bytes("\n".join(rows).encode("latin1"))
+    return str(path)
+
+
+@pytest.mark.parametrize("large_file", [False, True])
+def test_invalid_utf8_beyond_the_sample_is_reread(late_latin1_csv, large_file):
+    processor = DataProcessor(None)
+    df = processor.load_data(late_latin1_csv, large_file=large_file)
+    assert processor.last_encoding == "latin1"
+    assert df["b"].iloc[-1] == "café"
+    assert df["b"].iloc[0] == "x"
+
+
+def test_sniffed_dialect_is_not_reused_for_another_file_with_the_same_name(tmp_path):
+    (tmp_path / "d1").mkdir()
+    (tmp_path / "d2").mkdir()
+    (tmp_path / "d1" / "data.txt").write_text("a;b\n1;2\n3;4\n")
+    (tmp_path / "d2" / "data.txt").write_text("a\tb\n1\t2\n3\t4\n")
+    processor = DataProcessor(None)
+    first = processor.load_data(str(tmp_path / "d1" / "data.txt"))
+    second = processor.load_data(str(tmp_path / "d2" / "data.txt"))
+    assert list(first.columns) == ['a', 'b']
+    assert list(second.columns) == ['a', 'b']
+
+
+def test_pinned_dialect_is_reused(tmp_path):
+    path = tmp_path / "data.txt"
+    path.write_text("a;b\n1;2\n")
+    processor = DataProcessor(None)
+    processor.load_data(str(path))
+    processor.pin_dialect(str(path), processor.last_dialect)
+    path.write_text("a;b,c\n1;2,3\n")
+    assert list(processor.load_data(str(path)).columns) == ['a', 'b,c']
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.code_conversion.models import CleaningHistoryEntry
+from data_processor.execution import run_code
+from data_processor.processor import DataProcessor
+from data_processor.replay import PipelineReplayer
+
+STEPS = [
+    "df['name'] = df['name'].str.strip().str.upper()",
+    "df = df[df['score'] > 10]",
+    "df['score'] = df['score'].fillna(df['score'].mean())",
+    "df['ratio'] = df['score'].apply(lambda x: x / 100)",
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    rng = np.random.default_rng(0)
+    score = rng.integers(0, 100, 5000).astype(float)
+    score[::7] = np.nan
+    df = pd.DataFrame({'name': [f" n{i} " for i in range(5000)], 'score': score})
+    path = tmp_path / "in.csv"
+    df.to_csv(path, index=False)
+    return path
+
+
+def entries(codes):
+    return [CleaningHistoryEntry(i, f"step {i}", code, True) for i, code in enumerate(codes, 1)]
+
+
+@pytest.mark.parametrize("suffix", ["csv", "parquet"])
+def test_chunked_replay_matches_an_in_memory_run(source, tmp_path, suffix):
+    output = tmp_path / f"out.{suffix}"
+    replayer = PipelineReplayer(DataProcessor(None), chunksize=700, allow_materialize=True)
+    report = replayer.replay(entries(STEPS), str(source), str(output))
+    assert report.chunks > 1
+    assert report.materialized_steps == [3]
+
+    expected = pd.read_csv(source)
+    for code in STEPS:
+        expected = run_code(code, expected)
+    result = pd.read_csv(output) if suffix == "csv" else pd.read_parquet(output)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_unsafe_steps_are_refused_without_materializing(source, tmp_path):
+    replayer = PipelineReplayer(DataProcessor(None), chunksize=700)
+    with pytest.raises(ValueError, match="not chunk-safe"):
+        replayer.replay(entries(STEPS), str(source), str(tmp_path / "out.csv"))
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from data_processor.sandbox import SandboxExecutionError, SandboxExecutor, _read_frame, _write_frame
+
+
+def round_trip(df):
+    payload = _write_frame(df)
+    return payload['format'], _read_frame(payload, unlink=True)
+
+
+def test_plain_frames_travel_as_arrow():
+    df = pd.DataFrame({'s': ['x', None], 'f': [1.0, None], 'i': [1, 2]})
+    payload_format, back = round_trip(df)
+    assert payload_format == 'arrow'
+    pd.testing.assert_frame_equal(back, df)
+
+
+@pytest.mark.parametrize("values", [
+    [1, None, 3],
+    [pd.Timestamp('2020-01-01'), None],
+    [True, False, None],
+])
+def test_object_columns_keep_their_dtype(values):
+    df = pd.DataFrame({'a': pd.Series(values, dtype=object)})
+    payload_format, back = round_trip(df)
+    assert payload_format == 'pickle'
+    assert back['a'].dtype == object
+    assert back['a'].tolist() == df['a'].tolist()
+
+
+@pytest.fixture
+def sandbox():
+    executor = SandboxExecutor(timeout_seconds=30)
+    yield executor
+    executor.close()
+
+
+def test_sandbox_runs_code_and_reports_errors(sandbox):
+    df = pd.DataFrame({'a': [1, 2]})
+    assert sandbox.run("df['b'] = df['a'] * 2", df, 'pandas')['b'].tolist() == [2, 4]
+    with pytest.raises(SandboxExecutionError) as error:
+        sandbox.run("df['b'] = df['zz']", df, 'pandas')
+    assert error.value.kind == 'error'
+    assert error.value.error_type == 'KeyError'
@@ -0,0 +1,56 @@
+import codecs
+
+import pytest
+
+from data_processor.sniffer import detect_encoding, sniff_dialect
+
+
+@pytest.mark.parametrize("sample, expected", [
+    (b"a,b\n1,2\n", 'utf-8'),
+    ("name\ncafé\n".encode('utf-8'), 'utf-8'),
+    (codecs.BOM_UTF8 + b"a,b\n", 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE + "a,b\n".encode('utf-16-le'), 'utf-16'),
+])
+def test_detect_encoding(sample, expected):
+    assert detect_encoding(sample) == expected
+
+
+def test_western_legacy_text_decodes_correctly():
+    text = "name,city\nJosé,Málaga\nFrançois,Orléans\nZoë,Køge\n"
+    # Several code pages decode a short sample like this identically; any of them will do
+    assert text.encode('cp1252').decode(detect_encoding(text.encode('cp1252'))) == text
+
+
+def test_multibyte_character_cut_by_the_sample_is_still_utf8():
+    sample = "a,b\n1,café".encode('utf-8')
+    assert detect_encoding(sample[:-1]) == 'utf-8'
+
+
+@pytest.mark.parametrize("text, delimiter", [
+    ("a;b;c\n1;2;3\n4;5;6\n", ';'),
+    ("a\tb\n1\t2\n", '\t'),
+    ("a|b\n1|2\n", '|'),
+    ("a,b\n1,2\n", ','),
+])
+def test_sniff_delimiter(text, delimiter):
+    dialect = sniff_dialect(text.encode())
+    assert dialect.delimiter == delimiter
+    assert dialect.has_header
+
+
+def test_numeric_first_row_is_data():
+    assert not sniff_dialect(b"1;2\n3;4\n").has_header
+
+
+def test_all_text_table_keeps_its_header():
+    assert sniff_dialect(b"name;city\nann;paris\nbob;rome\n").has_header
+
+
+def test_cut_off_last_line_is_ignored():
+    sample = b"a;b\n1;2\n3;4\n5,6,7,"
+    assert sniff_dialect(sample).delimiter == ';'
+
+
+def test_single_column_text_is_rejected():
+    with pytest.raises(ValueError):
+        sniff_dialect(b"just some words\nand more words\n")
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from data_processor.validation import CodeValidationError, check_code, validate_code
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({'Age': [30, 40], 'city': ['a', 'b']})
+
+
+def kinds(code, df, **options):
+    return [issue.kind for issue in validate_code(code, df, **options)]
+
+
+@pytest.mark.parametrize("code", [
+    "if 'zz' in df.columns:\n    df = df.drop(columns=['zz'])",
+    "if 'zz' in df.columns:\n    df['x'] = df['zz']",
+    "if 'zz' in df:\n    df = df.dropna(subset=['zz'])",
+    "if 'zz' in df.columns and len(df) > 1:\n    df['x'] = df['zz'] * 2",
+    "df['x'] = df['zz'] if 'zz' in df.columns else 0",
+    "try:\n    df['x'] = df['zz']\nexcept KeyError:\n    pass",
+    "try:\n    df = df.drop(columns=['zz'])\nexcept (KeyError, ValueError):\n    pass",
+])
+def test_guarded_column_access_is_allowed(code, df):
+    assert kinds(code, df) == []
+
+
+@pytest.mark.parametrize("code", [
+    "df['x'] = df['zz']",
+    "if 'other' in df.columns:\n    df['x'] = df['zz']",
+    "if 'zz' in df.columns:\n    pass\nelse:\n    df['x'] = df['zz']",
+    "try:\n    df['x'] = df['zz']\nexcept ValueError:\n    pass",
+    "df = df.dropna(subset=['zz'])",
+])
+def test_unknown_columns_are_reported(code, df):
+    assert kinds(code, df) == ['column']
+
+
+def test_suggests_a_close_column(df):
+    issues = validate_code("df['x'] = df['age']", df)
+    assert "did you mean 'Age'" in issues[0].message
+
+
+def test_columns_created_earlier_are_known(df):
+    assert kinds("df['x'] = 1\ndf['y'] = df['x'] + df['Age']", df) == []
+
+
+def test_unknown_names_and_attributes(df):
+    assert sorted(kinds("df['x'] = foo(df['Age'])\ndf['y'] = df['city'].str.lowr()", df)) == ['attribute', 'name']
+
+
+def test_rowwise_code_is_flagged_on_large_frames(df):
+    code = "df['x'] = df.apply(lambda row: row['Age'] * 2, axis=1)"
+    assert kinds(code, df, rowwise_max_rows=1) == ['performance']
+    assert kinds(code, df, rowwise_max_rows=0) == []
+
+
+def test_check_code_raises_with_every_issue(df):
+    with pytest.raises(CodeValidationError) as error:
+        check_code("df['x'] = df['zz'] + df['yy']", df)
+    assert len(error.value.issues) == 2
@@ -1,5 +1,9 @@
 import streamlit as st
-from .constants import LOGO_PATH, LOGO_WIDTH, APP_TITLE
+from agents.code_conversion.models import CleaningHistory
+from data_processor.export import EXPORT_FORMATS
+from data_processor.pipeline import pipeline_to_json
+from .constants import LOGO_PATH, LOGO_WIDTH, APP_TITLE, PIPELINE_FILENAME, TOP_LEVEL_SPANS
+from .state import applied_history, release_export
 
 def display_logo():
     st.sidebar.image(LOGO_PATH, width=LOGO_WIDTH)
@@ -7,9 +11,30 @@ def display_logo():
 
 def display_code_history():
     st.sidebar.subheader("Processing Steps")
+    metrics = st.session_state.step_metrics
+    built_in = [span for spans in metrics for span in spans
+                if span.name == 'generate_code' and span.attributes.get('fast_path')]
+    if metrics:
+        saved = sum(span.attributes.get('saved_seconds', 0.0) for span in built_in)
+        st.sidebar.caption(f"Built-in code: {len(built_in)} of {len(metrics)} steps · ~{saved:.1f}s of model time saved")
     for i, code in enumerate(st.session_state.code_snippets, 1):
-        with st.sidebar.expander(f"Step {i}"):
+        spans = metrics[i - 1] if i <= len(metrics) else []
+        total = sum(span.seconds for span in spans if span.name in TOP_LEVEL_SPANS)
+        with st.sidebar.expander(f"Step {i}" + (f" · {total:.2f}s" if spans else "")):
             st.code(code, language="python")
+            for span in spans:
+                st.caption(span.describe())
+
+    # The recorded steps can be replayed headlessly with `python -m data_processor.batch`
+    history = applied_history()
+    if history.get_all_entries():
+        st.sidebar.download_button(
+            "💾 Export Pipeline",
+            data=pipeline_to_json(history),
+            file_name=PIPELINE_FILENAME,
+            mime="application/json",
+            use_container_width=True
+        )
 
 def display_chat_history():
     with st.container():
@@ -20,8 +45,18 @@ def display_chat_history():
             elif entry['type'] == 'data':
                 with st.chat_message("assistant"):
                     st.write("Data Preview:")
+                    if entry.get('changes'):
+                        st.caption(f"Changes: {entry['changes']}")
                     st.dataframe(entry['content'])
 
+def display_sample_preview(placeholder, sample_df, total_rows):
+    with placeholder.container():
+        with st.chat_message("assistant"):
+            st.write("Data Preview:")
+            st.caption(f"Computed on a {len(sample_df):,}-row sample, so statistics such as means may differ "
+                       f"· running on all {total_rows:,} rows…")
+            st.dataframe(sample_df.head())
+
 def display_sidebar_actions():
     with st.sidebar:
         st.subheader("Actions")
@@ -35,6 +70,13 @@ def display_sidebar_actions():
             if st.button("🗑️ Clear", use_container_width=True):
                 st.session_state.confirm_clear = True
 
+        st.selectbox(
+            "Export format",
+            options=list(EXPORT_FORMATS),
+            format_func=lambda file_format: EXPORT_FORMATS[file_format].label,
+            key="export_format"
+        )
+
         handle_clear_confirmation()
         st.markdown("---")
 
@@ -44,9 +86,11 @@ def handle_clear_confirmation():
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Yes, clear all"):
-                for key in ["chat_history", "code_snippets", "current_df"]:
+                release_export()
+                for key in ["chat_history", "code_snippets", "step_metrics", "current_df"]:
                     if key in st.session_state:
                         del st.session_state[key]
+                st.session_state.cleaning_history = CleaningHistory()
                 st.session_state.confirm_clear = False
                 st.rerun()
         with col2:
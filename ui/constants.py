@@ -5,7 +5,10 @@ APP_ICON = "✨"
 # File settings
 ALLOWED_FILE_TYPES = ['csv', 'xlsx', 'xls', 'xlsm', 'json', 'parquet', 'txt']
 OUTPUT_FILENAME = "cleaned_data.csv"
+PIPELINE_FILENAME = "cleaning_pipeline.json"
 
 # UI Elements
 LOGO_PATH = "ui/assets/logo.png"
-LOGO_WIDTH = 200
\ No newline at end of file
+LOGO_WIDTH = 200
+# Spans that never nest in one another, summed for a step's total time in the sidebar
+TOP_LEVEL_SPANS = ('generate_code', 'sample_exec', 'exec', 'fix_code', 'diff', 'history_push')
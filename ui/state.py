@@ -1,18 +1,40 @@
+import uuid
 import streamlit as st
+from agents.code_conversion.models import CleaningHistory
 
 def initialize_session_state():
     """Initialize all session state variables"""
     default_states = {
+        'session_id': uuid.uuid4().hex[:12],  # correlation id of this session's log records
         'current_df': None,
         'code_snippets': [],
+        'step_metrics': [],
         'chat_history': [],
         'confirm_clear': False,
         'trigger_download': False,
         'show_download_message': False,
-        'df_history': [],
-        'df_history_position': -1
+        'df_history': None,
+        'df_history_position': -1,
+        'cleaning_history': CleaningHistory(),
+        'export_format': 'csv',
+        'export_buffer': None,
+        'export_data': None,
+        'export_file_format': None
     }
     
     for key, default_value in default_states.items():
         if key not in st.session_state:
-            st.session_state[key] = default_value
\ No newline at end of file
+            st.session_state[key] = default_value
+
+def applied_history() -> CleaningHistory:
+    """The recorded steps behind the current data, leaving out the ones undone since"""
+    return st.session_state.cleaning_history.head(st.session_state.df_history_position)
+
+def release_export():
+    """Close the session's export buffer (removing its temp file, if any) and hide the download"""
+    if st.session_state.get('export_buffer') is not None:
+        st.session_state.export_buffer.close()
+    st.session_state.export_buffer = None
+    st.session_state.export_data = None
+    st.session_state.export_file_format = None
+    st.session_state.show_download_message = False
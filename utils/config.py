@@ -4,12 +4,44 @@ import os
 
 load_dotenv()
 MODEL_NAME = "Qwen/Qwen2.5-Coder-7B"
-CODE_CONVERSION_PROMPT = """You are a Python code generation assistant that converts natural language to Python code.
+
+# DataFrame engine: "pandas" (NumPy-backed, the default), "arrow" (pyarrow-backed pandas) or
+# "polars" (each step runs as a Polars LazyFrame query; needs the polars package)
+DATAFRAME_ENGINE = os.getenv("DATAFRAME_ENGINE", "pandas").lower()
+
+# What the model is told about 'df' for each engine: (libraries rule, frame rule, example output)
+ENGINE_PROMPTS = {
+    'pandas': (
+        "Use pandas/numpy/sklearn/... libraries only",
+        "Assume DataFrame is named 'df'",
+        """import pandas as pd
+                    import numpy as np
+                    df = df.drop_duplicates()"""
+    ),
+    'arrow': (
+        "Use pandas/numpy/sklearn/... libraries only",
+        "Assume DataFrame is named 'df'; its columns have pyarrow-backed dtypes (int64[pyarrow], "
+        "string[pyarrow], ...), so use pandas methods rather than NumPy operations on .values",
+        """import pandas as pd
+                    import numpy as np
+                    df = df.drop_duplicates()"""
+    ),
+    'polars': (
+        "Use polars (as pl) and numpy libraries only, never pandas",
+        "Assume 'df' is a polars LazyFrame; build the result with lazy expressions (df.with_columns, "
+        "df.filter, pl.col, ...) and assign it back to 'df' without calling .collect()",
+        """import polars as pl
+                    df = df.unique()"""
+    ),
+}
+_LIBRARIES_RULE, _FRAME_RULE, _EXAMPLE_OUTPUT = ENGINE_PROMPTS.get(DATAFRAME_ENGINE, ENGINE_PROMPTS['pandas'])
+
+CODE_CONVERSION_PROMPT = f"""You are a Python code generation assistant that converts natural language to Python code.
 
                     Rules:
                     1. Generate ONLY the exact Python code requested - no explanations
-                    2. Use pandas/numpy/sklearn/... libraries only
-                    3. Assume DataFrame is named 'df'
+                    2. {_LIBRARIES_RULE}
+                    3. {_FRAME_RULE}
                     4. Include only necessary imports
                     5. Focus on data cleaning and transformation
                     6. No additional text or comments
@@ -17,7 +49,78 @@ CODE_CONVERSION_PROMPT = """You are a Python code generation assistant that conv
                     Example Input/Output:
                     Input: "Remove all duplicate rows from the dataframe"
                     Output: ```python
-                    import pandas as pd
-                    import numpy as np
-                    df = df.drop_duplicates()"""
+                    {_EXAMPLE_OUTPUT}"""
+
+
+# Undo/redo history
+HISTORY_MEMORY_BUDGET_MB = int(os.getenv("HISTORY_MEMORY_BUDGET_MB", "2048"))
+HISTORY_SPILL_DIR = os.getenv("HISTORY_SPILL_DIR") or None
+
+# Generated code cache
+CODE_CACHE_ENABLED = os.getenv("CODE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CODE_CACHE_PATH = os.getenv("CODE_CACHE_PATH", os.path.join(".cache", "code_cache.sqlite3"))
+CODE_CACHE_MAX_ENTRIES = int(os.getenv("CODE_CACHE_MAX_ENTRIES", "5000"))
+CODE_CACHE_MAX_MB = int(os.getenv("CODE_CACHE_MAX_MB", "50"))
+
+# Built-in code for common instructions (no model round trip)
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "true").lower() in ("1", "true", "yes")
+
+# Data loading
+LARGE_FILE_THRESHOLD_MB = int(os.getenv("LARGE_FILE_THRESHOLD_MB", "256"))
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "500000"))
+
+# Sandboxed execution of generated code
+SANDBOX_ENABLED = os.getenv("SANDBOX_ENABLED", "true").lower() in ("1", "true", "yes")
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", "120"))
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "8192"))
+
+# Static checks on generated code before it runs
+VALIDATE_CODE = os.getenv("VALIDATE_CODE", "true").lower() in ("1", "true", "yes")
+VALIDATION_ROWWISE_MAX_ROWS = int(os.getenv("VALIDATION_ROWWISE_MAX_ROWS", "100000"))  # 0 allows row-wise code
+
+# Sample-first execution: each step (and any fix) runs on a stratified sample before the full frame
+SAMPLE_FIRST_ENABLED = os.getenv("SAMPLE_FIRST_ENABLED", "true").lower() in ("1", "true", "yes")
+SAMPLE_FIRST_MIN_ROWS = int(os.getenv("SAMPLE_FIRST_MIN_ROWS", "50000"))  # smaller frames run in full directly
+SAMPLE_FIRST_ROWS = int(os.getenv("SAMPLE_FIRST_ROWS", "2000"))
+SAMPLE_CACHE_ENTRIES = int(os.getenv("SAMPLE_CACHE_ENTRIES", "8"))
+
+# Concurrent error fixing. One fix per failure by default; more candidates race each other but
+# cost one model call each
+FIX_CANDIDATES = int(os.getenv("FIX_CANDIDATES", "1"))
+FIX_CONCURRENCY = int(os.getenv("FIX_CONCURRENCY", "3"))
+FIX_SAMPLE_ROWS = int(os.getenv("FIX_SAMPLE_ROWS", "1000"))
+
+# Language model client
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Export settings
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "100000"))
+EXPORT_SPOOL_MAX_MB = int(os.getenv("EXPORT_SPOOL_MAX_MB", "64"))  # larger exports spill to a temp file
+EXPORT_SPOOL_DIR = os.getenv("EXPORT_SPOOL_DIR") or None
+
+# Data profiling settings
+PROFILE_SAMPLE_THRESHOLD_ROWS = int(os.getenv("PROFILE_SAMPLE_THRESHOLD_ROWS", "1000000"))  # 0 disables sampling
+PROFILE_SAMPLE_ROWS = int(os.getenv("PROFILE_SAMPLE_ROWS", "100000"))
+PROFILE_CACHE_ENTRIES = int(os.getenv("PROFILE_CACHE_ENTRIES", "4096"))
+
+# Dtype optimization settings. Low-cardinality string columns become categoricals, which reject
+# values outside their categories (df.loc[mask, 'col'] = 'new' raises TypeError); steps that
+# fail like this are retried once on plain object columns.
+OPTIMIZE_DTYPES = os.getenv("OPTIMIZE_DTYPES", "false").lower() in ("1", "true", "yes")
+OPTIMIZE_CATEGORY_MAX_RATIO = float(os.getenv("OPTIMIZE_CATEGORY_MAX_RATIO", "0.5"))
+OPTIMIZE_ARROW_STRINGS = os.getenv("OPTIMIZE_ARROW_STRINGS", "false").lower() in ("1", "true", "yes")
 
+# Logging settings
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size").lower()  # "size" or "time"
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "20"))  # per file, for size-based rotation
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")  # for time-based rotation
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped, never waited for
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))  # fraction of DEBUG records kept
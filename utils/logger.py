@@ -1,17 +1,212 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import random
+import threading
+from typing import Dict
+
+from utils.config import (
+    LOG_BACKUP_COUNT, LOG_DEBUG_SAMPLE_RATE, LOG_DIR, LOG_LEVEL, LOG_MAX_MB,
+    LOG_QUEUE_SIZE, LOG_ROTATE_WHEN, LOG_ROTATION
+)
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(correlation_id)s | %(message)s"
+
+# Tags every record with the current session/request, e.g. one Streamlit session
+correlation_id: contextvars.ContextVar[str] = contextvars.ContextVar('correlation_id', default='-')
+
+def set_correlation_id(value: str) -> None:
+    correlation_id.set(value)
+
+class _ContextFilter(logging.Filter):
+    """Stamps the correlation id and drops most DEBUG records, in the caller before queueing"""
+    def __init__(self, debug_sample_rate: float):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample_rate:
+            return False
+        record.correlation_id = correlation_id.get()
+        return True
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without ever blocking the caller; a full queue drops and counts them.
+
+    Messages are merged here but tracebacks are formatted by the writer thread, unless the
+    records are forwarded to the main process, which needs them picklable.
+    """
+    def __init__(self, log_queue: queue.Queue, file_name: str):
+        super().__init__(log_queue)
+        self.file_name = file_name
+        self.forwarding = False
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if self.forwarding:
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            if hasattr(record, 'fields'):
+                record.fields = json.loads(json.dumps(record.fields, default=str))
+            record.log_file = self.file_name
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        if self.dropped:
+            with self._lock:
+                dropped, self.dropped = self.dropped, 0
+            notice = logging.makeLogRecord({
+                'name': 'logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': f"Dropped {dropped} log records, the log queue was full",
+                'correlation_id': record.correlation_id, 'log_file': self.file_name
+            })
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += dropped
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, correlation id, message and the record's ``fields``"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "correlation_id": getattr(record, "correlation_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+_handlers: Dict[str, _DroppingQueueHandler] = {}
+_file_handlers: Dict[str, logging.Handler] = {}
+_listeners = []
+_handlers_lock = threading.RLock()
+# In the main process, the queue worker processes send their records through
+_process_queue = None
+# In a worker process, the main process's queue to send records to
+_forward_queue = None
+
+def _file_handler(path: str) -> logging.Handler:
+    if LOG_ROTATION == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=int(LOG_MAX_MB * 1024 * 1024), backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True
+    )
+
+def _writer(file_name: str, formatter: logging.Formatter) -> logging.Handler:
+    """The one file handler for ``file_name`` in this process"""
+    with _handlers_lock:
+        file_handler = _file_handlers.get(file_name)
+        if file_handler is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            file_handler = _file_handler(os.path.join(LOG_DIR, file_name))
+            file_handler.setFormatter(formatter)
+            _file_handlers[file_name] = file_handler
+        return file_handler
+
+def _queue_handler(file_name: str, formatter: logging.Formatter) -> _DroppingQueueHandler:
+    """The shared handler for one log file: a bounded queue drained by a background writer"""
+    with _handlers_lock:
+        handler = _handlers.get(file_name)
+        if handler is None:
+            if _forward_queue is not None:
+                handler = _DroppingQueueHandler(_forward_queue, file_name)
+                handler.forwarding = True
+            else:
+                log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+                listener = logging.handlers.QueueListener(log_queue, _writer(file_name, formatter))
+                listener.start()
+                _listeners.append(listener)
+                handler = _DroppingQueueHandler(log_queue, file_name)
+            handler.addFilter(_ContextFilter(LOG_DEBUG_SAMPLE_RATE))
+            _handlers[file_name] = handler
+        return handler
+
+class _ProcessRecords(logging.Handler):
+    """Writes records from worker processes to the file each one was logged for"""
+    def handle(self, record: logging.LogRecord) -> bool:
+        file_name = getattr(record, 'log_file', 'agent.log')
+        formatter = JsonFormatter() if file_name.endswith('.jsonl') else logging.Formatter(TEXT_FORMAT)
+        return _writer(file_name, formatter).handle(record)
+
+def worker_log_queue():
+    """The queue to hand to a spawned worker process for ``forward_logs``.
+
+    Only the main process writes the log files; rotating handlers in several processes would
+    rotate the same file under each other.
+    """
+    global _process_queue
+    with _handlers_lock:
+        if _process_queue is None:
+            _process_queue = multiprocessing.get_context('spawn').Queue(maxsize=LOG_QUEUE_SIZE)
+            listener = logging.handlers.QueueListener(_process_queue, _ProcessRecords())
+            listener.start()
+            _listeners.append(listener)
+        return _process_queue
+
+def forward_logs(log_queue) -> None:
+    """Call first thing in a worker process: send its records to the main process from now on"""
+    global _forward_queue
+    # Exiting (or being killed) must not wait for records the main process has not read yet
+    log_queue.cancel_join_thread()
+    with _handlers_lock:
+        _forward_queue = log_queue
+        listeners = {id(listener.queue): listener for listener in _listeners}
+        _listeners.clear()
+        for handler in _handlers.values():
+            listener = listeners.get(id(handler.queue))
+            handler.queue = log_queue
+            handler.forwarding = True
+            if listener is not None:
+                # Records queued before the switch go to the main process too, not to the file
+                listener.handlers = (handler,)
+                listener.stop()
+
+@atexit.register
+def _flush_logs() -> None:
+    for listener in _listeners:
+        listener.stop()
 
 def get_logger(name: str = "GeminiAgent") -> logging.Logger:
-    if not os.path.exists("logs"):
-        os.makedirs("logs")
+    logger = logging.getLogger(name)
+    logger.setLevel(LOG_LEVEL)  # default level
+
+    if not logger.hasHandlers():
+        logger.addHandler(_queue_handler("agent.log", logging.Formatter(TEXT_FORMAT)))
+
+    return logger
 
+def get_json_logger(name: str, file_name: str = "spans.jsonl") -> logging.Logger:
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)  # default level
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
 
     if not logger.hasHandlers():
-        file_handler = logging.FileHandler("logs/agent.log")
-        formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(_queue_handler(file_name, JsonFormatter()))
 
     return logger
@@ -0,0 +1,92 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils.logger import get_json_logger
+
+span_logger = get_json_logger("Spans")
+
+# Spans finished while a collector is active are also appended to it (e.g. one app step)
+_collector: contextvars.ContextVar[Optional[List['Span']]] = contextvars.ContextVar('span_collector', default=None)
+
+@dataclass
+class Span:
+    """A timed operation: duration, resident memory change and free-form attributes"""
+    name: str
+    seconds: float = 0.0
+    memory_delta_mb: Optional[float] = None
+    status: str = 'ok'
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException) -> None:
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record.update(record.pop('attributes'))
+        return record
+
+    def describe(self) -> str:
+        """Short human-readable form, e.g. for the sidebar"""
+        parts = [f"{self.name} {self.seconds:.2f}s"]
+        if self.memory_delta_mb is not None:
+            parts.append(f"{self.memory_delta_mb:+.1f} MB")
+        if 'prompt_tokens' in self.attributes or 'completion_tokens' in self.attributes:
+            parts.append(f"{self.attributes.get('prompt_tokens', '?')}→{self.attributes.get('completion_tokens', '?')} tokens")
+        if self.attributes.get('fast_path'):
+            parts.append(f"built-in {self.attributes['fast_path']}")
+        if self.status != 'ok':
+            parts.append(self.status)
+        return " · ".join(parts)
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process right now (Linux); None where unavailable"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time the block as a span and emit it as a JSON log line when it ends.
+
+    Attributes can be added while the block runs with ``span.set(...)``. An exception
+    marks the span as failed and is re-raised.
+    """
+    current = Span(name, attributes=dict(attributes))
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(e)
+        raise
+    finally:
+        current.seconds = time.perf_counter() - start
+        rss_after = current_rss_mb()
+        if rss_before is not None and rss_after is not None:
+            current.memory_delta_mb = rss_after - rss_before
+        collected = _collector.get()
+        if collected is not None:
+            collected.append(current)
+        span_logger.info(current.name, extra={'fields': current.to_dict()})
+
+@contextmanager
+def collect_spans() -> Iterator[List[Span]]:
+    """Gather every span finished in this context (and threads that copy it) into a list"""
+    spans: List[Span] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+